@@ -1,61 +1,99 @@
 import os
+import json
+import time
 os.environ["MPLCONFIGDIR"] = "/tmp"  # Ensure Matplotlib uses writable config path
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-import json
-import pandas as pd
-import numpy as np
+from flask import Flask, Request, Response, g, render_template, request, redirect, session, url_for, flash, jsonify, stream_with_context
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
-# Helpers
-from jmeter_parser import parse_jmeter_csv
-from generate_TestResult import evaluate_sla
-from generate_graphs import generate_graphs_base64
-from generate_transaction_progress import generate_transaction_progress_base64
-from generate_rag_pie import generate_rag_pie_base64
-
-app = Flask(__name__)
-app.secret_key = "velocitypulse_demo"
+# Helpers (lightweight only: pandas/numpy/matplotlib are imported inside the routes that
+# need them, so cold starts of /, /history and /about skip the scientific stack)
+from chart_renderer import content_id, render_charts
+import history_store
+import instrumentation
+import job_queue
+from instrumentation import stage
 
 # Writable paths for Vercel
 UPLOAD_FOLDER = "/tmp/uploads"
 HISTORY_FILE = "/tmp/history.json"
 
+
+class UploadRequest(Request):
+    # Result files posted to /upload are decompressed, hashed and parsed while the body is
+    # still being received (see upload_stream.py) instead of being spooled and re-read
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == "upload" and filename:
+            from upload_stream import UploadSink
+            sink = UploadSink(UPLOAD_FOLDER, filename)
+            g.setdefault("upload_sinks", []).append(sink)
+            return sink
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+app.secret_key = "velocitypulse_demo"
+
+# Result files above this size (MB) use streaming ingestion with a bounded memory budget
+STREAM_INGEST_THRESHOLD = int(os.environ.get("STREAM_INGEST_THRESHOLD_MB", "512")) * 1024 * 1024
+
+# Upper bound on points per report time series (longer runs are downsampled server-side)
+CHART_MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", "1000"))
+
+# Live runs: how often the results file is checked, and how long it may stay unchanged
+# before the run is reported as finished
+LIVE_POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", "1.0"))
+LIVE_IDLE_TIMEOUT = float(os.environ.get("LIVE_IDLE_TIMEOUT", "60"))
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# --- History helpers ---
-def load_history():
-    if not os.path.exists(HISTORY_FILE):
-        return []
+# --- History helpers (SQLite-backed, see history_store.py) ---
+def load_history(limit=None):
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
+        return history_store.list_reports(limit=limit)
+    except Exception as e:
+        print("⚠ Failed to load report history:", e)
         return []
 
 def save_report(report_data):
-    history = load_history()
-    history.insert(0, report_data)
     try:
-        def convert(obj):
-            if isinstance(obj, (np.integer,)):
-                return int(obj)
-            if isinstance(obj, (np.floating,)):
-                return float(obj)
-            if isinstance(obj, (np.ndarray,)):
-                return obj.tolist()
-            return obj
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, default=convert)
+        return history_store.save_report(report_data)
     except Exception as e:
         print("⚠ Failed to save report metadata:", e)
+        return None
 
 def load_report(report_index):
-    history = load_history()
-    if 0 <= report_index < len(history):
-        return history[report_index]
-    return None
+    try:
+        return history_store.load_report(report_index)
+    except Exception as e:
+        print("⚠ Failed to load report:", e)
+        return None
+
+# Carry over reports from the legacy JSON history, if any
+try:
+    history_store.import_history_json(HISTORY_FILE)
+except Exception as e:
+    print("⚠ Legacy history migration failed:", e)
+
+# --- Instrumentation: per-stage Server-Timing on every response, histograms on /metrics ---
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _add_server_timing(response):
+    started = g.pop("request_started", None)
+    if started is not None and request.endpoint != "metrics":
+        elapsed = time.perf_counter() - started
+        instrumentation.observe("vp_request_wall_seconds", {"endpoint": request.endpoint or "unknown"},
+                                elapsed, instrumentation.SECONDS_BUCKETS)
+        timings = g.pop("stage_timings", []) + [("total", elapsed, None, None)]
+        response.headers["Server-Timing"] = instrumentation.server_timing_header(timings)
+    return response
+
 
 # --- Routes ---
 @app.route("/")
@@ -69,46 +107,92 @@ def upload():
     transactions = []
 
     if request.method == "POST":
+        from upload_stream import UploadSink, stored_filename
+
         try:
-            if "file" in request.files:
-                file = request.files["file"]
-                if file.filename:
-                    filename = secure_filename(file.filename)
-                    file_path = os.path.join(UPLOAD_FOLDER, filename)
+            with stage("receive"):
+                file = request.files.get("file")
+            if file and file.filename:
+                filename = secure_filename(stored_filename(file.filename))
+                file_path = os.path.join(UPLOAD_FOLDER, filename)
+                if isinstance(file.stream, UploadSink):
+                    # Hashed and parsed while it arrived: only the tail is left to parse
+                    with stage("parse"):
+                        transactions = file.stream.finish(file_path)
+                else:
+                    from jmeter_parser import parse_jmeter_csv
                     file.save(file_path)
-                    uploaded_file = filename
-                    uploaded_file_path = file_path
-
-                    # Attempt to parse the uploaded file
-                    green, amber, rag_basis = 2.0, 5.0, "avg"
-                    summary, test_rag = parse_jmeter_csv(file_path, green, amber, rag_basis)
+                    summary, test_rag = parse_jmeter_csv(file_path, 2.0, 5.0, "avg")
                     transactions = [row.get("Transaction") for row in summary if row.get("Transaction")]
+                uploaded_file = filename
+                uploaded_file_path = file_path
+                if os.path.getsize(file_path) <= STREAM_INGEST_THRESHOLD:
+                    # Use idle analysis workers to pre-render the charts while the form is filled in
+                    job_queue.submit("warm", warm_run, file_path, speculative=True)
         except Exception as e:
             print("Upload error:", e)
+            for sink in g.pop("upload_sinks", []):
+                sink.discard()
             flash("⚠️ Failed to process uploaded file. Please check format and size.")
 
     return render_template(
         "upload.html",
         uploaded_file=uploaded_file,
         uploaded_file_path=uploaded_file_path,
-        transactions=transactions
+        transactions=transactions,
+        sla_defaults=FORM_SLA_DEFAULTS,
     )
 
-@app.route("/analyze", methods=["POST"])
-def analyze():
-    file_path = request.form.get("file_path")
-    if not file_path or not os.path.exists(file_path):
-        return jsonify({"error": "No valid file path provided"}), 400
+# Stages of one analysis, in order (a job's progress is the share of stages started)
+ANALYZE_STAGES = ("parse", "aggregate", "summary", "series", "charts", "save")
+
+# SLA defaults of the report form; uploads pre-render the charts for these
+FORM_SLA_DEFAULTS = {"green": 1.5, "amber": 3.5}
+
+
+def _analysis_stage(name):
+    job_queue.progress(name, ANALYZE_STAGES.index(name) / len(ANALYZE_STAGES))
+    return stage(name)
+
+
+def run_analysis(file_path, report_name, green, amber, rag_basis, metrics, max_points,
+                 start_time=None, end_time=None, extra_files=(), out=None):
+    """Parse, aggregate, chart and save one report; runs on the analysis job pool.
+
+    ``extra_files`` are further result files of the same run (JMeter distributed mode, one
+    per load generator), merged into one report. Returns ``{"report_id": ...}``; the full
+    report dict is put in ``out["report_data"]`` when a dict is passed (for callers that
+    render it straight away).
+    """
+    import pandas as pd
+    from run_cache import file_content_hash, load_run
+    from jmeter_parser import summary_rows
+    from stream_ingest import RunAggregates
+    from shard_ingest import ingest_parallel
+    from steady_state import plateau_window, parse_window, format_window
+    from distribution import response_distribution
+
+    # Results larger than the threshold (or split across load generators) are parsed as byte-range
+    # shards in worker processes and their aggregates merged instead of loaded whole; both paths
+    # produce the same per-label / per-second aggregates
+    if extra_files or os.path.getsize(file_path) > STREAM_INGEST_THRESHOLD:
+        with _analysis_stage("parse"):  # parse + aggregate in one pass per shard
+            run_agg = ingest_parallel([file_path, *extra_files])
+        run = None
+    else:
+        with _analysis_stage("parse"):
+            run = load_run(file_path)
+        with _analysis_stage("aggregate"):
+            run_agg = RunAggregates.from_run(run)
 
-    report_name = request.form.get("report_name", "Untitled Report")
-    green = float(request.form.get("green", 2.0))
-    amber = float(request.form.get("amber", 5.0))
-    rag_basis = request.form.get("rag_basis", "avg")
-    metrics = request.form.getlist("metrics") or ["avg", "p90", "p95", "samples", "error"]
+    with _analysis_stage("summary"):
+        # Summary window: manual start/end from the form, else the detected steady-state plateau
+        window = parse_window(start_time, end_time, run_agg.ts_min)
+        if window is None and run_agg.ts_min is not None:
+            window = plateau_window(run_agg.throughput(), run_agg.threads)
 
-    # Parse and evaluate SLA
-    summary, test_rag = parse_jmeter_csv(file_path, green, amber, rag_basis)
-    summary, test_rag = evaluate_sla(summary, green, amber, rag_basis)
+        # Evaluate SLA (RAG is classified in one vectorised pass)
+        summary, test_rag = summary_rows(run_agg.transaction_stats(window), green, amber, rag_basis)
 
     # Normalize summary keys
     def _norm_row_keys(row):
@@ -119,100 +203,30 @@ def analyze():
             "Error %": "error",
             "Samples": "samples",
         }
-        out = dict(row)
+        normalized = dict(row)
         for src, dst in mapping.items():
             if src in row and row[src] is not None:
-                out[dst] = row[src]
-        return out
+                normalized[dst] = row[src]
+        return normalized
 
     summary = [_norm_row_keys(r) for r in summary]
 
-    # --- Build time-series data ---
-    df = pd.read_csv(file_path)
-    df.columns = [c.strip().lower() for c in df.columns]
-
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(pd.to_numeric(df["timestamp"], errors="coerce"), unit="ms", errors="coerce")
-    else:
-        df["timestamp"] = pd.NaT
-
-    if "label" not in df.columns:
-        if "samplerlabel" in df.columns:
-            df["label"] = df["samplerlabel"].astype(str)
-        else:
-            df["label"] = "Transaction"
-
-    df["elapsed"] = pd.to_numeric(df.get("elapsed"), errors="coerce")
-    if "success" in df.columns:
-        df["success"] = df["success"].astype(str).str.lower().isin(["true", "1"])
-    else:
-        df["success"] = True
-
-    df = df.dropna(subset=["timestamp"]).sort_values("timestamp")
-
-    if not df.empty:
-        time_index = df["timestamp"].dt.floor("s")
-        time_labels = sorted(time_index.dropna().unique())
-        labels_fmt = [ts.strftime("%H:%M:%S") for ts in time_labels]
-
-        series_by_txn = {}
-        for txn, g in df.groupby("label"):
-            gb = g.groupby(g["timestamp"].dt.floor("s"))
-            txn_series = {}
-            if "avg" in metrics:
-                avg_ms = gb["elapsed"].mean()
-                txn_series["avg"] = [avg_ms.get(t, None)/1000.0 if pd.notnull(avg_ms.get(t, None)) else None for t in time_labels]
-            if "p90" in metrics:
-                p90_ms = gb["elapsed"].quantile(0.90)
-                txn_series["p90"] = [p90_ms.get(t, None)/1000.0 if pd.notnull(p90_ms.get(t, None)) else None for t in time_labels]
-            if "p95" in metrics:
-                p95_ms = gb["elapsed"].quantile(0.95)
-                txn_series["p95"] = [p95_ms.get(t, None)/1000.0 if pd.notnull(p95_ms.get(t, None)) else None for t in time_labels]
-            if "samples" in metrics:
-                samples = gb.size()
-                txn_series["samples"] = [int(samples.get(t, 0)) for t in time_labels]
-            if "error" in metrics:
-                err_pct = gb.apply(lambda x: 100.0 * ((~x["success"]).sum() / len(x)))
-                txn_series["error"] = [err_pct.get(t, None) if pd.notnull(err_pct.get(t, None)) else None for t in time_labels]
-            if any(v is not None for arr in txn_series.values() for v in arr):
-                series_by_txn[txn] = txn_series
-
-        throughput_over_time = df.groupby(df["timestamp"].dt.floor("s")).size()
-        series_throughput_over_time = [int(throughput_over_time.get(t, 0)) for t in time_labels]
-
-        ts_min, ts_max = df["timestamp"].min(), df["timestamp"].max()
-        total_duration_sec = (ts_max - ts_min).total_seconds() if pd.notnull(ts_min) and pd.notnull(ts_max) else 0
-        test_period_str = f"{ts_min.strftime('%H:%M:%S')}–{ts_max.strftime('%H:%M:%S')}" if pd.notnull(ts_min) and pd.notnull(ts_max) else "N/A"
+    # --- Build time-series data (one label x second pivot per metric, downsampled to max_points) ---
+    with _analysis_stage("series"):
+        labels_fmt, series_by_txn, series_throughput_over_time, bucket_seconds = run_agg.time_series(metrics, max_points)
+    test_period_str, total_duration_str, users_concurrent, steady_state = "N/A", "N/A", None, "No"
+    if run_agg.ts_min is not None:
+        ts_min, ts_max = pd.to_datetime(run_agg.ts_min, unit="ms"), pd.to_datetime(run_agg.ts_max, unit="ms")
+        total_duration_sec = (ts_max - ts_min).total_seconds()
+        test_period_str = f"{ts_min.strftime('%H:%M:%S')}–{ts_max.strftime('%H:%M:%S')}"
         total_duration_str = f"{int(total_duration_sec)}s" if total_duration_sec > 0 else "N/A"
-
-        users_concurrent = None
-        if "threadname" in df.columns:
-            users_concurrent = df.groupby(df["timestamp"].dt.floor("s"))["threadname"].nunique().max()
-
-        steady_state = "Yes" if series_throughput_over_time and pd.Series(series_throughput_over_time).std() < 0.1 * max(series_throughput_over_time) else "No"
-    else:
-        labels_fmt, series_by_txn, series_throughput_over_time = [], {}, []
-        test_period_str, total_duration_str, users_concurrent, steady_state = "N/A", "N/A", None, "No"
+        users_concurrent = run_agg.concurrent_users()
+        steady_state = format_window(window) if window else "No"
 
     # --- Add samples count to summary rows ---
     if "samples" in metrics:
         for row in summary:
-            txn = row.get("Transaction")
-            if txn:
-                row["samples"] = int(df[df["label"] == txn.shape[0])
-
-    def _convert_numpy(val):
-        if isinstance(val, (np.integer,)):
-            return int(val)
-        if isinstance(val, (np.floating,)):
-            return float(val)
-        return val
-
-    for txn, series in series_by_txn.items():
-        for m, arr in series.items():
-            series[m] = [_convert_numpy(v) if v is not None else None for v in arr]
-
-    series_throughput_over_time = [_convert_numpy(v) for v in series_throughput_over_time]
+            row["samples"] = row["#Samples"]
 
     report_data = {
         "report_name": report_name,
@@ -224,6 +238,8 @@ def analyze():
         "total_duration": total_duration_str,
         "concurrent_users": users_concurrent if users_concurrent is not None else "N/A",
         "steady_state": steady_state,
+        "steady_window_ms": list(window) if window else None,
+        "series_range_ms": [int(run_agg.ts_min), int(run_agg.ts_max)] if run_agg.ts_min is not None else None,
         "rag_counts": {
             "GREEN": int(sum(1 for r in summary if r.get("RAG") == "GREEN")),
             "AMBER": int(sum(1 for r in summary if r.get("RAG") == "AMBER")),
@@ -232,60 +248,586 @@ def analyze():
         "chart_time_labels": labels_fmt,
         "series_by_txn": series_by_txn,
         "series_throughput_over_time": series_throughput_over_time,
+        "series_active_users": run_agg.active_users(max_points),
+        "host_samples": _host_samples_for(run_agg),
+        "chart_bucket_seconds": bucket_seconds,
         "timestamp": datetime.utcnow().isoformat(),
         "rag_basis": rag_basis,
         "green_sla": green,
         "amber_sla": amber,
         "metrics_selected": metrics,
+        # Per-label totals + latency sketch over the summary window, for /compare
+        "label_digests": run_agg.label_digests(window),
     }
+    report_data["series_host_metrics"] = _host_metrics_for(run_agg, max_points, report_data["host_samples"])
 
+    # Response-time distribution: binned from the samples when they are in memory, else from the
+    # stored histograms. The PNG and the report's Chart.js histogram both draw this payload.
+    if run is not None:
+        distribution = response_distribution(run["elapsed"].to_numpy())
+    else:
+        distribution = response_distribution(sketch=run_agg.run_sketch())
+    report_data["response_distribution"] = distribution
+
+    # Charts render in parallel worker processes and are cached per (run, chart, SLA parameters).
+    # Raw samples are not held in streaming mode, so the transaction progress chart is skipped there.
+    chart_jobs = {"rag_pie_img": ("rag_pie", summary, {}, content_id(report_data["rag_counts"]))}
+    run_hash = file_content_hash(file_path) if run is not None else None
+    if distribution is not None:
+        chart_jobs["graph_img"] = ("response_distribution", distribution, {"green": green, "amber": amber}, run_hash)
+    if run is not None:
+        chart_jobs["txn_progress_img"] = ("transaction_progress", file_path, {}, run_hash)
+    report_data.update({"graph_img": None, "txn_progress_img": None})
+    with _analysis_stage("charts"):
+        report_data.update(render_charts(chart_jobs))
+
+    with _analysis_stage("save"):
+        report_id = save_report(report_data)
+        if report_id is not None and run_agg.ts_min is not None:
+            # 1s/10s/1m/10m rollups per label for /report/<id>/series (zoomable charts)
+            try:
+                from series_pyramid import save_pyramid
+                save_pyramid(report_id, run_agg)
+            except Exception as e:
+                print("⚠ Failed to save series pyramid:", e)
+    if out is not None:
+        out["report_data"] = report_data
+    return {"report_id": report_id}
+
+
+
+def _host_samples_for(run_agg):
+    """Raw host samples taken during the run (saved with the report), or None."""
+    import host_monitor
+    if run_agg.ts_min is None:
+        return None
     try:
-        report_data["graph_img"] = generate_graphs_base64(df, green, amber)
+        return host_monitor.samples(run_agg.ts_min - run_agg.ts_min % 1000, run_agg.ts_max - run_agg.ts_max % 1000 + 999)
     except Exception as e:
-        print("Graph generation failed (response distribution):", e)
-        report_data["graph_img"] = None
-
+        print("⚠ Failed to read host samples:", e)
+        return None
+
+
+def _host_metrics_for(run_agg, max_points, host_samples):
+    """Host samples taken during the run, on the same axis as series_throughput_over_time (None if none)."""
+    import numpy as np
+    import host_monitor
+    from downsample import bucket_starts
+    if not host_samples:
+        return None
+    seconds = run_agg.throughput().index.to_numpy()
+    starts = bucket_starts(len(seconds), max_points)
+    if run_agg.step > 1 and len(seconds):
+        # Slots wider than a second: sample on the contiguous seconds, one bucket per slot
+        starts = (np.arange(len(seconds)) if starts is None else starts) * run_agg.step
+        seconds = np.arange(seconds[0], seconds[-1] + run_agg.step)
     try:
-        report_data["txn_progress_img"] = generate_transaction_progress_base64(df)
+        return host_monitor.aligned_series(seconds, starts, host_samples)
     except Exception as e:
-        print("Graph generation failed (transaction progress):", e)
-        report_data["txn_progress_img"] = None
+        print("⚠ Failed to align host metrics:", e)
+        return None
 
-    try:
-        report_data["rag_pie_img"] = generate_rag_pie_base64(summary)
-    except Exception as e:
-        print("Graph generation failed (RAG pie):", e)
-        report_data["rag_pie_img"] = None
 
-    save_report(report_data)
+def warm_run(file_path):
+    """Speculative work after an upload: pre-render the charts /analyze will ask for with the form defaults."""
+    from run_cache import file_content_hash, load_run
+    from distribution import response_distribution
+    run_hash = file_content_hash(file_path)
+    distribution = response_distribution(load_run(file_path)["elapsed"].to_numpy())
+    render_charts({
+        "graph_img": ("response_distribution", distribution, FORM_SLA_DEFAULTS, run_hash),
+        "txn_progress_img": ("transaction_progress", file_path, {}, run_hash),
+    })
+
+
+@app.route("/analyze", methods=["POST"])
+def analyze():
+    # Several file_path values (one per load generator) are analysed as one run
+    file_paths = request.form.getlist("file_path")
+    if not file_paths or not all(p and os.path.exists(p) for p in file_paths):
+        return jsonify({"error": "No valid file path provided"}), 400
+    file_path = file_paths[0]
+
+    params = {
+        "file_path": file_path,
+        "extra_files": file_paths[1:],
+        "report_name": request.form.get("report_name", "Untitled Report"),
+        "green": float(request.form.get("green", 2.0)),
+        "amber": float(request.form.get("amber", 5.0)),
+        "rag_basis": request.form.get("rag_basis", "avg"),
+        "metrics": request.form.getlist("metrics") or ["avg", "p90", "p95", "samples", "error"],
+        "max_points": int(request.form.get("max_points") or CHART_MAX_POINTS),
+        "start_time": request.form.get("start_time"),
+        "end_time": request.form.get("end_time"),
+    }
+
+    # Scripts and the upload page ask for JSON: they get a job id at once and poll /jobs/<id>
+    wants_json = request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
+    out = None if wants_json else {}
+    try:
+        job_id = job_queue.submit("analyze", run_analysis, **params, out=out, size_bytes=sum(os.path.getsize(p) for p in file_paths))
+    except job_queue.QueueFull as e:
+        return jsonify({"error": "Analysis queue is full, retry shortly", "details": str(e)}), 503, {"Retry-After": "30"}
+    if wants_json:
+        return jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+
+    # Plain form posts wait for their job (the pool still bounds how many run at once)
+    job = job_queue.wait(job_id)
+    g.setdefault("stage_timings", []).extend(job["timings"])
+    report_data = out.get("report_data")
+    if report_data is None:
+        return jsonify({"error": "Analysis failed", "details": job["error"]}), 500
 
     # ✅ Always return a response, even if template fails
     try:
-        return render_template("report.html", **report_data)
+        with stage("render"):
+            html = render_template("report.html", **report_data)
+        report_id = (job["result"] or {}).get("report_id")
+        if report_id is not None:
+            session["last_report_id"] = report_id
+            _store_report_page({"report_id": report_id, "timestamp": report_data["timestamp"]}, html)
+        return html
     except Exception as e:
         print("Render failed:", e)
         return jsonify({"error": "Failed to render report", "details": str(e), "report_data": report_data}), 500
 
 
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    report_id = (status.get("result") or {}).get("report_id")
+    if report_id is not None:
+        session["last_report_id"] = report_id
+        # Report URLs are newest-first indexes, so resolve it at poll time
+        index = history_store.index_for_report_id(report_id)
+        if index is not None:
+            status["report_url"] = url_for("report", report_index=index)
+    return jsonify(status)
+
+
+# --- Report pages: saved reports never change, so each is rendered once and served precompressed ---
+def _store_report_page(meta, html):
+    from report_pages import page_key, store_page
+    try:
+        store_page(page_key(meta), html)
+    except Exception as e:
+        print("⚠ Failed to store report page:", e)
+
+
+def _report_page(report_index):
+    """Page key of a saved report, rendering and storing the page on first use; None if there is no such report."""
+    from report_pages import has_page, page_key
+    try:
+        metas = history_store.list_reports(limit=1, offset=report_index)
+    except Exception as e:
+        print("⚠ Failed to load report:", e)
+        return None
+    if not metas:
+        return None
+    key = page_key(metas[0])
+    if not has_page(key):
+        report_data = history_store.load_report_by_id(metas[0]["report_id"], history_store.PAGE_BLOBS)
+        # Rows without the analysed series/counts (e.g. imported from an old database) cannot be rendered
+        if not report_data or "rag_counts" not in report_data or report_data.get("chart_time_labels") is None:
+            return None
+        with stage("render"):
+            _store_report_page(metas[0], render_template("report.html", **report_data))
+    return key
+
+
 @app.route("/report/<int:report_index>")
 def report(report_index):
-    report_data = load_report(report_index)
-    if report_data:
-        return render_template("report.html", report_index=report_index, **report_data)
-    else:
-        flash("Report not found")
-        return redirect(url_for("history"))
+    from report_pages import read_page
+    key = _report_page(report_index)
+    if key is None:
+        return render_template("error.html", message="Report not found"), 404
+
+    body, encoding = read_page(key, request.accept_encodings)
+    etag = f"{key}-{encoding}" if encoding else key  # one strong ETag per representation
+    response = Response(body, mimetype="text/html")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    # Index URLs move to another report whenever a new one is saved, so clients revalidate
+    # every time (a 304 costs one indexed lookup) instead of caching by URL
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+def _report_pdf(report_index, download_name):
+    from report_pages import page_pdf
+    key = _report_page(report_index)
+    if key is None:
+        return jsonify({"error": "Report not found"}), 404
+    try:
+        with stage("pdf"):
+            pdf = page_pdf(key, base_url=request.host_url)
+    except ImportError:
+        return jsonify({"error": "PDF export needs the 'weasyprint' package (pip install weasyprint)"}), 501
+    response = Response(pdf, mimetype="application/pdf")
+    response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+    response.set_etag(f"{key}-pdf")
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+@app.route("/export_report_pdf/<int:report_index>")
+def export_report_pdf(report_index):
+    return _report_pdf(report_index, f"report_{report_index}.pdf")
+
+
+@app.route("/export_session_report_pdf")
+def export_session_report_pdf():
+    # The report this browser session last analysed (form post or a polled job)
+    report_id = session.get("last_report_id")
+    report_index = history_store.index_for_report_id(report_id) if report_id is not None else None
+    if report_index is None:
+        return jsonify({"error": "No report in this session"}), 404
+    return _report_pdf(report_index, "session_report.pdf")
+
+
+@app.route("/report/<int:report_index>/series")
+def report_series(report_index):
+    """One metric over a time window from the stored rollup pyramid (for zooming report charts).
+
+    ``from``/``to`` are epoch ms or hh:mm:ss (default: the whole run); the finest stored level
+    (1s/10s/1m/10m) that fits ``points`` is used, so each zoom only reads the chunks it needs.
+    Host metrics (``metric=cpu_pct`` etc.) come from the host samples saved with the report.
+    """
+    import host_monitor
+    from series_pyramid import SERIES_METRICS, query_series
+    from steady_state import parse_window
+
+    report_id = history_store.report_id_for_index(report_index)
+    meta = history_store.load_report_by_id(report_id, blobs=()) if report_id is not None else None
+    if not meta or not meta.get("series_range_ms"):
+        return jsonify({"error": "No series stored for this report"}), 404
+    metric = request.args.get("metric", "avg")
+    if metric not in SERIES_METRICS + host_monitor.FIELDS:
+        return jsonify({"error": f"Unknown metric, expected one of {', '.join(SERIES_METRICS + host_monitor.FIELDS)}"}), 400
+    run_start, run_end = meta["series_range_ms"]
+    window = parse_window(request.args.get("from") or str(run_start), request.args.get("to") or str(run_end), run_start)
+    if window is None:
+        return jsonify({"error": "Invalid from/to (epoch ms or hh:mm:ss, from not after to)"}), 400
+    # Only the stored run is ever bucketed, whatever range was asked for
+    first_ms, last_ms = max(window[0], run_start), min(window[1], run_end)
+    if first_ms > last_ms:
+        return jsonify({"error": "from/to window does not overlap the run"}), 400
+    try:
+        points = min(max(int(request.args.get("points") or CHART_MAX_POINTS), 3), CHART_MAX_POINTS)
+    except ValueError:
+        return jsonify({"error": "points must be an integer"}), 400
+
+    if metric in host_monitor.FIELDS:
+        data = _host_series(report_id, first_ms // 1000, last_ms // 1000, metric, points)
+        if data is None:
+            return jsonify({"error": "No host samples stored for this report"}), 404
+        return jsonify(data)
+    try:
+        data = query_series(report_id, first_ms // 1000, last_ms // 1000, metric, points,
+                            labels=request.args.getlist("label") or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if data is None:
+        return jsonify({"error": "No series stored for this report"}), 404
+    return jsonify(data)
+
+
+def _host_series(report_id, first_s, last_s, metric, points):
+    """One host metric over [first_s, last_s] from the report's saved samples (peak per bucket), or None."""
+    import numpy as np
+    import pandas as pd
+    import host_monitor
+    from downsample import bucket_starts
+    stored = history_store.load_report_by_id(report_id, blobs=("host_samples",)) or {}
+    if not stored.get("host_samples"):
+        return None
+    seconds = np.arange(first_s, last_s + 1)
+    starts = bucket_starts(len(seconds), points)
+    aligned = host_monitor.aligned_series(seconds, starts, stored["host_samples"]) or {}
+    buckets = seconds if starts is None else seconds[starts]
+    return {
+        "metric": metric,
+        "from_ms": int(first_s) * 1000,
+        "to_ms": int(last_s) * 1000,
+        "t": (buckets * 1000).tolist(),
+        "time_labels": pd.to_datetime(buckets, unit="s").strftime("%H:%M:%S").tolist(),
+        "series": {host: fields[metric] for host, fields in aligned.items()},
+    }
 
 
 @app.route("/history")
 def history():
-    reports = load_history()
     return render_template(
         "history.html",
-        reports=reports[:1]  # demo: only show the most recent report
+        reports=load_history(limit=1)  # demo: only show the most recent report
     )
 
 
+@app.route("/compare")
+def compare():
+    """JSON diff of saved reports per transaction; the first of ``report_ids`` (history indices) is the baseline."""
+    from run_compare import compare_runs
+
+    indices = request.args.getlist("report_ids", type=int)
+    if len(indices) < 2:
+        return jsonify({"error": "Select at least two reports to compare"}), 400
+    reports = []
+    for index in indices:
+        try:
+            report_data = history_store.load_report(index, blobs=("label_digests",))
+        except Exception as e:
+            print("⚠ Failed to load report:", e)
+            report_data = None
+        if report_data is None:
+            return jsonify({"error": f"Report {index} not found"}), 404
+        reports.append(report_data)
+    return jsonify(compare_runs(reports))
+
+
+@app.route("/trend")
+def trend():
+    n = request.args.get("n", 10, type=int)
+    selected_metric = request.args.get("metric", "avg")
+    if selected_metric not in ("avg", "p90"):
+        selected_metric = "avg"
+    try:
+        all_txns = history_store.rollup_transactions()
+        selected_txns = [t for t in request.args.getlist("transactions") if t in all_txns] or all_txns[:5]
+        trends = history_store.transaction_trend(selected_txns, last_n=n)
+    except Exception as e:
+        print("⚠ Failed to load trend data:", e)
+        all_txns, selected_txns, trends = [], [], {}
+
+    txn_trends, summary_table = {}, []
+    for txn in selected_txns:
+        rows = trends.get(txn) or []
+        txn_trends[txn] = [{"label": row["timestamp"][:10], "avg": row["avg"], "p90": row["p90"]} for row in rows]
+        avgs = [row["avg"] for row in rows if row["avg"] is not None]
+        p90s = [row["p90"] for row in rows if row["p90"] is not None]
+        summary_table.append({
+            "transaction": txn,
+            "tests_executed": len(rows),
+            "avg_of_avg": f"{sum(avgs) / len(avgs):.2f}" if avgs else "N/A",
+            "avg_of_p90": f"{sum(p90s) / len(p90s):.2f}" if p90s else "N/A",
+        })
+
+    return render_template(
+        "trend.html", n=n, selected_metric=selected_metric, all_txns=all_txns,
+        selected_txns=selected_txns, summary_table=summary_table, txn_trends=txn_trends,
+    )
+
+
+# --- Baselines: mergeable per-transaction state built from the reports' label digests ---
+@app.route("/baseline")
+def baseline():
+    """Baseline over the last ``n`` reports (merged from their digests) with proposed SLA thresholds."""
+    from baselines import SLA_MULTIPLIERS, baseline_metrics, merged_digests
+
+    n = max(1, min(request.args.get("n", 5, type=int), 50))
+    report_ids = [r["report_id"] for r in load_history(limit=n)]
+    state, skipped = merged_digests(report_ids)
+    warnings = []
+    if len(report_ids) < n:
+        warnings.append(f"Only {len(report_ids)} report(s) available.")
+    if skipped:
+        warnings.append(f"{len(skipped)} report(s) saved without per-transaction digests were skipped.")
+    baselines = baseline_metrics(state)
+
+    labels = list(baselines)
+    scaled = lambda key, m: [round(baselines[t][key] * m, 4) if baselines[t][key] is not None else None for t in labels]
+    return render_template(
+        "baseline.html", n=n, warnings=warnings, baselines=baselines, labels=labels,
+        avg_values=scaled("avg", 1.0), p90_values=scaled("p90", 1.0),
+        avg_green=scaled("avg", SLA_MULTIPLIERS["green"]), avg_amber=scaled("avg", SLA_MULTIPLIERS["amber"]),
+        p90_green=scaled("p90", SLA_MULTIPLIERS["green"]), p90_amber=scaled("p90", SLA_MULTIPLIERS["amber"]),
+    )
+
+
+def _report_id_arg(args):
+    # report_id wins; else a history index (0 = latest, like /report/<index>)
+    if args.get("report_id") is not None:
+        return int(args["report_id"])
+    return history_store.report_id_for_index(int(args.get("report", 0)))
+
+
+@app.route("/baseline/promote", methods=["POST"])
+def baseline_promote():
+    """Merge a saved run into a stored baseline (O(transactions), no results file is read)."""
+    from baselines import DEFAULT_BASELINE, baseline_metrics, promote
+
+    args = request.get_json(silent=True) or request.form
+    try:
+        report_id = _report_id_arg(args)
+        if report_id is None:
+            return jsonify({"error": "Report not found"}), 404
+        param = args.get("param")
+        result = promote(report_id, args.get("name") or DEFAULT_BASELINE, args.get("mode"),
+                         float(param) if param not in (None, "") else None,
+                         reset=str(args.get("reset", "")).lower() in ("1", "true", "yes"))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "name": result["name"], "mode": result["mode"], "param": result["param"],
+        "members": result["members"], "updated": result["updated"],
+        "baseline": baseline_metrics(result["state"], result["updated"]),
+    })
+
+
+@app.route("/baseline/gate")
+def baseline_gate():
+    """CI gate: 200 when the run passes against the stored baseline, 422 when a transaction
+    regressed or the run shares no transaction with the baseline (inconclusive)."""
+    from baselines import DEFAULT_BASELINE, GATE_TOLERANCE, MAX_ERROR_DELTA_PCT, gate
+
+    try:
+        report_id = _report_id_arg(request.args)
+        if report_id is None:
+            return jsonify({"error": "Report not found"}), 404
+        result = gate(
+            report_id, request.args.get("name") or DEFAULT_BASELINE,
+            tolerance=request.args.get("tolerance", GATE_TOLERANCE, type=float),
+            max_error_delta=request.args.get("max_error_delta", MAX_ERROR_DELTA_PCT, type=float),
+        )
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200 if result["passed"] else 422
+
+
+@app.route("/baselines/<name>")
+def baseline_state(name):
+    from baselines import baseline_metrics
+    stored = history_store.load_baseline(name)
+    if stored is None:
+        return jsonify({"error": f"Baseline {name!r} not found"}), 404
+    return jsonify({
+        "name": stored["name"], "mode": stored["mode"], "param": stored["param"],
+        "members": stored["members"], "updated": stored["updated"],
+        "baseline": baseline_metrics(stored["state"], stored["updated"]),
+    })
+
+
+def _live_run_dir(run_id):
+    # JMeter writes each live run to uploads/run_<id>/results.jtl (+ jmeter.log)
+    return os.path.join(UPLOAD_FOLDER, f"run_{secure_filename(run_id)}")
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+@app.route("/live/<run_id>")
+def live_progress(run_id):
+    return render_template(
+        "live_progress.html",
+        run_id=run_id,
+        results_path=os.path.join(_live_run_dir(run_id), "results.jtl"),
+    )
+
+
+@app.route("/live/<run_id>/stream")
+def live_stream(run_id):
+    """Server-Sent Events: metric deltas as new JTL rows land, new log lines, host samples, then a final summary."""
+    import host_monitor
+    from live_tail import JtlTailer, LogTailer
+
+    run_dir = _live_run_dir(run_id)
+    tailer = JtlTailer(os.path.join(run_dir, "results.jtl"))
+    log = LogTailer(os.path.join(run_dir, "jmeter.log"))
+
+    def events():
+        last_change = last_sent = time.monotonic()
+        host_seen = {}  # host -> timestamp of the last sample sent
+        while True:
+            delta = tailer.poll()
+            lines = log.poll()
+            now = time.monotonic()
+            if delta:
+                yield _sse("metrics", delta)
+            if lines:
+                yield _sse("log", {"lines": lines})
+            # Latest sample of each running host sampler (see /start_monitoring)
+            for host, info in host_monitor.status()["hosts"].items():
+                latest = info["latest"]
+                if info["active"] and latest and latest["ts"] != host_seen.get(host):
+                    host_seen[host] = latest["ts"]
+                    yield _sse("server_metrics", {"server": host, "ts": latest["ts"],
+                                                  "cpu": latest["cpu_pct"], "mem": latest["mem_pct"]})
+            if delta or lines:
+                last_change = last_sent = now
+                continue  # catch up without sleeping while rows keep arriving
+            if tailer.ts_min is not None and now - last_change > LIVE_IDLE_TIMEOUT:
+                yield _sse("complete", tailer.summary())
+                return
+            if now - last_sent > 15:
+                yield _sse("heartbeat", {})
+                last_sent = now
+            time.sleep(LIVE_POLL_INTERVAL)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Host monitoring (local sampler, see host_monitor.py) ---
+@app.route("/monitor")
+def monitor():
+    return render_template("monitor.html")
+
+
+@app.route("/monitor_status")
+def monitor_status():
+    import host_monitor
+    return jsonify(host_monitor.status())
+
+
+@app.route("/start_monitoring", methods=["POST"])
+def start_monitoring():
+    import host_monitor
+    data = request.get_json(silent=True) or {}
+    try:
+        interval = float(data.get("interval") or host_monitor.MONITOR_INTERVAL)
+    except (TypeError, ValueError):
+        return jsonify({"error": "interval must be a number of seconds"}), 400
+    started, skipped = host_monitor.start(data.get("servers") or [], interval)
+    return jsonify({"servers": len(started), "started": started, "skipped": skipped,
+                    "note": "only the local machine is sampled" if skipped else None})
+
+
+@app.route("/stop_monitoring", methods=["POST"])
+def stop_monitoring():
+    import host_monitor
+    host_monitor.stop()
+    return jsonify({"stopped": True})
+
+
+@app.route("/test_connection", methods=["POST"])
+def test_connection():
+    import host_monitor
+    host = (request.get_json(silent=True) or {}).get("host", "")
+    if host_monitor.is_local(host):
+        return jsonify({"status": f"✅ {host or 'localhost'} is this machine: it can be sampled"})
+    return jsonify({"status": f"❌ {host}: only the local machine can be sampled"})
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    return Response(instrumentation.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/about")
 def about():
     return render_template("about.html", version="Demo", build="Demo", codename="Restricted")
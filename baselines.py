@@ -0,0 +1,173 @@
+from datetime import datetime
+
+import history_store
+from percentile_sketch import LatencySketch
+
+DEFAULT_BASELINE = "default"
+
+# How runs are combined: "all" (every promoted run counts equally), "decay" (older runs are
+# scaled by ``param`` on each promotion, e.g. 0.8) or "window" (only the last ``param`` runs)
+BASELINE_MODES = ("all", "decay", "window")
+
+# Gate tolerances: a transaction fails when its p90 (or avg) exceeds the baseline by more than
+# this fraction, or its error rate by more than MAX_ERROR_DELTA_PCT percentage points
+GATE_TOLERANCE = 0.2
+MAX_ERROR_DELTA_PCT = 1.0
+
+# Proposed SLA thresholds relative to the baseline (see baseline.html)
+SLA_MULTIPLIERS = {"green": 1.2, "amber": 1.5}
+
+
+def _report_digests(report_id):
+    report = history_store.load_report_by_id(report_id, blobs=("label_digests",))
+    if report is None:
+        raise LookupError(f"Report {report_id} not found")
+    digests = report.get("label_digests")
+    if not digests:
+        raise ValueError(f"Report {report_id} has no label digests (saved before they existed)")
+    return digests
+
+
+def _fold(state, digests, weight=1.0, decay=None):
+    """Add (weight 1) or subtract (weight -1) per-label digests into a baseline state; O(labels).
+
+    ``decay`` first scales the existing state, so older runs fade geometrically.
+    """
+    if decay is not None:
+        for s in state.values():
+            for key in ("count", "sum_ms", "errors", "seconds"):
+                s[key] = (s.get(key) or 0.0) * decay
+            s["sketch"] = LatencySketch().merge(LatencySketch.from_dict(s["sketch"]), weight=decay).to_dict()
+    for label, digest in digests.items():
+        s = state.setdefault(label, {"count": 0.0, "sum_ms": 0.0, "errors": 0.0, "seconds": 0.0, "sketch": None})
+        for key in ("count", "sum_ms", "errors", "seconds"):
+            s[key] = (s.get(key) or 0.0) + weight * (digest.get(key) or 0.0)
+        sketch = LatencySketch.from_dict(s["sketch"])
+        sketch.merge(LatencySketch.from_dict(digest["sketch"]), weight=weight)
+        keep = sketch.counts > 0
+        s["sketch"] = LatencySketch(sketch.bins[keep], sketch.counts[keep]).to_dict()
+    for label in [label for label, s in state.items() if s["count"] <= 0.5]:
+        del state[label]
+    return state
+
+
+def promote(report_id, name=DEFAULT_BASELINE, mode=None, param=None, reset=False):
+    """Merge a saved run into a stored baseline and return the updated baseline.
+
+    Only the run's per-label digests (count, latency sum, errors, sketch) are read, so the
+    cost is O(transactions) whatever the run size. ``mode``/``param`` set how runs combine
+    (see BASELINE_MODES) when the baseline is created or ``reset``; a window baseline
+    subtracts the run that falls out of the window. Raises ValueError for a run that is
+    already part of the baseline or has no digests.
+    """
+    def apply(baseline):
+        if reset or baseline is None:
+            baseline = _new_baseline(name, mode, param)
+        if report_id in baseline["members"]:
+            raise ValueError(f"Report {report_id} is already part of baseline {name!r}")
+
+        digests = _report_digests(report_id)
+        state, members = baseline["state"], baseline["members"]
+        _fold(state, digests, decay=baseline["param"] if baseline["mode"] == "decay" and members else None)
+        members.append(report_id)
+        if baseline["mode"] == "window":
+            while len(members) > int(baseline["param"]):
+                dropped = members.pop(0)
+                try:
+                    _fold(state, _report_digests(dropped), weight=-1.0)
+                except (LookupError, ValueError) as e:
+                    print(f"⚠ Baseline {name!r}: could not remove report {dropped}:", e)
+        baseline["updated"] = datetime.utcnow().isoformat(timespec="seconds")
+        return baseline
+
+    # Load, fold and save under one write lock so concurrent promotions cannot lose an update
+    return history_store.update_baseline(name, apply)
+
+
+def _new_baseline(name, mode, param):
+    mode = mode or "all"
+    if mode not in BASELINE_MODES:
+        raise ValueError(f"Unknown baseline mode {mode!r}, expected one of {', '.join(BASELINE_MODES)}")
+    if mode == "decay" and not (param is not None and 0 < float(param) < 1):
+        raise ValueError("decay baselines need 0 < param < 1")
+    if mode == "window" and not (param is not None and int(param) >= 1):
+        raise ValueError("window baselines need param >= 1 (runs kept)")
+    return {"name": name, "mode": mode, "param": float(param) if param is not None else None,
+            "members": [], "state": {}}
+
+
+def merged_digests(report_ids):
+    """One baseline state from several saved runs (equal weights), skipping runs without digests.
+
+    Returns ``(state, skipped report ids)``.
+    """
+    state, skipped = {}, []
+    for report_id in report_ids:
+        try:
+            _fold(state, _report_digests(report_id))
+        except (LookupError, ValueError):
+            skipped.append(report_id)
+    return state, skipped
+
+
+def baseline_metrics(state, updated=None):
+    """Per-transaction baseline in the contracts.md shape: avg / p90 / p95 (s), sample_size, error %."""
+    out = {}
+    for txn in sorted(state):
+        s = state[txn]
+        sketch = LatencySketch.from_dict(s["sketch"])
+        p90, p95 = sketch.quantiles([0.90, 0.95])
+        count = s["count"]
+        out[txn] = {
+            "avg": round(s["sum_ms"] / count / 1000.0, 4) if count else None,
+            "p90": round(p90 / 1000.0, 4) if p90 is not None else None,
+            "p95": round(p95 / 1000.0, 4) if p95 is not None else None,
+            "error_pct": round(100.0 * s["errors"] / count, 3) if count else None,
+            "sample_size": int(round(count)),
+            "last_updated": updated,
+        }
+    return out
+
+
+def gate(report_id, name=DEFAULT_BASELINE, tolerance=GATE_TOLERANCE, max_error_delta=MAX_ERROR_DELTA_PCT):
+    """Pass/fail of a saved run against a stored baseline, per transaction.
+
+    A transaction fails when its avg or p90 exceeds the baseline by more than ``tolerance``
+    (a fraction) or its error rate by more than ``max_error_delta`` points. Transactions the
+    baseline has not seen ("new") and baseline transactions the run lacks ("missing") are
+    reported but do not fail the gate on their own. A run sharing no transaction with the
+    baseline is inconclusive and fails. Raises LookupError for an unknown baseline or report.
+    """
+    baseline = history_store.load_baseline(name)
+    if baseline is None:
+        raise LookupError(f"Baseline {name!r} not found")
+    base = baseline_metrics(baseline["state"], baseline["updated"])
+    run = baseline_metrics(_fold({}, _report_digests(report_id)))
+
+    transactions, passed = {}, True
+    for txn, metrics in run.items():
+        ref = base.get(txn)
+        if ref is None:
+            transactions[txn] = {"status": "new", "run": metrics}
+            continue
+        failures = [
+            key for key in ("avg", "p90")
+            if metrics[key] is not None and ref[key] is not None and metrics[key] > ref[key] * (1.0 + tolerance)
+        ]
+        if metrics["error_pct"] is not None and ref["error_pct"] is not None and metrics["error_pct"] - ref["error_pct"] > max_error_delta:
+            failures.append("error_pct")
+        passed = passed and not failures
+        transactions[txn] = {"status": "fail" if failures else "pass", "failed": failures, "run": metrics, "baseline": ref}
+    for txn, ref in base.items():
+        if txn not in run:
+            transactions[txn] = {"status": "missing", "baseline": ref}
+    inconclusive = not any(t["status"] in ("pass", "fail") for t in transactions.values())
+    return {
+        "baseline": name,
+        "report_id": report_id,
+        "passed": passed and not inconclusive,
+        "inconclusive": inconclusive,
+        "tolerance": tolerance,
+        "max_error_delta": max_error_delta,
+        "transactions": transactions,
+    }
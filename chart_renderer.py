@@ -0,0 +1,145 @@
+import os
+import json
+import base64
+import hashlib
+import time
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from instrumentation import record_stage
+
+# Rendered PNGs, keyed by (run content hash, chart type, parameters)
+CHART_CACHE_DIR = os.environ.get("CHART_CACHE_DIR", "/tmp/chart_cache")
+
+# Part of every cache key: bump when a chart's rendering changes so stale PNGs are not served
+CHART_CACHE_VERSION = 2
+
+# Worker processes for matplotlib; 0 renders in-process (e.g. where multiprocessing is unavailable)
+CHART_RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", str(min(3, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()  # analyses on the job pool render concurrently
+
+
+def _render(chart_type, source, params):
+    """Runs inside a worker: render one chart and return its base64 PNG (or None)."""
+    if chart_type == "response_distribution":
+        from generate_graphs import generate_graphs_base64
+        return generate_graphs_base64(source, params.get("green"), params.get("amber"))
+    if chart_type == "transaction_progress":
+        from generate_transaction_progress import generate_transaction_progress_base64
+        return generate_transaction_progress_base64(source)
+    if chart_type == "rag_pie":
+        from generate_rag_pie import generate_rag_pie_base64
+        return generate_rag_pie_base64(source)
+    raise ValueError(f"Unknown chart type: {chart_type}")
+
+
+def _timed_render(chart_type, source, params):
+    """_render plus its wall and CPU time, measured where it runs (worker or in-process)."""
+    t0, c0 = time.perf_counter(), time.process_time()
+    img = _render(chart_type, source, params)
+    return img, time.perf_counter() - t0, time.process_time() - c0
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and CHART_RENDER_WORKERS > 0:
+            # spawn: never fork a threaded web server; workers load runs from the mmap'd run cache
+            _pool = ProcessPoolExecutor(max_workers=CHART_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def chart_cache_key(run_hash, chart_type, params):
+    raw = json.dumps([CHART_CACHE_VERSION, run_hash, chart_type, params], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def content_id(data):
+    """Cache id for chart data that is not a results file (e.g. a summary's RAG counts)."""
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_file(key):
+    return os.path.join(CHART_CACHE_DIR, f"{key}.png")
+
+
+def _read_cached(key):
+    try:
+        with open(_cache_file(key), "rb") as f:
+            return base64.b64encode(f.read()).decode("utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached(key, img_base64):
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CHART_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(img_base64))
+    os.replace(tmp_path, _cache_file(key))
+
+
+def render_charts(jobs):
+    """Render charts in parallel, reusing cached PNGs.
+
+    ``jobs`` maps a result name to ``(chart_type, source, params, cache_id)`` where ``source`` is what
+    the generator takes (a results file path, a summary list or a distribution dict) and ``cache_id``
+    identifies the data (e.g. the run content hash), or None to skip caching. Returns ``{name: base64 PNG or None}``.
+    """
+    results, pending = {}, {}
+    for name, (chart_type, source, params, cache_id) in jobs.items():
+        key = chart_cache_key(cache_id, chart_type, params) if cache_id is not None else None
+        cached = _read_cached(key) if key else None
+        if cached is not None:
+            results[name] = cached
+        else:
+            pending[name] = (chart_type, source, params, key)
+
+    futures = {}
+    pool = None
+    try:
+        pool = _get_pool()
+    except Exception as e:
+        print("⚠ Chart worker pool unavailable, rendering in-process:", e)
+    for name, (chart_type, source, params, key) in pending.items():
+        if pool is not None:
+            try:
+                futures[name] = pool.submit(_timed_render, chart_type, source, params)
+                continue
+            except Exception as e:
+                print("⚠ Chart submit failed, rendering in-process:", e)
+        futures[name] = None
+
+    for name, (chart_type, source, params, key) in pending.items():
+        try:
+            future = futures[name]
+            try:
+                img, wall_s, cpu_s = future.result() if future is not None else _timed_render(chart_type, source, params)
+            except BrokenProcessPool:
+                _reset_pool()
+                img, wall_s, cpu_s = _timed_render(chart_type, source, params)
+            record_stage(f"chart_{chart_type}", wall_s, cpu_s)
+        except Exception as e:
+            print(f"Graph generation failed ({chart_type}):", e)
+            img = None
+        results[name] = img
+        if img is not None and key is not None:
+            try:
+                _write_cached(key, img)
+            except Exception as e:
+                print("⚠ Failed to cache chart:", e)
+    return results
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+
+from percentile_sketch import bin_value
+
+DEFAULT_BINS = 30
+
+# "linear" (fixed-width bins) or "log" (log-spaced, better for long-tailed latencies)
+DEFAULT_SCALE = os.environ.get("DISTRIBUTION_SCALE", "linear")
+
+# The density curve is fitted on a finer histogram of the same range (KDE_SUBDIVISIONS
+# per display bin) and evaluated on KDE_GRID_POINTS points: cost depends on bins, not samples
+KDE_SUBDIVISIONS = 16
+KDE_GRID_POINTS = 200
+
+
+def _axis(lo, hi, bins, scale):
+    """Edges of ``bins`` equal-width bins over [lo, hi], in log10 space for scale="log"."""
+    if scale == "log":
+        lo, hi = np.log10(max(lo, 1.0)), np.log10(max(hi, 1.0))
+    if hi <= lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, bins + 1)
+
+
+def _fine_counts(values, weights, axis, scale):
+    """Counts per fine bin of ``axis`` in one vectorised pass (values outside are clipped in)."""
+    x = np.log10(np.maximum(values, 1.0)) if scale == "log" else values
+    width = axis[1] - axis[0]
+    idx = np.clip(((x - axis[0]) / width).astype(np.int64), 0, len(axis) - 2)
+    return np.bincount(idx, weights=weights, minlength=len(axis) - 1)
+
+
+def _binned_kde(axis, counts, grid_points):
+    """Gaussian KDE of binned counts (Scott's bandwidth), scaled to counts per unit of the axis."""
+    total = counts.sum()
+    centers = (axis[:-1] + axis[1:]) / 2.0
+    x = np.linspace(axis[0], axis[-1], grid_points)
+    if total <= 0:
+        return x, np.zeros_like(x)
+    mean = (centers * counts).sum() / total
+    std = np.sqrt((counts * (centers - mean) ** 2).sum() / total)
+    h = std * total ** (-1.0 / 5.0) if std > 0 else axis[1] - axis[0]
+    h = max(h, axis[1] - axis[0])
+    nz = counts > 0
+    z = (x[:, None] - centers[nz][None, :]) / h
+    density = (np.exp(-0.5 * z * z) * counts[nz]).sum(axis=1) / (h * np.sqrt(2.0 * np.pi))
+    return x, density
+
+
+def response_distribution(values=None, sketch=None, bins=DEFAULT_BINS, scale=DEFAULT_SCALE):
+    """Response-time histogram plus a density curve, from raw latencies (ms) or a LatencySketch.
+
+    Raw values are binned in one vectorised pass; a sketch (e.g. RunAggregates.run_sketch,
+    built from the stored histograms) is re-binned from its few hundred bins. ``scale`` is
+    "linear" (fixed-width bins) or "log" (log-spaced bins). Returns a JSON-ready dict with
+    ``edges`` (ms), ``counts``, ``kde_x``/``kde_y`` (ms, expected samples per display bin)
+    and ``total``, or None when there are no samples.
+    """
+    if sketch is not None:
+        values, weights = bin_value(sketch.bins), sketch.counts.astype(float)
+    else:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        weights = None
+    if len(values) == 0 or (weights is not None and weights.sum() == 0):
+        return None
+
+    axis = _axis(float(values.min()), float(values.max()), bins * KDE_SUBDIVISIONS, scale)
+    fine = _fine_counts(values, weights, axis, scale)
+    counts = fine.reshape(bins, KDE_SUBDIVISIONS).sum(axis=1)
+    edges = axis[::KDE_SUBDIVISIONS]
+
+    kde_x, density = _binned_kde(axis, fine, KDE_GRID_POINTS)
+    kde_y = density * (edges[1] - edges[0])  # per display bin, to overlay the bars
+    if scale == "log":
+        edges, kde_x = 10.0 ** edges, 10.0 ** kde_x
+    return {
+        "scale": scale,
+        "edges": np.round(edges, 2).tolist(),
+        "counts": np.rint(counts).astype(np.int64).tolist(),
+        "kde_x": np.round(kde_x, 2).tolist(),
+        "kde_y": np.round(kde_y, 3).tolist(),
+        "total": int(round(float(fine.sum()))),
+    }
+
+
+def plot_distribution(ax, dist, green_sla=None, amber_sla=None):
+    """Draw a response_distribution dict on a matplotlib Axes (bars, density line, SLA markers)."""
+    edges = np.asarray(dist["edges"])
+    ax.bar(edges[:-1], dist["counts"], width=np.diff(edges), align="edge",
+           color="steelblue", alpha=0.6, edgecolor="white", linewidth=0.5)
+    ax.plot(dist["kde_x"], dist["kde_y"], color="steelblue", linewidth=1.5)
+    if dist.get("scale") == "log":
+        ax.set_xscale("log")
+    if green_sla is not None:
+        ax.axvline(x=green_sla * 1000, color='green', linestyle='--', label=f'Green SLA ({green_sla}s)')
+    if amber_sla is not None:
+        ax.axvline(x=amber_sla * 1000, color='orange', linestyle='--', label=f'Amber SLA ({amber_sla}s)')
+    ax.set_title('Response Time Distribution')
+    ax.set_xlabel('Elapsed (ms)')
+    ax.set_ylabel('Frequency')
+    if green_sla is not None or amber_sla is not None:
+        ax.legend()
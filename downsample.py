@@ -0,0 +1,71 @@
+import numpy as np
+
+# Default number of points per report series (configurable via CHART_MAX_POINTS)
+DEFAULT_MAX_POINTS = 1000
+
+
+def bucket_starts(n, max_points):
+    """Start index of each output bucket for ``n`` points reduced to ``max_points``.
+
+    Follows the LTTB layout: the first and last points are buckets of their own and the
+    rest is split into ``max_points - 2`` equal-width buckets. Returns None when no
+    reduction is needed.
+    """
+    if max_points is None or max_points < 3 or n <= max_points:
+        return None
+    inner = np.floor(np.linspace(1, n - 1, max_points - 1)).astype(np.int64)[:-1]
+    return np.unique(np.concatenate([[0], inner, [n - 1]]))
+
+
+def sum_buckets(values, starts):
+    """Sum-preserving reduction (counts, throughput) of a 1-D or (time x series) array."""
+    values = np.asarray(values, dtype=float)
+    return np.add.reduceat(np.nan_to_num(values), starts, axis=0)
+
+
+def _nanmean(block):
+    """Column means ignoring NaN; NaN (without np.nanmean's warning) for all-NaN columns."""
+    counts = np.count_nonzero(~np.isnan(block), axis=0)
+    sums = np.nansum(block, axis=0)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
+def lttb_columns(values, starts):
+    """Largest-Triangle-Three-Buckets on every column of a (time x series) array at once.
+
+    Columns share the bucket layout so they stay on one time axis: each bucket keeps, per
+    column, the value of the point that forms the largest triangle with the previously kept
+    point and the next bucket's mean. Spikes and dips survive; NaN gaps stay NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        return lttb_columns(values[:, None], starts)[:, 0]
+    n, cols = values.shape
+    ends = np.append(starts[1:], n)
+    x = np.arange(n, dtype=float)
+    out = np.full((len(starts), cols), np.nan)
+
+    with np.errstate(all="ignore"):
+        out[0] = values[0]
+        prev_x = np.zeros(cols)
+        prev_y = values[0].copy()
+        for b in range(1, len(starts) - 1):
+            s, e = starts[b], ends[b]
+            block = values[s:e]
+            ns, ne = starts[b + 1], ends[b + 1]
+            next_x = x[ns:ne].mean()
+            next_y = _nanmean(values[ns:ne])
+            cur_mean = _nanmean(block)
+            next_y = np.where(np.isnan(next_y), cur_mean, next_y)
+            anchor_y = np.where(np.isnan(prev_y), cur_mean, prev_y)
+
+            area = np.abs((prev_x - next_x) * (block - anchor_y) - (prev_x - x[s:e, None]) * (next_y - anchor_y))
+            area = np.where(np.isnan(block), -np.inf, area)
+            pick = np.argmax(area, axis=0)
+            chosen = block[pick, np.arange(cols)]
+            out[b] = chosen
+            valid = ~np.isnan(chosen)
+            prev_x = np.where(valid, x[s + pick], prev_x)
+            prev_y = np.where(valid, chosen, prev_y)
+        out[-1] = values[-1]
+    return out
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from jmeter_parser import classify_rag, overall_rag
+
 def evaluate_sla(summary, green_sla, amber_sla, rag_basis="avg", include_error=False, error_threshold=None):
     """
     Evaluate SLA compliance for a given summary of transactions.
@@ -8,7 +10,7 @@ def evaluate_sla(summary, green_sla, amber_sla, rag_basis="avg", include_error=F
         summary (list of dict): Parsed transaction summary from JMeter CSV.
         green_sla (float): Green SLA threshold in seconds.
         amber_sla (float): Amber SLA threshold in seconds.
-        rag_basis (str): Basis for RAG evaluation ("avg" or "p90").
+        rag_basis (str): Basis for RAG evaluation ("avg", "p90", "avg+error" or "p90+error").
         include_error (bool): Whether to include error % in evaluation.
         error_threshold (float): Error % threshold if include_error is True.
 
@@ -16,44 +18,26 @@ def evaluate_sla(summary, green_sla, amber_sla, rag_basis="avg", include_error=F
         tuple: (updated_summary, overall_rag)
     """
 
-    updated_summary = []
-    for row in summary:
-        try:
-            avg_s = float(row.get("Avg (s)", 0))
-            p90_s = float(row.get("90th % (s)", 0))
-            error_pct = float(row.get("Error %", 0))
-        except (ValueError, TypeError):
-            avg_s = p90_s = error_pct = 0.0
-
-        # Choose basis value
-        basis_value = avg_s if rag_basis == "avg" else p90_s
-
-        # Default RAG by response time
-        if basis_value > amber_sla:
-            rag = "RED"
-        elif basis_value > green_sla:
-            rag = "AMBER"
-        else:
-            rag = "GREEN"
-
-        # Error % check
-        if include_error and error_threshold is not None:
-            if error_pct > float(error_threshold):
-                rag = "RED"
-
-        # Update row with recalculated RAG
-        new_row = dict(row)
-        new_row["RAG"] = rag
-        updated_summary.append(new_row)
-
-    # Overall RAG = worst case
-    overall_rag = "GREEN"
-    if any(r["RAG"] == "RED" for r in updated_summary):
-        overall_rag = "RED"
-    elif any(r["RAG"] == "AMBER" for r in updated_summary):
-        overall_rag = "AMBER"
-
-    return updated_summary, overall_rag
+    if not summary:
+        return [], "GREEN"
+
+    # Parse the formatted columns once, vectorised across all rows
+    frame = pd.DataFrame(summary)
+    values = pd.DataFrame({
+        "avg": pd.to_numeric(frame.get("Avg (s)", 0), errors="coerce"),
+        "p90": pd.to_numeric(frame.get("90th % (s)", 0), errors="coerce"),
+        "error_pct": pd.to_numeric(frame.get("Error %", 0), errors="coerce"),
+    }, index=frame.index).fillna(0.0)
+
+    basis = "p90" if rag_basis in ("p90", "p90+error") else "avg"
+    if include_error and error_threshold is not None:
+        rags = classify_rag(values, green_sla, amber_sla, basis + "+error", error_threshold)
+    else:
+        rags = classify_rag(values, green_sla, amber_sla, basis)
+
+    # Update rows with recalculated RAG
+    updated_summary = [dict(row, RAG=rag) for row, rag in zip(summary, rags.tolist())]
+    return updated_summary, overall_rag(rags)
 
 
 # Example usage (for testing only):
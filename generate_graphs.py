@@ -1,142 +1,93 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.figure import Figure
 import io, base64
 
+from run_cache import active_threads, as_run
+from distribution import response_distribution, plot_distribution
+
 # Old disk-saving version (works locally, but not on Vercel)
 def generate_graphs(df, green_sla=None, amber_sla=None, out_dir="static/reports/graphs"):
-    if not isinstance(df, pd.DataFrame):
-        try:
-            df = pd.DataFrame(df)
-        except Exception as e:
-            print("⚠ generate_graphs: could not convert input to DataFrame:", e)
-            return
-
-    df.columns = [c.strip() for c in df.columns]
-
-    # Normalize timestamp
-    if 'timeStamp' in df.columns and 'timestamp' not in df.columns:
-        df['timeStamp'] = pd.to_numeric(df['timeStamp'], errors='coerce')
-        df['timestamp'] = pd.to_datetime(df['timeStamp'], unit='ms', errors='coerce')
-    elif 'timestamp' in df.columns:
-        if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-    else:
-        df['timestamp'] = pd.NaT
-
-    # Normalize elapsed
-    if 'elapsed' in df.columns:
-        df['elapsed'] = pd.to_numeric(df['elapsed'], errors='coerce')
-    else:
-        df['elapsed'] = pd.NA
-
-    # Normalize success
-    if 'success' in df.columns:
-        df['success'] = df['success'].astype(str).str.lower().isin(['true', '1'])
-    else:
-        df['success'] = True
-
-    # 📈 Response Time Distribution
-    if 'elapsed' in df.columns and not df['elapsed'].dropna().empty:
-        plt.figure(figsize=(8, 4))
-        sns.histplot(df['elapsed'].dropna(), bins=30, kde=True, color='steelblue')
-        if green_sla is not None:
-            plt.axvline(x=green_sla * 1000, color='green', linestyle='--', label=f'Green SLA ({green_sla}s)')
-        if amber_sla is not None:
-            plt.axvline(x=amber_sla * 1000, color='orange', linestyle='--', label=f'Amber SLA ({amber_sla}s)')
-        plt.title('Response Time Distribution')
-        plt.xlabel('Elapsed (ms)')
-        plt.ylabel('Frequency')
-        if green_sla is not None or amber_sla is not None:
-            plt.legend()
-        plt.tight_layout()
-        plt.savefig(f'{out_dir}/response_distribution.png')
-        plt.close()
+    # Accepts a results file path, a typed run (used as is) or any raw results frame
+    try:
+        df = as_run(df)
+    except Exception as e:
+        print("⚠ generate_graphs: could not convert input to a run frame:", e)
+        return
+    minute = pd.to_datetime(df['timeStamp'] // 60000 * 60000, unit='ms')
+
+    # 📈 Response Time Distribution (binned, see distribution.py)
+    if not df.empty:
+        fig = Figure(figsize=(8, 4))
+        plot_distribution(fig.subplots(), response_distribution(df['elapsed'].to_numpy()), green_sla, amber_sla)
+        fig.tight_layout()
+        fig.savefig(f'{out_dir}/response_distribution.png')
 
     # 📉 Error Trend
-    if 'timestamp' in df.columns and not df['timestamp'].isna().all():
-        error_df = df.groupby(df['timestamp'].dt.floor('min'))['success'] \
-                     .apply(lambda x: 100.0 * (1.0 - x.sum() / len(x)))
+    if not df.empty:
+        error_df = 100.0 * (~df['success']).groupby(minute).mean()
         if not error_df.empty:
-            plt.figure(figsize=(8, 4))
-            error_df.plot(color='crimson')
-            plt.title('Error Trend Over Time')
-            plt.xlabel('Time')
-            plt.ylabel('Error %')
-            plt.tight_layout()
-            plt.savefig(f'{out_dir}/error_trend.png')
-            plt.close()
-
-    # 🔥 SLA Heatmap (robust fix with pivot_table + drop_duplicates)
-    if all(col in df.columns for col in ['label', 'elapsed', 'timestamp']) and not df['timestamp'].isna().all():
-        df['label'] = df['label'].astype(str).str.strip()
-        df['minute'] = df['timestamp'].dt.floor('min')
-
-        grouped = (
-            df.groupby(['label', 'minute'])['elapsed']
-              .mean()
-              .reset_index()
-              .drop_duplicates(subset=['label', 'minute'])   # <-- enforce uniqueness
-        )
-
+            fig = Figure(figsize=(8, 4))
+            ax = fig.subplots()
+            error_df.plot(ax=ax, color='crimson')
+            ax.set_title('Error Trend Over Time')
+            ax.set_xlabel('Time')
+            ax.set_ylabel('Error %')
+            fig.tight_layout()
+            fig.savefig(f'{out_dir}/error_trend.png')
+
+    # 🔥 SLA Heatmap (mean elapsed per label and minute)
+    if not df.empty:
         try:
-            heatmap_data = grouped.pivot(index='label', columns='minute', values='elapsed')
+            import seaborn as sns  # only this legacy heatmap needs it
+            heatmap_data = df['elapsed'].groupby([df['label'], minute], observed=True).mean().unstack()
             if heatmap_data is not None and not heatmap_data.empty:
-                plt.figure(figsize=(10, 6))
-                sns.heatmap(heatmap_data.fillna(0), cmap='coolwarm', linewidths=0.5)
-                plt.title('SLA Heatmap')
-                plt.xlabel('Time')
-                plt.ylabel('Transaction')
-                plt.tight_layout()
-                plt.savefig(f'{out_dir}/sla_heatmap.png')
-                plt.close()
+                fig = Figure(figsize=(10, 6))
+                ax = fig.subplots()
+                sns.heatmap(heatmap_data.fillna(0), cmap='coolwarm', linewidths=0.5, ax=ax)
+                ax.set_title('SLA Heatmap')
+                ax.set_xlabel('Time')
+                ax.set_ylabel('Transaction')
+                fig.tight_layout()
+                fig.savefig(f'{out_dir}/sla_heatmap.png')
         except Exception as e:
             print("⚠ SLA heatmap generation failed:", e)
 
     # 👥 Threads Over Time
-    if 'threadName' in df.columns and 'timestamp' in df.columns and not df['timestamp'].isna().all():
-        thread_counts = df.groupby(df['timestamp'].dt.floor('min'))['threadName'].nunique()
+    thread_counts = active_threads(df, minute) if not df.empty else None
+    if thread_counts is not None:
         if not thread_counts.empty:
-            plt.figure(figsize=(8, 4))
-            thread_counts.plot(color='darkgreen')
-            plt.title('Threads Over Time')
-            plt.xlabel('Time')
-            plt.ylabel('Active Threads')
-            plt.tight_layout()
-            plt.savefig(f'{out_dir}/threads_over_time.png')
-            plt.close()
+            fig = Figure(figsize=(8, 4))
+            ax = fig.subplots()
+            thread_counts.plot(ax=ax, color='darkgreen')
+            ax.set_title('Threads Over Time')
+            ax.set_xlabel('Time')
+            ax.set_ylabel('Active Threads')
+            fig.tight_layout()
+            fig.savefig(f'{out_dir}/threads_over_time.png')
 
 
 # New base64-returning version (for Vercel)
 def generate_graphs_base64(df, green_sla=None, amber_sla=None):
-    if not isinstance(df, pd.DataFrame):
+    # A response_distribution dict (e.g. from stored histograms) is drawn as is; anything
+    # else is read as a run and binned first
+    if isinstance(df, dict) and "edges" in df:
+        dist = df
+    else:
         try:
-            df = pd.DataFrame(df)
+            run = as_run(df)
         except Exception as e:
-            print("⚠ generate_graphs_base64: could not convert input to DataFrame:", e)
+            print("⚠ generate_graphs_base64: could not convert input to a run frame:", e)
             return None
-
-    df.columns = [c.strip() for c in df.columns]
-
-    if 'elapsed' not in df.columns or df['elapsed'].dropna().empty:
+        dist = response_distribution(run['elapsed'].to_numpy()) if not run.empty else None
+    if dist is None:
         return None
 
-    plt.figure(figsize=(8, 4))
-    sns.histplot(df['elapsed'].dropna(), bins=30, kde=True, color='steelblue')
-    if green_sla is not None:
-        plt.axvline(x=green_sla * 1000, color='green', linestyle='--', label=f'Green SLA ({green_sla}s)')
-    if amber_sla is not None:
-        plt.axvline(x=amber_sla * 1000, color='orange', linestyle='--', label=f'Amber SLA ({amber_sla}s)')
-    plt.title('Response Time Distribution')
-    plt.xlabel('Elapsed (ms)')
-    plt.ylabel('Frequency')
-    if green_sla is not None or amber_sla is not None:
-        plt.legend()
-    plt.tight_layout()
+    # Object-oriented Figure API: no pyplot global state, safe in threads and worker processes
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    plot_distribution(ax, dist, green_sla, amber_sla)
+    fig.tight_layout()
 
     buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-    plt.close()
-    return img_base64
\ No newline at end of file
+    fig.savefig(buf, format="png")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
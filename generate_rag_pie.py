@@ -1,8 +1,4 @@
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")   # ensure non-GUI backend
-import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.figure import Figure
 import os
 import io, base64
 
@@ -32,12 +28,12 @@ def generate_rag_pie(summary, out_file="static/reports/graphs/rag_pie.png"):
         print("⚠ Skipping RAG pie: all counts are zero")
         return
 
-    plt.figure(figsize=(4, 4))
-    plt.pie(sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90)
-    plt.title("RAG Distribution")
-    plt.axis("equal")
-    plt.savefig(out_file, bbox_inches="tight")
-    plt.close()
+    fig = Figure(figsize=(4, 4))
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90)
+    ax.set_title("RAG Distribution")
+    ax.axis("equal")
+    fig.savefig(out_file, bbox_inches="tight")
 
 
 # New base64-returning version (for Vercel)
@@ -64,14 +60,13 @@ def generate_rag_pie_base64(summary):
         print("⚠ Skipping RAG pie: all counts are zero")
         return None
 
-    plt.figure(figsize=(4, 4))
-    plt.pie(sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90)
-    plt.title("RAG Distribution")
-    plt.axis("equal")
+    # Object-oriented Figure API: no pyplot global state
+    fig = Figure(figsize=(4, 4))
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90)
+    ax.set_title("RAG Distribution")
+    ax.axis("equal")
 
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-    plt.close()
-    return img_base64
\ No newline at end of file
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
\ No newline at end of file
@@ -1,112 +1,71 @@
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")   # ensure non-GUI backend
-import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.figure import Figure
 import os
 import io, base64
 
-# Old disk-saving version (kept for local runs)
-def generate_transaction_progress(df, out_file="static/reports/graphs/transaction_progress.png"):
-    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+from run_cache import as_run
 
-    # ✅ Ensure DataFrame
-    if not isinstance(df, pd.DataFrame):
-        try:
-            df = pd.DataFrame(df)
-        except Exception as e:
-            print("⚠ Could not convert df to DataFrame:", e)
-            return
 
-    # ✅ Normalize column names
-    df.columns = [c.strip().lower() for c in df.columns]
+def progress_counts(run):
+    """Samples per minute (rows) and label (columns) of a typed run; None if it has no samples."""
+    if run.empty:
+        return None
+    minute = run["timeStamp"] // 60000
+    counts = run["label"].groupby(minute, observed=True).value_counts().unstack(fill_value=0)
+    counts.index = pd.to_datetime(counts.index * 60000, unit="ms")
+    counts.index.name = "minute"
+    return counts
 
-    if "timestamp" in df.columns and "label" in df.columns:
-        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
 
-        df["minute"] = df["timestamp"].dt.floor("min")
+# Old disk-saving version (kept for local runs)
+def generate_transaction_progress(df, out_file="static/reports/graphs/transaction_progress.png"):
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
 
-        # Aggregate safely and enforce uniqueness
-        grouped = (
-            df.groupby(["minute", "label"]).size()
-              .reset_index(name="count")
-              .drop_duplicates(subset=["minute", "label"])
-        )
+    # ✅ Accept a results file path, a typed run (used as is) or any raw results frame
+    try:
+        df = as_run(df)
+    except Exception as e:
+        print("⚠ Could not convert df to a run frame:", e)
+        return
 
-        pivot = grouped.pivot_table(
-            index="minute",
-            columns="label",
-            values="count",
-            aggfunc="sum",
-            fill_value=0
-        )
+    pivot = progress_counts(df)
+    if pivot is None:
+        print("⚠ Skipping transaction progress: no samples")
+        return
 
-        if not pivot.empty:
-            plt.figure(figsize=(8,4))
-            pivot.plot(ax=plt.gca())
-            plt.title("Transaction Progress Over Time")
-            plt.xlabel("Time")
-            plt.ylabel("Count")
-            plt.tight_layout()
-            plt.savefig(out_file)
-            plt.close()
-        else:
-            print("⚠ Skipping transaction progress: no grouped data")
-    else:
-        print("⚠ Skipping transaction progress: required columns missing")
+    fig = Figure(figsize=(8,4))
+    ax = fig.subplots()
+    pivot.plot(ax=ax)
+    ax.set_title("Transaction Progress Over Time")
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Count")
+    fig.tight_layout()
+    fig.savefig(out_file)
 
 
 # New base64-returning version (for Vercel)
 def generate_transaction_progress_base64(df):
-    # ✅ Ensure DataFrame
-    if not isinstance(df, pd.DataFrame):
-        try:
-            df = pd.DataFrame(df)
-        except Exception as e:
-            print("⚠ Could not convert df to DataFrame:", e)
-            return None
-
-    df.columns = [c.strip().lower() for c in df.columns]
-
-    if "timestamp" in df.columns and "label" in df.columns:
-        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-
-        df["minute"] = df["timestamp"].dt.floor("min")
-
-        # Aggregate safely and enforce uniqueness
-        grouped = (
-            df.groupby(["minute", "label"]).size()
-              .reset_index(name="count")
-              .drop_duplicates(subset=["minute", "label"])
-        )
-
-        pivot = grouped.pivot_table(
-            index="minute",
-            columns="label",
-            values="count",
-            aggfunc="sum",
-            fill_value=0
-        )
-
-        if not pivot.empty:
-            plt.figure(figsize=(8,4))
-            pivot.plot(ax=plt.gca())
-            plt.title("Transaction Progress Over Time")
-            plt.xlabel("Time")
-            plt.ylabel("Count")
-            plt.tight_layout()
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format="png")
-            buf.seek(0)
-            img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-            plt.close()
-            return img_base64
-        else:
-            print("⚠ Skipping transaction progress: no grouped data")
-            return None
-    else:
-        print("⚠ Skipping transaction progress: required columns missing")
-        return None
\ No newline at end of file
+    # ✅ Accept a results file path, a typed run (used as is) or any raw results frame
+    try:
+        df = as_run(df)
+    except Exception as e:
+        print("⚠ Could not convert df to a run frame:", e)
+        return None
+
+    pivot = progress_counts(df)
+    if pivot is None:
+        print("⚠ Skipping transaction progress: no samples")
+        return None
+
+    # Object-oriented Figure API: no pyplot global state
+    fig = Figure(figsize=(8,4))
+    ax = fig.subplots()
+    pivot.plot(ax=ax)
+    ax.set_title("Transaction Progress Over Time")
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Count")
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
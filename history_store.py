@@ -0,0 +1,503 @@
+import os
+import json
+import zlib
+import sqlite3
+
+# Writable database in /tmp for Vercel; only the schema below is created (the shipped
+# database.db holds legacy rows without summaries or blobs and is never copied)
+DATABASE_FILE = os.environ.get("DATABASE_FILE", "/tmp/database.db")
+
+# Report fields kept out of the metadata row: loaded only when a report is opened
+BLOB_FIELDS = ("series_by_txn", "chart_time_labels", "series_throughput_over_time",
+               "graph_img", "txn_progress_img", "rag_pie_img", "label_digests", "response_distribution",
+               "series_active_users", "series_host_metrics", "host_samples")
+
+# What the report page needs (label_digests are only read for comparisons, host_samples for zooms)
+PAGE_BLOBS = tuple(kind for kind in BLOB_FIELDS if kind not in ("label_digests", "host_samples"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    filename TEXT,
+    timestamp TEXT,
+    transactions TEXT,
+    duration TEXT,
+    rag TEXT,
+    user TEXT
+);
+CREATE TABLE IF NOT EXISTS report_summary (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (report_id, position)
+);
+CREATE TABLE IF NOT EXISTS report_blobs (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    data BLOB,
+    PRIMARY KEY (report_id, kind)
+);
+CREATE TABLE IF NOT EXISTS report_rollup (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    transaction_name TEXT NOT NULL,
+    samples INTEGER,
+    avg REAL,
+    p90 REAL,
+    p95 REAL,
+    error_pct REAL,
+    throughput REAL,
+    PRIMARY KEY (report_id, transaction_name)
+);
+CREATE INDEX IF NOT EXISTS report_rollup_txn_time ON report_rollup (transaction_name, timestamp);
+CREATE TABLE IF NOT EXISTS report_series (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    level INTEGER NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    chunk_end INTEGER NOT NULL,
+    has_sketch INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (report_id, level, chunk_start)
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    name TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    param REAL,
+    members TEXT NOT NULL,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS baseline_state (
+    name TEXT NOT NULL REFERENCES baselines(name) ON DELETE CASCADE,
+    transaction_name TEXT NOT NULL,
+    count REAL,
+    sum_ms REAL,
+    errors REAL,
+    seconds REAL,
+    sketch TEXT,
+    PRIMARY KEY (name, transaction_name)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated);
+"""
+
+# Bumped when a schema change needs existing rows backfilled (stored in PRAGMA user_version)
+SCHEMA_VERSION = 1
+
+_initialised = set()
+
+# Rows written by save_report; databases seeded from the old shipped database.db also hold
+# bare legacy rows (no meta, summary or blobs) that cannot be opened, so queries skip them
+SAVED = "meta IS NOT NULL"
+
+
+def _json_default(obj):
+    # numpy scalars and arrays (duck-typed so this module never imports numpy)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=_json_default, separators=(",", ":"))
+
+
+def connect():
+    db_path = DATABASE_FILE
+    if db_path not in _initialised:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    # timeout lets concurrent gunicorn workers queue on the write lock instead of failing
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if db_path not in _initialised:
+        _init_schema(conn)
+        _initialised.add(db_path)
+    return conn
+
+
+def _init_schema(conn):
+    # WAL: readers never block the (single) writer and vice versa
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(reports)")}
+    if "meta" not in columns:
+        conn.execute("ALTER TABLE reports ADD COLUMN meta TEXT")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+        _backfill_rollup(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+def _sortable_timestamp(value):
+    # "2025-09-17T10:31:57.123456" and "2025-09-17 10:31:57" both become "2025-09-17 10:31:57"
+    return str(value or "").replace("T", " ")[:19]
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rollup_rows(report_id, timestamp, summary, label_digests=None):
+    """One narrow row per transaction (seconds, like the summary table) for trend queries."""
+    rows = []
+    for row in summary:
+        txn = row.get("Transaction")
+        if not txn:
+            continue
+        digest = (label_digests or {}).get(txn) or {}
+        throughput = digest["count"] / digest["seconds"] if digest.get("seconds") else None
+        samples = _float(row.get("#Samples"))
+        rows.append((
+            report_id, _sortable_timestamp(timestamp), txn,
+            int(samples) if samples is not None else None,
+            _float(row.get("Avg (s)")), _float(row.get("90th % (s)")), _float(row.get("95th % (s)")),
+            _float(row.get("Error %")), throughput,
+        ))
+    return rows
+
+
+def _insert_rollup(conn, rows):
+    conn.executemany(
+        "INSERT OR REPLACE INTO report_rollup "
+        "(report_id, timestamp, transaction_name, samples, avg, p90, p95, error_pct, throughput) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def _backfill_rollup(conn):
+    """Fill report_rollup for reports saved before it existed (from their summary rows)."""
+    for report in conn.execute(f"SELECT id, timestamp FROM reports WHERE {SAVED}").fetchall():
+        summary = [
+            json.loads(r["row"])
+            for r in conn.execute("SELECT row FROM report_summary WHERE report_id = ? ORDER BY position", (report["id"],))
+        ]
+        _insert_rollup(conn, _rollup_rows(report["id"], report["timestamp"], summary))
+
+
+def save_report(report_data, user=None):
+    """Persist a report; returns its id. Metadata, summary rows and blobs are written in one transaction."""
+    meta = {k: v for k, v in report_data.items() if k not in BLOB_FIELDS and k != "summary"}
+    summary = report_data.get("summary") or []
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "INSERT INTO reports (name, filename, timestamp, transactions, duration, rag, user, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report_data.get("report_name"),
+                    report_data.get("file_name"),
+                    report_data.get("timestamp"),
+                    _dumps([row.get("Transaction") for row in summary]),
+                    report_data.get("total_duration"),
+                    report_data.get("rag_result"),
+                    user,
+                    _dumps(meta),
+                ),
+            )
+            report_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO report_summary (report_id, position, row) VALUES (?, ?, ?)",
+                [(report_id, i, _dumps(row)) for i, row in enumerate(summary)],
+            )
+            conn.executemany(
+                "INSERT INTO report_blobs (report_id, kind, data) VALUES (?, ?, ?)",
+                [
+                    (report_id, kind, zlib.compress(_dumps(report_data[kind]).encode("utf-8"), 6))
+                    for kind in BLOB_FIELDS if report_data.get(kind) is not None
+                ],
+            )
+            _insert_rollup(conn, _rollup_rows(report_id, report_data.get("timestamp"), summary, report_data.get("label_digests")))
+        return report_id
+    finally:
+        conn.close()
+
+
+def _meta_from_row(row):
+    meta = json.loads(row["meta"]) if row["meta"] else {}
+    meta.setdefault("report_name", row["name"])
+    meta.setdefault("file_name", row["filename"])
+    meta.setdefault("timestamp", row["timestamp"])
+    meta.setdefault("total_duration", row["duration"])
+    meta.setdefault("rag_result", row["rag"])
+    meta["report_id"] = row["id"]
+    return meta
+
+
+def list_reports(limit=None, offset=0):
+    """Newest-first report metadata (no summary rows, series or images)."""
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT id, name, filename, timestamp, duration, rag, meta FROM reports WHERE {SAVED} "
+            "ORDER BY id DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else int(limit), int(offset)),
+        ).fetchall()
+        return [_meta_from_row(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def report_id_for_index(report_index):
+    """Map the newest-first index used in URLs to a report id."""
+    if report_index < 0:
+        return None
+    conn = connect()
+    try:
+        row = conn.execute(
+            f"SELECT id FROM reports WHERE {SAVED} ORDER BY id DESC LIMIT 1 OFFSET ?", (int(report_index),)
+        ).fetchone()
+        return row["id"] if row else None
+    finally:
+        conn.close()
+
+
+def index_for_report_id(report_id):
+    """Inverse of report_id_for_index; None if the report does not exist."""
+    conn = connect()
+    try:
+        if conn.execute(f"SELECT 1 FROM reports WHERE id = ? AND {SAVED}", (report_id,)).fetchone() is None:
+            return None
+        return conn.execute(f"SELECT COUNT(*) FROM reports WHERE id > ? AND {SAVED}", (report_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def load_report_by_id(report_id, blobs=BLOB_FIELDS):
+    """Full report dict for one id; only the requested blob kinds are read and decompressed."""
+    conn = connect()
+    try:
+        row = conn.execute(
+            f"SELECT id, name, filename, timestamp, duration, rag, meta FROM reports WHERE id = ? AND {SAVED}", (report_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        report = _meta_from_row(row)
+        report["summary"] = [
+            json.loads(r["row"])
+            for r in conn.execute("SELECT row FROM report_summary WHERE report_id = ? ORDER BY position", (report_id,))
+        ]
+        if blobs:
+            placeholders = ",".join("?" for _ in blobs)
+            for r in conn.execute(
+                f"SELECT kind, data FROM report_blobs WHERE report_id = ? AND kind IN ({placeholders})",
+                (report_id, *blobs),
+            ):
+                report[r["kind"]] = json.loads(zlib.decompress(r["data"]).decode("utf-8"))
+        for kind in blobs:
+            report.setdefault(kind, None)
+        return report
+    finally:
+        conn.close()
+
+
+def load_report(report_index, blobs=PAGE_BLOBS):
+    report_id = report_id_for_index(report_index)
+    return load_report_by_id(report_id, blobs) if report_id is not None else None
+
+
+def save_series(report_id, chunks):
+    """Store a run's rollup pyramid: (level, chunk_start, chunk_end, has_sketch, blob) rows (see series_pyramid)."""
+    conn = connect()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO report_series (report_id, level, chunk_start, chunk_end, has_sketch, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(report_id, int(level), int(start), int(end), int(bool(sketch)), blob)
+                 for level, start, end, sketch, blob in chunks],
+            )
+    finally:
+        conn.close()
+
+
+def series_levels(report_id):
+    """``{level seconds: has_sketch}`` of the pyramid stored for a report (empty if none)."""
+    conn = connect()
+    try:
+        return {
+            r["level"]: bool(r["has_sketch"])
+            for r in conn.execute(
+                "SELECT level, MIN(has_sketch) AS has_sketch FROM report_series WHERE report_id = ? GROUP BY level",
+                (report_id,),
+            )
+        }
+    finally:
+        conn.close()
+
+
+def load_series_chunks(report_id, level, first_s, last_s):
+    """(chunk_start, blob) of one pyramid level overlapping [first_s, last_s] (epoch seconds), in time order."""
+    conn = connect()
+    try:
+        return [
+            (r["chunk_start"], r["data"])
+            for r in conn.execute(
+                "SELECT chunk_start, data FROM report_series "
+                "WHERE report_id = ? AND level = ? AND chunk_start <= ? AND chunk_end > ? ORDER BY chunk_start",
+                (report_id, int(level), int(last_s), int(first_s)),
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def _load_baseline(conn, name):
+    row = conn.execute("SELECT name, mode, param, members, updated FROM baselines WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "name": row["name"], "mode": row["mode"], "param": row["param"],
+        "members": json.loads(row["members"]), "updated": row["updated"],
+        "state": {
+            r["transaction_name"]: {
+                "count": r["count"], "sum_ms": r["sum_ms"], "errors": r["errors"],
+                "seconds": r["seconds"], "sketch": json.loads(r["sketch"]) if r["sketch"] else None,
+            }
+            for r in conn.execute(
+                "SELECT transaction_name, count, sum_ms, errors, seconds, sketch FROM baseline_state WHERE name = ?",
+                (name,),
+            )
+        },
+    }
+
+
+def _save_baseline(conn, baseline):
+    conn.execute(
+        "INSERT OR REPLACE INTO baselines (name, mode, param, members, updated) VALUES (?, ?, ?, ?, ?)",
+        (baseline["name"], baseline["mode"], baseline.get("param"), _dumps(baseline["members"]), baseline.get("updated")),
+    )
+    conn.execute("DELETE FROM baseline_state WHERE name = ?", (baseline["name"],))
+    conn.executemany(
+        "INSERT INTO baseline_state (name, transaction_name, count, sum_ms, errors, seconds, sketch) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (baseline["name"], txn, s["count"], s["sum_ms"], s["errors"], s.get("seconds"),
+             _dumps(s["sketch"]) if s.get("sketch") else None)
+            for txn, s in baseline["state"].items()
+        ],
+    )
+
+
+def load_baseline(name):
+    """Stored baseline: settings, member report ids (oldest first) and per-transaction state; None if unknown."""
+    conn = connect()
+    try:
+        return _load_baseline(conn, name)
+    finally:
+        conn.close()
+
+
+def update_baseline(name, update):
+    """Read-modify-write of one baseline under the write lock; returns what ``update`` returned.
+
+    ``update(baseline or None)`` returns the baseline to store. Load and save run in one
+    BEGIN IMMEDIATE transaction, so concurrent updates of a baseline queue instead of
+    overwriting each other; an exception from ``update`` leaves the stored baseline unchanged.
+    """
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            baseline = update(_load_baseline(conn, name))
+            _save_baseline(conn, baseline)
+        return baseline
+    finally:
+        conn.close()
+
+
+def save_job(job):
+    """Upsert an analysis job's status dict (see job_queue), so any worker can answer polls for it."""
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, updated, data) VALUES (?, ?, ?, ?)",
+                (job["id"], job["status"], job["finished"] or job["started"] or job["created"], _dumps(job)),
+            )
+    finally:
+        conn.close()
+
+
+def load_job(job_id):
+    """Last stored status dict of a job; None if unknown (or pruned)."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+    finally:
+        conn.close()
+
+
+def prune_jobs(keep):
+    """Drop all but the ``keep`` most recently finished jobs."""
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND id NOT IN "
+                "(SELECT id FROM jobs WHERE status IN ('done', 'failed') ORDER BY updated DESC LIMIT ?)",
+                (int(keep),),
+            )
+    finally:
+        conn.close()
+
+
+def rollup_transactions():
+    """Every transaction name with rollup rows (read straight off the index)."""
+    conn = connect()
+    try:
+        return [r[0] for r in conn.execute("SELECT DISTINCT transaction_name FROM report_rollup ORDER BY transaction_name")]
+    finally:
+        conn.close()
+
+
+def transaction_trend(transactions, last_n=10):
+    """Rollup rows of the last ``last_n`` runs per transaction, oldest first: ``{txn: [row dict]}``.
+
+    Each transaction is one range scan on (transaction_name, timestamp); no report is deserialised.
+    """
+    conn = connect()
+    try:
+        trend = {}
+        for txn in transactions:
+            rows = conn.execute(
+                "SELECT report_id, timestamp, samples, avg, p90, p95, error_pct, throughput FROM report_rollup "
+                "WHERE transaction_name = ? ORDER BY timestamp DESC LIMIT ?",
+                (txn, int(last_n)),
+            ).fetchall()
+            trend[txn] = [dict(row) for row in reversed(rows)]
+        return trend
+    finally:
+        conn.close()
+
+
+def import_history_json(history_file):
+    """One-off migration of a legacy history.json (newest first) into the store."""
+    claimed = history_file + ".migrating"
+    try:
+        # Only the worker that wins this rename imports the file
+        os.rename(history_file, claimed)
+    except FileNotFoundError:
+        return 0
+    try:
+        with open(claimed, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except Exception as e:
+        print("⚠ Could not read legacy history for migration:", e)
+        return 0
+    for report_data in reversed(history):
+        save_report(report_data)
+    os.replace(claimed, history_file + ".migrated")
+    return len(history)
@@ -0,0 +1,197 @@
+import os
+import time
+import socket
+import threading
+import numpy as np
+
+# Seconds between samples (start_monitoring may ask for another rate)
+MONITOR_INTERVAL = float(os.environ.get("MONITOR_INTERVAL", "1.0"))
+
+# Samples kept per host; the oldest are overwritten (24 h at the default 1 Hz)
+MONITOR_CAPACITY = int(os.environ.get("MONITOR_CAPACITY", "86400"))
+
+# Columns of every sample, in ring-buffer order
+FIELDS = ("cpu_pct", "mem_pct", "disk_read_bps", "disk_write_bps", "net_sent_bps", "net_recv_bps")
+
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1", socket.gethostname().lower()}
+
+
+class RingBuffer:
+    """Fixed-size sample store: one int64 timestamp column and one float32 row per sample.
+
+    Appends write into preallocated arrays (no per-sample objects), so memory stays at
+    ``capacity`` rows however long the sampler runs.
+    """
+
+    def __init__(self, capacity=MONITOR_CAPACITY, width=len(FIELDS)):
+        self.ts = np.zeros(capacity, dtype=np.int64)  # epoch ms
+        self.values = np.zeros((capacity, width), dtype=np.float32)
+        self.capacity = capacity
+        self.count = 0  # samples ever written; next slot is count % capacity
+        self._lock = threading.Lock()
+
+    def append(self, ts_ms, *values):
+        with self._lock:
+            i = self.count % self.capacity
+            self.ts[i] = ts_ms
+            self.values[i] = values
+            self.count += 1
+
+    def snapshot(self, first_ms=None, last_ms=None):
+        """(ts, values) copies in time order, restricted to [first_ms, last_ms] when given."""
+        with self._lock:
+            n = min(self.count, self.capacity)
+            order = (np.arange(n) + self.count - n) % self.capacity
+            ts, values = self.ts[order], self.values[order]
+        keep = np.ones(len(ts), dtype=bool)
+        if first_ms is not None:
+            keep &= ts >= first_ms
+        if last_ms is not None:
+            keep &= ts <= last_ms
+        return ts[keep], values[keep]
+
+    def latest(self):
+        with self._lock:
+            if not self.count:
+                return None
+            i = (self.count - 1) % self.capacity
+            return int(self.ts[i]), self.values[i].tolist()
+
+
+class HostSampler(threading.Thread):
+    """Samples this machine's CPU, memory, disk and network rates into a RingBuffer.
+
+    Samples are taken on interval boundaries of the wall clock (so 1 Hz samples land one per
+    epoch second, like the report's time axis). Each sample is a few psutil counter reads; the
+    thread sleeps in between, so it does not compete with a load generator on the same box.
+    """
+
+    def __init__(self, name, interval=MONITOR_INTERVAL, capacity=MONITOR_CAPACITY, buffer=None):
+        super().__init__(name=f"monitor-{name}", daemon=True)
+        self.host = name
+        self.interval = max(float(interval), 0.1)
+        self.buffer = buffer if buffer is not None else RingBuffer(capacity)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        import psutil
+        psutil.cpu_percent(None)  # primes the counter: later calls measure since the previous one
+        disk, net, last = psutil.disk_io_counters(), psutil.net_io_counters(), time.time()
+        while not self._stop_event.wait(self.interval - time.time() % self.interval):
+            now = time.time()
+            new_disk, new_net = psutil.disk_io_counters(), psutil.net_io_counters()
+            dt = max(now - last, 1e-3)
+            self.buffer.append(
+                int(now * 1000),
+                psutil.cpu_percent(None),
+                psutil.virtual_memory().percent,
+                (new_disk.read_bytes - disk.read_bytes) / dt if disk and new_disk else 0.0,
+                (new_disk.write_bytes - disk.write_bytes) / dt if disk and new_disk else 0.0,
+                (new_net.bytes_sent - net.bytes_sent) / dt,
+                (new_net.bytes_recv - net.bytes_recv) / dt,
+            )
+            disk, net, last = new_disk, new_net, now
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_lock = threading.Lock()
+_samplers = {}  # host name -> HostSampler (kept after stop so its samples can still be reported)
+
+
+def is_local(host):
+    return str(host or "").strip().lower() in LOCAL_HOSTS
+
+
+def start(servers, interval=MONITOR_INTERVAL):
+    """Start sampling the given servers ({name, host}); only the local machine can be sampled.
+
+    A server already sampled at another interval is restarted at the new one, keeping the
+    samples taken so far. Returns ``(started names, skipped names)``.
+    """
+    interval = max(float(interval), 0.1)
+    started, skipped = [], []
+    with _lock:
+        for server in servers:
+            name = server.get("name") or server.get("host") or "local"
+            if not is_local(server.get("host")):
+                skipped.append(name)
+                continue
+            current = _samplers.get(name)
+            if current is None or not current.is_alive() or current.interval != interval:
+                if current is not None:
+                    current.stop()
+                _samplers[name] = sampler = HostSampler(name, interval, buffer=current.buffer if current else None)
+                sampler.start()
+            started.append(name)
+    return started, skipped
+
+
+def stop():
+    with _lock:
+        for sampler in _samplers.values():
+            sampler.stop()
+
+
+def status():
+    with _lock:
+        samplers = list(_samplers.values())
+    hosts = {}
+    for s in samplers:
+        latest = s.buffer.latest()
+        hosts[s.host] = {
+            "active": s.is_alive(),
+            "interval_s": s.interval,
+            "samples": min(s.buffer.count, s.buffer.capacity),
+            "latest": dict(zip(("ts",) + FIELDS, [latest[0], *latest[1]])) if latest else None,
+        }
+    active = sum(1 for h in hosts.values() if h["active"])
+    return {"active": bool(active), "servers": active, "hosts": hosts}
+
+
+def samples(first_ms, last_ms):
+    """Samples of every host taken in [first_ms, last_ms], JSON-ready, or None if there are none.
+
+    Returns ``{host: {"ts": [epoch ms], field: [values]}}``; stored with a report so its host
+    charts can be rebuilt after the ring buffers have moved on (or on another worker).
+    """
+    with _lock:
+        samplers = list(_samplers.values())
+    out = {}
+    for sampler in samplers:
+        ts, values = sampler.buffer.snapshot(first_ms, last_ms)
+        if len(ts):
+            out[sampler.host] = {"ts": ts.tolist(), **{field: values[:, i].round(1).tolist() for i, field in enumerate(FIELDS)}}
+    return out or None
+
+
+def aligned_series(seconds, starts=None, host_samples=None):
+    """Host metrics of every sampled host on a report's time axis, or None if nothing was sampled then.
+
+    ``seconds`` is the run's contiguous epoch-second axis and ``starts`` the downsampling bucket
+    starts (see downsample.bucket_starts). ``host_samples`` are samples as returned by
+    ``samples`` (default: the live buffers). Samples are bucketed by second and each bucket
+    keeps its peak, so saturation is not averaged away. Returns ``{host: {field: [values]}}``.
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    if not len(seconds):
+        return None
+    if host_samples is None:
+        host_samples = samples(seconds[0] * 1000, (seconds[-1] + 1) * 1000 - 1) or {}
+    edges = seconds[0] + (np.arange(len(seconds)) if starts is None else np.asarray(starts))
+    out = {}
+    for host, stored in host_samples.items():
+        second = np.asarray(stored["ts"], dtype=np.int64) // 1000
+        keep = (second >= seconds[0]) & (second <= seconds[-1])
+        if not keep.any():
+            continue
+        values = np.column_stack([np.asarray(stored[field], dtype=float)[keep] for field in FIELDS])
+        grid = np.full((len(edges), len(FIELDS)), np.nan)
+        np.fmax.at(grid, np.searchsorted(edges, second[keep], side="right") - 1, values)
+        grid = np.round(grid, 1)
+        out[host] = {
+            field: [None if np.isnan(v) else float(v) for v in grid[:, i]]
+            for i, field in enumerate(FIELDS)
+        }
+    return out or None
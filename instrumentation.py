@@ -0,0 +1,110 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Prometheus histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 64, 256, 1024, 4096))
+
+_lock = threading.Lock()
+_histograms = {}  # (metric, labels) -> [bucket counts..., sum, count]
+_process = None
+_local = threading.local()
+
+
+def _rss():
+    global _process
+    if _process is None:
+        import psutil  # only needed once something is measured
+        _process = psutil.Process()
+    return _process.memory_info().rss
+
+
+def observe(metric, labels, value, buckets):
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def record_stage(name, wall_s, cpu_s, rss_delta=None):
+    """Store one stage measurement: in the current request's Server-Timing and in the histograms."""
+    observe("vp_stage_wall_seconds", {"stage": name}, wall_s, SECONDS_BUCKETS)
+    observe("vp_stage_cpu_seconds", {"stage": name}, cpu_s, SECONDS_BUCKETS)
+    if rss_delta is not None:
+        observe("vp_stage_rss_delta_bytes", {"stage": name}, rss_delta, BYTES_BUCKETS)
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings.append((name, wall_s, cpu_s, rss_delta))
+    elif has_request_context():
+        g.setdefault("stage_timings", []).append((name, wall_s, cpu_s, rss_delta))
+
+
+@contextmanager
+def collect(timings):
+    """Send this thread's stage measurements to ``timings`` (e.g. a background job) instead of the request."""
+    previous, _local.timings = getattr(_local, "timings", None), timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def stage(name):
+    """Time a block: wall time, CPU time of this thread and process RSS change."""
+    rss_before = _rss()
+    t0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0, time.thread_time() - c0, _rss() - rss_before)
+
+
+def server_timing_header(timings):
+    """``Server-Timing`` value: one entry per stage, wall time as dur, CPU and RSS change in desc."""
+    entries = []
+    for name, wall_s, cpu_s, rss_delta in timings:
+        parts = []
+        if cpu_s is not None:
+            parts.append(f"cpu {cpu_s * 1000:.1f}ms")
+        if rss_delta is not None:
+            parts.append(f"rss {rss_delta / (1024 * 1024):+.1f}MB")
+        desc = f';desc="{", ".join(parts)}"' if parts else ""
+        entries.append(f"{name};dur={wall_s * 1000:.1f}{desc}")
+    return ", ".join(entries)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def prometheus_text():
+    """All histograms plus process gauges in the Prometheus text exposition format (this process only)."""
+    lines = []
+    with _lock:
+        snapshot = {key: dict(h, counts=list(h["counts"])) for key, h in _histograms.items()}
+    for metric in sorted({metric for metric, _ in snapshot}):
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), hist in sorted(snapshot.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(hist["buckets"], hist["counts"]):
+                lines.append(f"{metric}_bucket{_format_labels(labels, ('le', repr(float(bound))))} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {hist['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {hist['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {hist['count']}")
+    lines.append("# TYPE vp_process_resident_memory_bytes gauge")
+    lines.append(f"vp_process_resident_memory_bytes {_rss()}")
+    return "\n".join(lines) + "\n"
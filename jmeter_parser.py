@@ -1,25 +1,77 @@
+import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import os
+
+from run_cache import load_run
+from percentile_sketch import frame_quantiles
+from steady_state import read_test_bounds, per_second_activity, plateau_window
 
 def detect_test_window(file_path):
-    df = pd.read_csv(file_path)
-    timestamps = df['timeStamp'].dropna().astype(int)
-    return timestamps.min(), timestamps.max()
+    # Only the head and tail of the file are read
+    return read_test_bounds(file_path)
 
-def parse_jmeter_csv(file_path, green_sla, amber_sla, rag_basis, start_time=None, end_time=None, error_sla=2.0):
-    df = pd.read_csv(file_path)
+def aggregate_transactions(df):
+    """Per-label samples, avg/p90/p95 (seconds) and error stats for all labels in one grouped pass."""
+    by_label = df.groupby('label', observed=True)
+    elapsed = by_label['elapsed']
+
+    stats = pd.DataFrame({
+        'samples': elapsed.size(),
+        'avg': elapsed.mean() / 1000.0,
+        # Error percentage across all rows (do not filter successes for timing)
+        'errors': (~df['success']).groupby(df['label'], observed=True).sum(),
+    })
+    # Percentiles from the mergeable latency sketch (bounded relative error, no per-group sort)
+    quantiles = frame_quantiles(df, ['label'], [0.90, 0.95])
+    stats['p90'] = quantiles[0.90] / 1000.0
+    stats['p95'] = quantiles[0.95] / 1000.0
+    stats['error_pct'] = 100.0 * stats['errors'] / stats['samples']
+    return stats[stats['samples'] > 0]
+
+def classify_rag(stats, green_sla, amber_sla, rag_basis, error_sla=2.0):
+    """Vectorised RAG for every row of ``stats`` (needs avg/p90 in seconds and error_pct).
+
+    ``rag_basis`` is one of avg, p90, avg+error or p90+error; unknown values fall back to avg.
+    With an ``+error`` basis any row whose error % exceeds ``error_sla`` is RED.
+    """
+    basis = 'p90' if rag_basis in ('p90', 'p90+error') else 'avg'
+    metric = np.asarray(stats[basis], dtype=float)
+    rag = np.select([metric <= green_sla, metric <= amber_sla], ['GREEN', 'AMBER'], default='RED')
+    if rag_basis in ('avg+error', 'p90+error') and error_sla is not None:
+        rag = np.where(np.asarray(stats['error_pct'], dtype=float) > float(error_sla), 'RED', rag)
+    return rag
+
+def overall_rag(rags):
+    # Overall test RAG = worst case
+    rags = set(rags)
+    if 'RED' in rags:
+        return 'RED'
+    if 'AMBER' in rags:
+        return 'AMBER'
+    return 'GREEN'
+
+def summary_rows(stats, green_sla, amber_sla, rag_basis, error_sla=2.0):
+    """Format per-label ``stats`` (as from aggregate_transactions) into report summary rows plus the overall RAG."""
+    rags = classify_rag(stats, green_sla, amber_sla, rag_basis, error_sla)
+    summary = pd.DataFrame({
+        'Transaction': stats.index.astype(str),
+        '#Samples': stats['samples'].to_numpy(),
+        'Avg (s)': stats['avg'].map('{:.2f}'.format).to_numpy(),
+        '90th % (s)': stats['p90'].map('{:.2f}'.format).to_numpy(),
+        '95th % (s)': stats['p95'].map('{:.2f}'.format).to_numpy(),
+        'Error %': stats['error_pct'].map('{:.2f}'.format).to_numpy(),
+        'RAG': rags,
+    }).to_dict('records')
+    return summary, overall_rag(rags)
 
-    # Normalize fields
-    df['timeStamp'] = pd.to_numeric(df['timeStamp'], errors='coerce').astype('Int64')
-    df['elapsed'] = pd.to_numeric(df['elapsed'], errors='coerce')
-    df['success'] = df['success'].astype(str).str.strip().str.lower()
-    df['label'] = df['label'].astype(str).str.strip()
+def parse_jmeter_csv(file_path, green_sla, amber_sla, rag_basis, start_time=None, end_time=None, error_sla=2.0):
+    # Typed run from the run cache (parsed once per file content; rows without a
+    # timestamp or elapsed time are already dropped there)
+    df = load_run(file_path)
 
-    # Remove rows with missing core fields
-    df = df.dropna(subset=['timeStamp', 'elapsed', 'label'])
+    # "auto" uses the detected steady-state plateau (whole run if there is none)
+    if start_time == 'auto':
+        window = plateau_window(*per_second_activity(df))
+        start_time, end_time = window if window else (None, None)
 
     # Filter by steady state window if provided and valid
     if start_time and end_time:
@@ -31,91 +83,5 @@ def parse_jmeter_csv(file_path, green_sla, amber_sla, rag_basis, start_time=None
             # Skip filtering if inputs are not valid integers
             pass
 
-    summary = []
-    grouped = df.groupby('label')
-
-    for label, group in grouped:
-        samples = len(group)
-        if samples == 0:
-            continue
-
-        # Compute metrics in seconds
-        avg = group['elapsed'].mean() / 1000.0
-        p90 = group['elapsed'].quantile(0.90) / 1000.0
-        p95 = group['elapsed'].quantile(0.95) / 1000.0
-
-        # Error percentage across all rows (do not filter successes for timing)
-        error_count = (group['success'] != 'true').sum()
-        error_pct = 100.0 * error_count / samples
-
-        # RAG assignment per selected basis
-        if rag_basis == "avg":
-            metric = avg
-            if metric <= green_sla:
-                rag = "GREEN"
-            elif metric <= amber_sla:
-                rag = "AMBER"
-            else:
-                rag = "RED"
-
-        elif rag_basis == "p90":
-            metric = p90
-            if metric <= green_sla:
-                rag = "GREEN"
-            elif metric <= amber_sla:
-                rag = "AMBER"
-            else:
-                rag = "RED"
-
-        elif rag_basis == "avg+error":
-            if error_pct > error_sla:
-                rag = "RED"
-            else:
-                metric = avg
-                if metric <= green_sla:
-                    rag = "GREEN"
-                elif metric <= amber_sla:
-                    rag = "AMBER"
-                else:
-                    rag = "RED"
-
-        elif rag_basis == "p90+error":
-            if error_pct > error_sla:
-                rag = "RED"
-            else:
-                metric = p90
-                if metric <= green_sla:
-                    rag = "GREEN"
-                elif metric <= amber_sla:
-                    rag = "AMBER"
-                else:
-                    rag = "RED"
-        else:
-            # Fallback: treat as avg
-            metric = avg
-            if metric <= green_sla:
-                rag = "GREEN"
-            elif metric <= amber_sla:
-                rag = "AMBER"
-            else:
-                rag = "RED"
-
-        summary.append({
-            'Transaction': label,
-            '#Samples': samples,
-            'Avg (s)': f"{avg:.2f}",
-            '90th % (s)': f"{p90:.2f}",
-            '95th % (s)': f"{p95:.2f}",
-            'Error %': f"{error_pct:.2f}",
-            'RAG': rag
-        })
-
-    # Overall test RAG
-    test_rag = 'GREEN'
-    if any(row['RAG'] == 'RED' for row in summary):
-        test_rag = 'RED'
-    elif any(row['RAG'] == 'AMBER' for row in summary):
-        test_rag = 'AMBER'
-
     # ✅ Removed internal generate_graphs call
-    return summary, test_rag
+    return summary_rows(aggregate_transactions(df), green_sla, amber_sla, rag_basis, error_sla)
@@ -0,0 +1,197 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import history_store
+import instrumentation
+
+# Analyses running at once, and how many may wait behind them before submissions are refused
+ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", "2"))
+ANALYZE_QUEUE_LIMIT = int(os.environ.get("ANALYZE_QUEUE_LIMIT", "20"))
+
+# Results files at least this large count as "large"; only ANALYZE_MAX_LARGE of those run at
+# once so several big runs cannot exhaust memory together (small ones keep flowing)
+LARGE_ANALYSIS_BYTES = int(os.environ.get("LARGE_ANALYSIS_MB", "256")) * 1024 * 1024
+ANALYZE_MAX_LARGE = int(os.environ.get("ANALYZE_MAX_LARGE", "1"))
+
+# Finished jobs kept for status polling (oldest are dropped first)
+JOB_HISTORY = 200
+
+# Job state is written through to the history database: the worker that runs a job keeps the
+# live dict, but a poll may land on any other gunicorn worker or serverless instance
+_STORED_FIELDS = ("id", "kind", "status", "stage", "progress", "large", "speculative",
+                  "created", "started", "finished", "result", "error")
+
+
+class QueueFull(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_jobs = OrderedDict()  # job id -> status dict
+_executor = None
+# Large jobs past ANALYZE_MAX_LARGE wait here, not on a pool thread, so small jobs keep flowing
+_large_waiting = deque()  # (job, fn, args, kwargs)
+_large_running = 0
+_local = threading.local()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(ANALYZE_WORKERS, 1), thread_name_prefix="analyze")
+    return _executor
+
+
+def _outstanding():
+    return sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+
+
+def _prune():
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] in ("done", "failed")]
+    for job_id in finished[:max(len(finished) - JOB_HISTORY, 0)]:
+        del _jobs[job_id]
+
+
+def _publish(job):
+    """Store the job's current state for polls served by other workers (never fails the job)."""
+    stored = {k: job[k] for k in _STORED_FIELDS}
+    stored["timings_ms"] = _timings_ms(job["timings"])
+    try:
+        history_store.save_job(stored)
+        if job["finished"] is not None:
+            history_store.prune_jobs(JOB_HISTORY)
+    except Exception as e:
+        print(f"⚠ Failed to store state of job {job['id']}:", e)
+
+
+def _timings_ms(timings):
+    return {name: round(wall * 1000, 1) for name, wall, _, _ in timings}
+
+
+def submit(kind, fn, *args, size_bytes=0, speculative=False, **kwargs):
+    """Queue ``fn(*args, **kwargs)`` on the analysis pool; returns the job id.
+
+    ``size_bytes`` is the results file size, used for the large-analysis limit. Speculative
+    jobs (warm-ups nobody waits for) are only queued when a worker is idle and return None
+    otherwise. Raises QueueFull when ANALYZE_QUEUE_LIMIT jobs are already outstanding.
+    """
+    job_id = uuid.uuid4().hex[:12]
+    with _lock:
+        outstanding = _outstanding()
+        if speculative and outstanding >= ANALYZE_WORKERS:
+            return None
+        if outstanding >= ANALYZE_QUEUE_LIMIT:
+            raise QueueFull(f"{outstanding} analyses already queued or running")
+        _jobs[job_id] = {
+            "id": job_id, "kind": kind, "status": "queued", "stage": None, "progress": 0.0,
+            "large": size_bytes >= LARGE_ANALYSIS_BYTES, "speculative": speculative,
+            "created": time.time(), "started": None, "finished": None,
+            "result": None, "error": None, "timings": [], "done": threading.Event(),
+        }
+        _prune()
+    if not speculative:
+        _publish(_jobs[job_id])
+    _dispatch(_jobs[job_id], fn, args, kwargs)
+    return job_id
+
+
+def _dispatch(job, fn, args, kwargs):
+    """Hand a job to the pool, or park it if it is large and every large-run slot is taken."""
+    global _large_running
+    if job["large"]:
+        with _lock:
+            if _large_running >= max(ANALYZE_MAX_LARGE, 1):
+                job["stage"] = "waiting for a large-run slot"
+                _large_waiting.append((job, fn, args, kwargs))
+                parked = True
+            else:
+                _large_running += 1
+                parked = False
+        if parked:
+            if not job["speculative"]:
+                _publish(job)
+            return
+    _get_executor().submit(_run, job, fn, args, kwargs)
+
+
+def _release_large_slot():
+    """A large job finished: its slot passes straight to the oldest waiting large job, if any."""
+    global _large_running
+    with _lock:
+        if not _large_waiting:
+            _large_running -= 1
+            return
+        job, fn, args, kwargs = _large_waiting.popleft()
+        job["stage"] = None
+    _get_executor().submit(_run, job, fn, args, kwargs)
+
+
+def _run(job, fn, args, kwargs):
+    _local.job = job
+    try:
+        job["status"], job["started"] = "running", time.time()
+        if not job["speculative"]:
+            _publish(job)
+        with instrumentation.collect(job["timings"]):
+            job["result"] = fn(*args, **kwargs)
+        job["status"], job["progress"] = "done", 1.0
+    except Exception as e:
+        print(f"⚠ {job['kind']} job {job['id']} failed:", e)
+        job["status"], job["error"] = "failed", str(e)
+    finally:
+        job["finished"] = time.time()
+        _local.job = None
+        if not job["speculative"]:
+            _publish(job)
+        job["done"].set()
+        if job["large"]:
+            _release_large_slot()
+    return job["result"]
+
+
+def progress(stage_name, fraction=None):
+    """Report the current stage of the job running on this thread (no-op outside jobs)."""
+    job = getattr(_local, "job", None)
+    if job is not None:
+        job["stage"] = stage_name
+        if fraction is not None:
+            job["progress"] = round(float(fraction), 3)
+        if not job["speculative"]:
+            _publish(job)
+
+
+def wait(job_id, timeout=None):
+    """Block until the job finishes; returns its status dict."""
+    job = _jobs.get(job_id)
+    if job is not None:
+        job["done"].wait(timeout)  # failures are in the status
+    return job
+
+
+def status(job_id):
+    """JSON-safe status of one job, or None if unknown (or pruned).
+
+    Jobs of this worker are read live; others come from the state their worker last stored.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            out = {k: job[k] for k in _STORED_FIELDS}
+            out["timings_ms"] = _timings_ms(job["timings"])
+            if job["status"] == "queued":
+                out["queue_position"] = sum(1 for j in _jobs.values() if j["status"] == "queued" and j["created"] <= job["created"])
+    if job is None:
+        try:
+            out = history_store.load_job(job_id)
+        except Exception as e:
+            print(f"⚠ Failed to load state of job {job_id}:", e)
+            out = None
+        if out is None:
+            return None
+    now = time.time()
+    out["elapsed_s"] = round((out["finished"] or now) - (out["started"] or out["created"]), 2) if out["started"] else 0.0
+    return out
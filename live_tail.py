@@ -0,0 +1,179 @@
+import io
+import os
+import csv
+import pandas as pd
+
+from run_cache import active_threads, normalize_frame, read_options
+from upload_stream import _last_record_end
+from percentile_sketch import LatencySketch
+
+# Upper bound on bytes parsed per poll, so a late-joining viewer catches up in steps
+MAX_POLL_BYTES = 32 * 1024 * 1024
+
+
+class JtlTailer:
+    """Follows a JTL that JMeter is still writing and keeps live aggregates up to date.
+
+    Each ``poll()`` reads from the remembered byte offset, parses only the complete records
+    appended since, folds them into per-label totals (count, sum, errors, LatencySketch) and
+    per-second buckets, and returns just what changed. Work per poll is proportional to the
+    new rows plus the number of labels, never to the test so far.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.columns = None
+        self.labels = {}    # label -> {"count", "sum_ms", "errors", "sketch"}
+        self.seconds = {}   # epoch second -> [count, sum_ms, errors]
+        self.threads = {}   # epoch second -> distinct threads seen in that second
+        self.ts_min = None
+        self.ts_max = None
+
+    def _read_new_lines(self):
+        """Complete records appended since ``offset`` (header consumed on first read); b"" if none.
+
+        The offset is not moved here: ``poll`` advances it once the records are parsed, so a
+        failed parse is retried on the next poll instead of dropping the rows.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return b""
+        if size < self.offset:
+            # Truncated / replaced (new run in the same place): start over
+            self.__init__(self.path)
+        if size == self.offset:
+            return b""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, MAX_POLL_BYTES))
+        if self.columns is None:
+            nl = data.find(b"\n")
+            if nl < 0:
+                return b""  # header not complete yet
+            header = data[:nl].decode("utf-8", errors="replace")
+            self.columns = [c.strip() for c in next(csv.reader([header]), [])]
+            self.offset += nl + 1
+            data = data[nl + 1:]
+        # Newlines inside quoted fields (failureMessage, responseMessage) do not end a record
+        end = _last_record_end(data)
+        return data[:end + 1] if end >= 0 else b""
+
+    def poll(self):
+        """Fold newly appended rows; returns a delta dict or None if nothing new arrived."""
+        data = self._read_new_lines()
+        if not data.strip():
+            self.offset += len(data)
+            return None
+        try:
+            raw = pd.read_csv(
+                io.BytesIO(data), header=None, names=self.columns, **read_options(self.columns),
+            )
+        except (pd.errors.ParserError, ValueError) as e:
+            print(f"⚠ Could not parse new rows of {self.path} (retrying next poll):", e)
+            return None
+        self.offset += len(data)
+        chunk = normalize_frame(raw)
+        if chunk.empty:
+            return None
+
+        ts = chunk["timeStamp"]
+        self.ts_min = int(ts.iloc[0]) if self.ts_min is None else min(self.ts_min, int(ts.iloc[0]))
+        self.ts_max = int(ts.iloc[-1]) if self.ts_max is None else max(self.ts_max, int(ts.iloc[-1]))
+
+        second = ts // 1000
+        frame = pd.DataFrame({
+            "label": chunk["label"], "second": second,
+            "elapsed": chunk["elapsed"], "errors": ~chunk["success"],
+        })
+
+        touched_labels = []
+        for label, group in frame.groupby("label", observed=True, sort=False):
+            acc = self.labels.setdefault(label, {"count": 0, "sum_ms": 0.0, "errors": 0, "sketch": LatencySketch()})
+            acc["count"] += len(group)
+            acc["sum_ms"] += float(group["elapsed"].sum())
+            acc["errors"] += int(group["errors"].sum())
+            acc["sketch"].add(group["elapsed"].to_numpy())
+            touched_labels.append(label)
+
+        per_second = frame.groupby("second").agg(
+            count=("elapsed", "size"), sum_ms=("elapsed", "sum"), errors=("errors", "sum")
+        )
+        for sec, count, sum_ms, errors in per_second.itertuples():
+            bucket = self.seconds.setdefault(int(sec), [0, 0.0, 0])
+            bucket[0] += int(count)
+            bucket[1] += float(sum_ms)
+            bucket[2] += int(errors)
+        threads = active_threads(chunk, second)
+        if threads is not None:
+            # Seconds split across polls merge by max (as in RunAggregates)
+            for sec, n in threads.items():
+                self.threads[int(sec)] = max(self.threads.get(int(sec), 0), int(n))
+
+        return {
+            "metrics": [self.label_row(label) for label in sorted(touched_labels)],
+            "seconds": [self.second_row(int(sec)) for sec in per_second.index],
+        }
+
+    def label_row(self, label):
+        acc = self.labels[label]
+        p90, p95 = acc["sketch"].quantiles([0.90, 0.95])
+        return {
+            "label": label,
+            "samples": acc["count"],
+            "avg": round(acc["sum_ms"] / acc["count"], 1),
+            "p90": p90,
+            "p95": p95,
+            "error_pct": round(100.0 * acc["errors"] / acc["count"], 2),
+        }
+
+    def second_row(self, sec):
+        count, sum_ms, errors = self.seconds[sec]
+        return {
+            "second": sec,
+            "timestamp": pd.Timestamp(sec, unit="s").strftime("%H:%M:%S"),
+            "throughput": count,
+            "response_time": round(sum_ms / count, 1),
+            "error_rate": round(100.0 * errors / count, 2),
+            "threads": self.threads.get(sec),
+        }
+
+    def summary(self):
+        """Final figures in the shape the live page's completion card expects."""
+        if self.ts_min is None:
+            return {"duration": "N/A", "start": "N/A", "end": "N/A", "users": "N/A", "metrics": []}
+        start, end = pd.Timestamp(self.ts_min, unit="ms"), pd.Timestamp(self.ts_max, unit="ms")
+        return {
+            "duration": f"{int((end - start).total_seconds())}s",
+            "start": start.strftime("%H:%M:%S"),
+            "end": end.strftime("%H:%M:%S"),
+            "users": max(self.threads.values()) if self.threads else "N/A",
+            "metrics": [self.label_row(label) for label in sorted(self.labels)],
+        }
+
+
+class LogTailer:
+    """Complete new lines of a text log since the last call (same offset bookkeeping as JtlTailer)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def poll(self, max_lines=200):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            self.offset = 0
+        if size == self.offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, 1024 * 1024))
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self.offset += end + 1
+        return data[:end].decode("utf-8", errors="replace").splitlines()[-max_lines:]
@@ -0,0 +1,154 @@
+import math
+import base64
+import numpy as np
+import pandas as pd
+
+# Log-spaced latency bins (DDSketch-style mapping): any quantile read back from a bin is
+# within RELATIVE_ACCURACY of the true sample value, whatever the sample count.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Zero (and negative) latencies get their own bin that reads back as 0
+ZERO_BIN = -(2 ** 31)
+
+
+def bin_index(values):
+    """Map latencies (ms) to sketch bin indices, vectorised."""
+    v = np.asarray(values, dtype=float)
+    idx = np.full(v.shape, ZERO_BIN, dtype=np.int64)
+    pos = v > 0
+    idx[pos] = np.ceil(np.log(v[pos]) / _LOG_GAMMA)
+    return idx
+
+
+def bin_value(idx):
+    """Representative latency (ms) of each bin index, vectorised."""
+    idx = np.asarray(idx, dtype=np.int64)
+    return np.where(idx == ZERO_BIN, 0.0, 2.0 * np.power(GAMMA, idx.astype(float)) / (GAMMA + 1.0))
+
+
+def _rounded_values(idx):
+    # Rounded to 0.1 ms: well inside the sketch error and keeps the JSON compact
+    return np.round(bin_value(idx), 1)
+
+
+def grouped_quantiles(hist, keys, qs):
+    """Quantiles per group of a sparse histogram frame (``keys`` + ``bin`` + ``count``).
+
+    Returns ``{q: Series}`` indexed by ``keys``; all groups are resolved in one vectorised pass.
+    """
+    hist = hist.sort_values(keys + ["bin"], kind="stable")
+    grouped = hist.groupby(keys, sort=False)["count"]
+    cum = grouped.cumsum().to_numpy()
+    total = grouped.transform("sum").to_numpy()
+    out = {}
+    for q in qs:
+        # First bin whose cumulative count reaches rank q
+        hit = hist[cum >= q * total]
+        first = hit.groupby(keys, sort=False)["bin"].first()
+        out[q] = pd.Series(_rounded_values(first.to_numpy()), index=first.index)
+    return out
+
+
+def frame_quantiles(df, keys, qs, value_col="elapsed"):
+    """Sketch quantiles of ``value_col`` per group of ``keys`` straight from a sample frame."""
+    binned = df[keys].assign(bin=bin_index(df[value_col].to_numpy()))
+    hist = binned.groupby(keys + ["bin"], observed=True, sort=False).size().reset_index(name="count")
+    return grouped_quantiles(hist, keys, qs)
+
+
+class LatencySketch:
+    """Mergeable, serialisable latency distribution with bounded relative error.
+
+    Holds sparse (bin, count) pairs, so its size depends on the latency spread
+    (a few hundred bins for ms..minutes), never on the number of samples. Counts are int64,
+    or float64 once a weighted merge (e.g. a decayed baseline) has scaled them.
+    """
+
+    def __init__(self, bins=None, counts=None):
+        self.bins = np.asarray(bins if bins is not None else [], dtype=np.int64)
+        counts = np.asarray(counts) if counts is not None else np.zeros(0, dtype=np.int64)
+        self.counts = counts.astype(np.float64 if counts.dtype.kind == "f" else np.int64)
+
+    @classmethod
+    def from_values(cls, values):
+        sketch = cls()
+        sketch.add(values)
+        return sketch
+
+    @classmethod
+    def from_hist(cls, hist):
+        """Build from a sparse histogram frame with ``bin`` and ``count`` columns."""
+        totals = hist.groupby("bin")["count"].sum()
+        return cls(totals.index.to_numpy(), totals.to_numpy())
+
+    @property
+    def count(self):
+        return self.counts.sum().item()
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        bins, counts = np.unique(bin_index(values), return_counts=True)
+        self._combine(bins, counts)
+        return self
+
+    def merge(self, other, weight=1.0):
+        """Add ``other`` into this sketch; ``weight`` != 1 scales its counts (e.g. for decay).
+
+        Scaled counts stay fractional (not rounded), so repeated decay shrinks every bin alike.
+        """
+        counts = other.counts if weight == 1.0 else other.counts * float(weight)
+        self._combine(other.bins, counts)
+        return self
+
+    def _combine(self, bins, counts):
+        if len(bins) == 0:
+            return
+        counts = np.asarray(counts)
+        dtype = np.result_type(self.counts.dtype, counts.dtype)
+        all_bins = np.concatenate([self.bins, np.asarray(bins, dtype=np.int64)])
+        all_counts = np.concatenate([self.counts, counts])
+        self.bins, inverse = np.unique(all_bins, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=all_counts, minlength=len(self.bins)).astype(dtype)
+
+    def quantiles(self, qs):
+        """Latency (ms) at each quantile in ``qs``; None for an empty sketch."""
+        total = self.counts.sum()
+        if total == 0:
+            return [None for _ in qs]
+        cum = np.cumsum(self.counts)
+        pos = np.searchsorted(cum, np.asarray(qs, dtype=float) * total, side="left")
+        pos = np.minimum(pos, len(self.bins) - 1)
+        return _rounded_values(self.bins[pos]).tolist()
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def mean(self):
+        total = self.counts.sum()
+        return float((bin_value(self.bins) * self.counts).sum() / total) if total else None
+
+    # --- Serialisation ---
+    def to_dict(self):
+        out = {
+            "alpha": RELATIVE_ACCURACY,
+            "bins": base64.b64encode(self.bins.astype("<i8").tobytes()).decode("ascii"),
+        }
+        if self.counts.dtype.kind == "f":
+            out["counts"] = base64.b64encode(self.counts.astype("<f8").tobytes()).decode("ascii")
+            out["count_dtype"] = "f8"
+        else:
+            out["counts"] = base64.b64encode(self.counts.astype("<i8").tobytes()).decode("ascii")
+        return out
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        if abs(float(data.get("alpha", RELATIVE_ACCURACY)) - RELATIVE_ACCURACY) > 1e-12:
+            raise ValueError("Sketch was built with a different relative accuracy")
+        bins = np.frombuffer(base64.b64decode(data["bins"]), dtype="<i8")
+        counts = np.frombuffer(base64.b64decode(data["counts"]), dtype="<" + data.get("count_dtype", "i8"))
+        return cls(bins.copy(), counts.copy())
@@ -0,0 +1,102 @@
+import os
+import gzip
+import hashlib
+import tempfile
+
+# Rendered report pages (HTML plus precompressed copies), one set per saved report
+REPORT_PAGE_DIR = os.environ.get("REPORT_PAGE_DIR", "/tmp/report_pages")
+
+# Pages are rendered from these templates; editing them invalidates every stored page
+PAGE_TEMPLATES = ("report.html", "base.html")
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+_template_digest = None
+
+
+def _templates_digest():
+    global _template_digest
+    if _template_digest is None:
+        h = hashlib.blake2b(digest_size=8)
+        for name in PAGE_TEMPLATES:
+            with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+                h.update(f.read())
+        _template_digest = h.hexdigest()
+    return _template_digest
+
+
+def page_key(meta):
+    """Stable id of one report's rendered page: the report (id + save time) and the template versions.
+
+    Saved reports never change, so this doubles as the page's strong ETag.
+    """
+    raw = f"{meta['report_id']}|{meta.get('timestamp')}|{_templates_digest()}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# File suffix per stored variant (None = the plain HTML)
+_SUFFIXES = {None: ".html", "gzip": ".html.gz", "br": ".html.br", "pdf": ".pdf"}
+
+
+def _path(key, variant=None):
+    return os.path.join(REPORT_PAGE_DIR, key + _SUFFIXES[variant])
+
+
+def _write(path, data):
+    os.makedirs(REPORT_PAGE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=REPORT_PAGE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _brotli():
+    try:
+        import brotli  # optional dependency: pages are served gzip-only without it
+        return brotli
+    except ImportError:
+        return None
+
+
+def store_page(key, html):
+    """Write a rendered page plus its gzip (and, with ``brotli`` installed, brotli) copies."""
+    data = html.encode("utf-8")
+    brotli = _brotli()
+    if brotli is not None:
+        _write(_path(key, "br"), brotli.compress(data, quality=BROTLI_QUALITY))
+    _write(_path(key, "gzip"), gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+    _write(_path(key), data)  # written last: its presence marks the set as complete
+
+
+def has_page(key):
+    return os.path.exists(_path(key))
+
+
+def read_page(key, accept_encoding=()):
+    """(bytes, content encoding or None) of a stored page, picking the best encoding the client accepts."""
+    for encoding in ("br", "gzip"):
+        if encoding in accept_encoding:
+            try:
+                with open(_path(key, encoding), "rb") as f:
+                    return f.read(), encoding
+            except FileNotFoundError:
+                continue
+    with open(_path(key), "rb") as f:
+        return f.read(), None
+
+
+def page_pdf(key, base_url=None):
+    """PDF of a stored page, converted once and kept next to it (needs the optional ``weasyprint``).
+
+    ``base_url`` resolves the page's stylesheet link. Raises ImportError when weasyprint is not installed.
+    """
+    path = _path(key, "pdf")
+    if not os.path.exists(path):
+        from weasyprint import HTML  # optional dependency, only needed for PDF export
+        with open(_path(key), "rb") as f:
+            html = f.read().decode("utf-8")
+        _write(path, HTML(string=html, base_url=base_url).write_pdf())
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,264 @@
+import os
+import csv
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Writable cache location (same /tmp convention as uploads and history for Vercel)
+RUN_CACHE_DIR = os.environ.get("RUN_CACHE_DIR", "/tmp/run_cache")
+
+# Bump whenever the normalisation below changes so stale caches are rebuilt
+CACHE_VERSION = 3
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# (realpath, size, mtime) -> content hash, so an unchanged file is hashed once per process
+_hash_memo = {}
+
+
+def file_content_hash(file_path):
+    st = os.stat(file_path)
+    memo_key = (os.path.realpath(file_path), st.st_size, st.st_mtime_ns)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=20)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def remember_content_hash(file_path, digest):
+    """Record a content hash computed while the file was written (e.g. a streamed upload) so it is not re-read."""
+    st = os.stat(file_path)
+    _hash_memo[(os.path.realpath(file_path), st.st_size, st.st_mtime_ns)] = digest
+
+
+def run_cache_path(run_hash):
+    return os.path.join(RUN_CACHE_DIR, f"v{CACHE_VERSION}", run_hash)
+
+
+# Run columns and the JTL header spellings they are read from (first match wins)
+RUN_COLUMNS = {
+    "timeStamp": ("timestamp",),
+    "elapsed": ("elapsed",),
+    "label": ("label", "samplerlabel"),
+    "success": ("success",),
+    "threadName": ("threadname",),
+    "responseCode": ("responsecode",),
+    # Active threads of the whole test when the sample was taken (grpThreads only counts the
+    # sampler's thread group, the same number for single-group plans)
+    "allThreads": ("allthreads", "grpthreads"),
+}
+
+# Dictionary-encoded while parsing: a handful of distinct values repeated on every row
+CATEGORY_COLUMNS = ("label", "threadName", "responseCode")
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def sniff_columns(names):
+    """Map the run columns to the matching names of a JTL header, e.g. {"label": " Label"}."""
+    by_key = {}
+    for name in names:
+        by_key.setdefault(str(name).strip().lower(), name)
+    found = {}
+    for col, keys in RUN_COLUMNS.items():
+        for key in keys:
+            if key in by_key:
+                found[col] = by_key[key]
+                break
+    return found
+
+
+def read_options(names):
+    """``usecols``/``dtype`` for pd.read_csv so only the run columns of this header are parsed."""
+    found = sniff_columns(names)
+    return {
+        "usecols": list(found.values()),
+        "dtype": {found[c]: "category" for c in CATEGORY_COLUMNS if c in found},
+    }
+
+
+def read_header(file_path):
+    with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        return next(csv.reader([f.readline()]), [])
+
+
+def _category(values, strip=False):
+    """Categorical of (stripped) strings with sorted categories, converting only the distinct values."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories()
+    else:
+        values = values.astype("category")
+    if values.isna().any():
+        values = values.cat.add_categories(["nan"]).fillna("nan")
+    names = values.cat.categories.astype(str)
+    if strip:
+        names = names.str.strip()
+    remap, uniques = pd.factorize(names, sort=True)
+    return pd.Categorical.from_codes(remap[values.cat.codes.to_numpy()], categories=uniques)
+
+
+def _epoch_ms(values):
+    ts = pd.to_numeric(values, errors="coerce")
+    if ts.isna().all() and len(values):
+        # Some save-service configs write formatted dates instead of epoch ms
+        parsed = pd.to_datetime(values.astype(str), errors="coerce", format="mixed")
+        ts = pd.Series(parsed.to_numpy().astype("datetime64[ms]").astype("float64"), index=values.index)
+        ts[parsed.isna().to_numpy()] = np.nan
+    return ts
+
+
+def normalize_frame(df):
+    """Normalise a raw JMeter results frame into the typed run columns.
+
+    Output columns: timeStamp (int64 epoch ms), elapsed (int32 ms), label (category),
+    success (bool), threadName and responseCode (category, if present), allThreads (int32,
+    if present). Rows without a
+    usable timestamp or elapsed time are dropped and rows are sorted by time.
+    """
+    found = sniff_columns(df.columns)
+
+    out = pd.DataFrame({
+        "timeStamp": _epoch_ms(df[found["timeStamp"]]) if "timeStamp" in found else pd.Series(np.nan, index=df.index),
+        "elapsed": pd.to_numeric(df[found["elapsed"]], errors="coerce") if "elapsed" in found else np.nan,
+    })
+    out = out.dropna()
+    keep = out.index
+
+    out["label"] = _category(df[found["label"]].loc[keep], strip=True) if "label" in found else "Transaction"
+    if "success" in found:
+        success = df[found["success"]].loc[keep]
+        out["success"] = success.to_numpy() if success.dtype == bool else success.astype(str).str.strip().str.lower().isin(["true", "1"])
+    else:
+        out["success"] = True
+    for col in ("threadName", "responseCode"):
+        if col in found:
+            out[col] = _category(df[found[col]].loc[keep])
+    if "allThreads" in found:
+        out["allThreads"] = pd.to_numeric(df[found["allThreads"]].loc[keep], errors="coerce").fillna(0).clip(0, _INT32_MAX).astype("int32")
+
+    out["timeStamp"] = out["timeStamp"].astype("int64")
+    out["elapsed"] = out["elapsed"].clip(0, _INT32_MAX).astype("int32")
+    out = out.sort_values("timeStamp", kind="stable").reset_index(drop=True)
+    if not isinstance(out["label"].dtype, pd.CategoricalDtype):
+        out["label"] = out["label"].astype("category")
+    return out
+
+
+def active_threads(df, bucket):
+    """Active threads per time bucket of a run frame (Series indexed by bucket), or None.
+
+    ``bucket`` holds each row's bucket (e.g. epoch second). Uses JMeter's own allThreads count,
+    max per bucket in one pass over the time-sorted rows; falls back to counting distinct
+    threadName values (a hash-based groupby) when the column was not saved.
+    """
+    bucket = np.asarray(bucket)
+    if "allThreads" in df.columns:
+        active = df["allThreads"].to_numpy()
+        if len(bucket) and (bucket[1:] >= bucket[:-1]).all():
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            return pd.Series(np.maximum.reduceat(active, starts), index=bucket[starts])
+        return pd.Series(active).groupby(bucket).max()
+    if "threadName" in df.columns:
+        return df["threadName"].groupby(bucket, observed=True).nunique()
+    return None
+
+
+def is_run_frame(df):
+    """True for a frame already in the typed run layout (e.g. from load_run)."""
+    return (isinstance(df, pd.DataFrame) and "timeStamp" in df.columns and "elapsed" in df.columns
+            and df["elapsed"].dtype == np.int32 and isinstance(df["label"].dtype, pd.CategoricalDtype))
+
+
+def as_run(data):
+    """Typed run for a results file path, a typed run (returned as is, no copy) or any raw frame/records."""
+    if isinstance(data, str):
+        return load_run(data)
+    if is_run_frame(data):
+        return data
+    return normalize_frame(data if isinstance(data, pd.DataFrame) else pd.DataFrame(data))
+
+
+def _write_cache(df, cache_dir):
+    parent = os.path.dirname(cache_dir)
+    os.makedirs(parent, exist_ok=True)
+    # Build in a private temp dir and rename into place so concurrent workers never see a partial cache
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        meta = {"version": CACHE_VERSION, "rows": int(len(df)), "columns": {}}
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(tmp_dir, f"{col}.npy"), series.cat.codes.to_numpy())
+                meta["columns"][col] = {"kind": "category", "categories": [str(c) for c in series.cat.categories]}
+            else:
+                np.save(os.path.join(tmp_dir, f"{col}.npy"), series.to_numpy())
+                meta["columns"][col] = {"kind": "array"}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # Another worker finished the same run first; its copy is identical
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _read_cache(cache_dir):
+    with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    data = {}
+    for col, info in meta["columns"].items():
+        arr = np.load(os.path.join(cache_dir, f"{col}.npy"), mmap_mode="r")
+        if info["kind"] == "category":
+            data[col] = pd.Categorical.from_codes(arr, categories=info["categories"])
+        else:
+            data[col] = arr
+    # copy=False keeps every column (and the category codes) backed by its memory map; the
+    # default dict constructor would copy the whole run into memory
+    return pd.DataFrame(data, copy=False)
+
+
+def load_run(file_path):
+    """Return the normalised run frame for a JTL/CSV, parsing the file at most once per content hash."""
+    cache_dir = run_cache_path(file_content_hash(file_path))
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        try:
+            return _read_cache(cache_dir)
+        except Exception as e:
+            print("⚠ Run cache unreadable, rebuilding:", e)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    df = normalize_frame(pd.read_csv(file_path, **read_options(read_header(file_path))))
+    try:
+        _write_cache(df, cache_dir)
+    except Exception as e:
+        print("⚠ Failed to write run cache:", e)
+    return df
+
+
+def store_run(frames, run_hash):
+    """Cache a run parsed in pieces (each from normalize_frame, in file order) under ``run_hash``."""
+    cache_dir = run_cache_path(run_hash)
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        return
+    # Same result as normalising the whole file at once: stable time order, sorted categories
+    data = {}
+    for col in frames[0].columns:
+        if col in CATEGORY_COLUMNS:
+            data[col] = union_categoricals([f[col] for f in frames], sort_categories=True)
+        else:
+            data[col] = np.concatenate([f[col].to_numpy() for f in frames])
+    df = pd.DataFrame(data)
+    df = df.sort_values("timeStamp", kind="stable").reset_index(drop=True)
+    _write_cache(df, cache_dir)
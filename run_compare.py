@@ -0,0 +1,158 @@
+import math
+import numpy as np
+
+from percentile_sketch import LatencySketch
+
+# A shift is flagged only if it is both statistically significant and large enough to matter:
+# with millions of samples even a 1 ms shift has a tiny p-value.
+SIGNIFICANCE_ALPHA = 0.01
+MIN_EFFECT_SIZE = 0.1  # |rank-biserial correlation|; ~0.1 is a "small" effect
+MIN_ERROR_DELTA_PCT = 0.5  # percentage points
+
+
+def _two_sided_p(z):
+    return float(f"{math.erfc(abs(z) / math.sqrt(2.0)):.3g}")
+
+
+def mann_whitney(base, other):
+    """Mann-Whitney U test between two LatencySketches, on their shared log bins.
+
+    Samples in one bin count as ties, so this is the tie-corrected normal approximation
+    evaluated in O(bins). ``effect`` is the rank-biserial correlation, positive when ``other``
+    tends to be slower than ``base``.
+    """
+    n1, n2 = base.count, other.count
+    if n1 == 0 or n2 == 0:
+        return None
+    bins = np.union1d(base.bins, other.bins)
+    a = np.zeros(len(bins))
+    b = np.zeros(len(bins))
+    a[np.searchsorted(bins, base.bins)] = base.counts
+    b[np.searchsorted(bins, other.bins)] = other.counts
+
+    # U for "other > base": each other-sample beats the base samples in lower bins, ties count half
+    base_below = np.cumsum(a) - a
+    u = float((b * (base_below + 0.5 * a)).sum())
+    n = n1 + n2
+    ties = a + b
+    tie_term = float((ties ** 3 - ties).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    var = n1 * n2 / 12.0 * ((n + 1) - tie_term)
+    mean = n1 * n2 / 2.0
+    z = (u - mean) / math.sqrt(var) if var > 0 else 0.0
+    return {"u": u, "z": round(z, 3), "p": _two_sided_p(z), "effect": round(2.0 * u / (n1 * n2) - 1.0, 4)}
+
+
+def error_rate_test(base, other):
+    """Two-proportion z-test on error counts."""
+    n1, n2 = base["count"], other["count"]
+    if n1 == 0 or n2 == 0:
+        return None
+    p1, p2 = base["errors"] / n1, other["errors"] / n2
+    pooled = (base["errors"] + other["errors"]) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1.0 / n1 + 1.0 / n2))
+    z = (p2 - p1) / se if se > 0 else 0.0
+    return {"z": round(z, 3), "p": _two_sided_p(z)}
+
+
+def digest_metrics(digest):
+    """avg / p90 / p95 (ms), error % and throughput (req/s) of one label digest."""
+    sketch = digest["sketch"] if isinstance(digest["sketch"], LatencySketch) else LatencySketch.from_dict(digest["sketch"])
+    p90, p95 = sketch.quantiles([0.90, 0.95])
+    count = digest["count"]
+    return {
+        "samples": count,
+        "avg": round(digest["sum_ms"] / count, 1) if count else None,
+        "p90": p90,
+        "p95": p95,
+        "error_pct": round(100.0 * digest["errors"] / count, 3) if count else None,
+        "throughput": round(count / digest["seconds"], 3) if digest.get("seconds") else None,
+    }, sketch
+
+
+def summary_metrics(row):
+    """Fallback for reports saved before digests existed: numbers from the summary row only."""
+    def num(key, scale=1.0):
+        try:
+            return round(float(row[key]) * scale, 3)
+        except (KeyError, TypeError, ValueError):
+            return None
+    return {
+        "samples": num("#Samples"),
+        "avg": num("Avg (s)", 1000.0),
+        "p90": num("90th % (s)", 1000.0),
+        "p95": num("95th % (s)", 1000.0),
+        "error_pct": num("Error %"),
+        "throughput": None,
+    }
+
+
+def _delta(base, other):
+    out = {}
+    for key in ("avg", "p90", "p95", "error_pct", "throughput"):
+        if base.get(key) is None or other.get(key) is None:
+            out[key] = None
+            continue
+        diff = other[key] - base[key]
+        out[key] = {"abs": round(diff, 3), "pct": round(100.0 * diff / base[key], 2) if base[key] else None}
+    return out
+
+
+def _verdict(latency, errors, delta):
+    latency_shift = 0
+    if latency and latency["p"] < SIGNIFICANCE_ALPHA and abs(latency["effect"]) >= MIN_EFFECT_SIZE:
+        latency_shift = 1 if latency["effect"] > 0 else -1
+    error_shift = 0
+    if errors and errors["p"] < SIGNIFICANCE_ALPHA and delta["error_pct"] and abs(delta["error_pct"]["abs"]) >= MIN_ERROR_DELTA_PCT:
+        error_shift = 1 if delta["error_pct"]["abs"] > 0 else -1
+    if latency_shift > 0 or error_shift > 0:
+        return "regressed"
+    if latency_shift < 0 or error_shift < 0:
+        return "improved"
+    return "no significant change" if latency else "unknown"
+
+
+def compare_runs(reports):
+    """Per-transaction comparison of saved reports against the first one (the baseline).
+
+    ``reports`` are report dicts from history_store including ``label_digests``; older
+    reports without digests fall back to their summary rows and get no significance test.
+    Cost is O(transactions x sketch bins), independent of the runs' sample counts.
+    """
+    runs = []
+    for report in reports:
+        digests = report.get("label_digests") or {}
+        if digests:
+            per_label = {label: digest_metrics(d) for label, d in digests.items()}
+        else:
+            per_label = {row.get("Transaction"): (summary_metrics(row), None) for row in report.get("summary") or []}
+        runs.append((report, per_label))
+
+    base_report, base_labels = runs[0]
+    transactions = {}
+    for txn in sorted({label for _, per_label in runs for label in per_label if label}):
+        base_metrics, base_sketch = base_labels.get(txn, (None, None))
+        entries = []
+        for report, per_label in runs[1:]:
+            metrics, sketch = per_label.get(txn, (None, None))
+            entry = {"report_id": report.get("report_id"), "metrics": metrics}
+            if base_metrics is not None and metrics is not None:
+                latency = errors = None
+                if base_sketch is not None and sketch is not None:
+                    latency = mann_whitney(base_sketch, sketch)
+                    errors = error_rate_test(base_report["label_digests"][txn], report["label_digests"][txn])
+                entry["delta"] = _delta(base_metrics, metrics)
+                entry["latency_test"] = latency
+                entry["error_test"] = errors
+                entry["verdict"] = _verdict(latency, errors, entry["delta"])
+            else:
+                entry["verdict"] = "missing"
+            entries.append(entry)
+        transactions[txn] = {"baseline": base_metrics, "runs": entries}
+
+    return {
+        "baseline": {"report_id": base_report.get("report_id"), "name": base_report.get("report_name")},
+        "runs": [{"report_id": r.get("report_id"), "name": r.get("report_name")} for r, _ in runs[1:]],
+        "alpha": SIGNIFICANCE_ALPHA,
+        "min_effect": MIN_EFFECT_SIZE,
+        "transactions": transactions,
+    }
@@ -0,0 +1,196 @@
+import io
+import numpy as np
+import pandas as pd
+
+import history_store
+from percentile_sketch import grouped_quantiles
+from downsample import bucket_starts, sum_buckets, lttb_columns
+
+# Bucket widths (seconds) stored for every run: 1s, 10s, 1m, 10m
+PYRAMID_LEVELS = (1, 10, 60, 600)
+
+# Buckets per stored chunk, so a query only decompresses the chunks its window touches
+# (1 h of 1-second buckets, 10 h of 10-second buckets, ...)
+CHUNK_BUCKETS = 3600
+
+SERIES_METRICS = ("avg", "p90", "p95", "samples", "error", "throughput")
+
+# Most buckets one query may build at its chosen level (before downsampling to ``points``)
+MAX_QUERY_BUCKETS = 100_000
+
+
+def build_levels(agg, levels=PYRAMID_LEVELS):
+    """Per-level (rows, hist) frames of a RunAggregates.
+
+    ``rows`` has label, bucket (epoch s), count, sum_ms and errors; ``hist`` has label, bucket,
+    bin and count (a sparse latency sketch per label and bucket), or None for levels finer than
+    the histograms the aggregates kept (see RunAggregates.resolution). Levels that are not a
+    multiple of the aggregates' slot width (RunAggregates.step) are left out.
+    """
+    agg.compact()
+    per_second = agg.per_second
+    out = {}
+    for level in levels:
+        if level % agg.step:
+            continue
+        rows = per_second.assign(bucket=per_second["second"] - per_second["second"] % level)
+        rows = rows.groupby(["label", "bucket"], sort=False, observed=True)[["count", "sum_ms", "errors"]].sum().reset_index()
+        hist = None
+        if level >= agg.resolution and level % agg.resolution == 0:
+            hist = agg.hist.assign(bucket=agg.hist["bucket"] - agg.hist["bucket"] % level)
+            hist = hist.groupby(["label", "bucket", "bin"], sort=False, observed=True)["count"].sum().reset_index()
+        out[level] = (rows, hist)
+    return out
+
+
+def _encode(chunk_start, rows, hist):
+    labels = sorted(set(rows["label"]) | (set(hist["label"]) if hist is not None else set()))
+    codes = {label: i for i, label in enumerate(labels)}
+    arrays = {
+        "labels": np.array(labels, dtype=str),
+        "label": rows["label"].map(codes).to_numpy(dtype=np.int32),
+        "bucket": (rows["bucket"].to_numpy() - chunk_start).astype(np.int32),
+        "count": rows["count"].to_numpy(dtype=np.int64),
+        "sum_ms": rows["sum_ms"].to_numpy(dtype=np.float64),
+        "errors": rows["errors"].to_numpy(dtype=np.int64),
+    }
+    if hist is not None:
+        arrays.update({
+            "h_label": hist["label"].map(codes).to_numpy(dtype=np.int32),
+            "h_bucket": (hist["bucket"].to_numpy() - chunk_start).astype(np.int32),
+            "h_bin": hist["bin"].to_numpy(dtype=np.int32),
+            "h_count": hist["count"].to_numpy(dtype=np.int64),
+        })
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def encode_chunks(levels):
+    """Yield (level, chunk_start, chunk_end, has_sketch, blob) rows for history_store.save_series."""
+    for level, (rows, hist) in levels.items():
+        if rows.empty:
+            continue
+        span = level * CHUNK_BUCKETS
+        row_chunk = rows["bucket"].to_numpy() // span
+        hist_chunk = hist["bucket"].to_numpy() // span if hist is not None else None
+        for chunk in np.unique(row_chunk):
+            chunk_start = int(chunk) * span
+            chunk_hist = hist[hist_chunk == chunk] if hist is not None else None
+            blob = _encode(chunk_start, rows[row_chunk == chunk], chunk_hist)
+            yield level, chunk_start, chunk_start + span, hist is not None, blob
+
+
+def _decode(chunk_start, blob):
+    with np.load(io.BytesIO(blob)) as data:
+        labels = data["labels"]
+        rows = pd.DataFrame({
+            "label": labels[data["label"]], "bucket": data["bucket"].astype(np.int64) + chunk_start,
+            "count": data["count"], "sum_ms": data["sum_ms"], "errors": data["errors"],
+        })
+        hist = None
+        if "h_label" in data:
+            hist = pd.DataFrame({
+                "label": labels[data["h_label"]], "bucket": data["h_bucket"].astype(np.int64) + chunk_start,
+                "bin": data["h_bin"].astype(np.int64), "count": data["h_count"],
+            })
+    return rows, hist
+
+
+def save_pyramid(report_id, agg):
+    history_store.save_series(report_id, encode_chunks(build_levels(agg)))
+
+
+def choose_level(levels, first_s, last_s, points, need_sketch=False):
+    """Finest stored level whose bucket count over [first_s, last_s] fits ``points`` (else the coarsest)."""
+    candidates = sorted(level for level, has_sketch in levels.items() if has_sketch or not need_sketch)
+    if not candidates:
+        return None
+    for level in candidates:
+        if (last_s // level - first_s // level + 1) <= points:
+            return level
+    return candidates[-1]
+
+
+def level_rows(report_id, level, first_s, last_s, with_hist=False):
+    """(rows, hist) of one stored level restricted to buckets in [first_s, last_s]."""
+    first_bucket, last_bucket = first_s - first_s % level, last_s - last_s % level
+    parts = [_decode(start, blob) for start, blob in history_store.load_series_chunks(report_id, level, first_bucket, last_bucket)]
+    if not parts:
+        return None, None
+    rows = pd.concat([p[0] for p in parts], ignore_index=True)
+    rows = rows[(rows["bucket"] >= first_bucket) & (rows["bucket"] <= last_bucket)]
+    hist = None
+    if with_hist and parts[0][1] is not None:
+        hist = pd.concat([p[1] for p in parts], ignore_index=True)
+        hist = hist[(hist["bucket"] >= first_bucket) & (hist["bucket"] <= last_bucket)]
+    return rows, hist
+
+
+def query_series(report_id, first_s, last_s, metric, points, labels=None):
+    """One metric over [first_s, last_s] (epoch s) from the stored pyramid, at most ``points`` per series.
+
+    Returns a JSON-ready dict, or None if the report has no stored pyramid. Cost depends on the
+    chunks the window touches at the chosen level, not on the length of the run. The caller
+    clamps the window to the run; ValueError if it is reversed or needs more than
+    MAX_QUERY_BUCKETS buckets.
+    """
+    if first_s > last_s:
+        raise ValueError("from is after to")
+    levels = history_store.series_levels(report_id)
+    if not levels:
+        return None
+    need_sketch = metric in ("p90", "p95")
+    level = choose_level(levels, first_s, last_s, points, need_sketch)
+    if level is None:
+        return None
+    first_bucket, last_bucket = first_s - first_s % level, last_s - last_s % level
+    if (last_bucket - first_bucket) // level + 1 > MAX_QUERY_BUCKETS:
+        raise ValueError(f"window needs more than {MAX_QUERY_BUCKETS} buckets at {level}s")
+    rows, hist = level_rows(report_id, level, first_s, last_s, with_hist=need_sketch)
+    buckets = np.arange(first_bucket, last_bucket + 1, level)
+    starts = bucket_starts(len(buckets), points)
+
+    series = {}
+    if rows is not None and not rows.empty:
+        if labels:
+            rows = rows[rows["label"].isin(labels)]
+            hist = hist[hist["label"].isin(labels)] if hist is not None else None
+        if metric == "throughput":
+            values = rows.groupby("bucket")["count"].sum() / float(level)
+            grid = pd.DataFrame({"All": values}).reindex(buckets, fill_value=0.0)
+        else:
+            if metric == "avg":
+                values = rows["sum_ms"] / rows["count"]
+            elif metric == "samples":
+                values = rows["count"]
+            elif metric == "error":
+                values = 100.0 * rows["errors"] / rows["count"]
+            else:
+                q = 0.90 if metric == "p90" else 0.95
+                quantiles = grouped_quantiles(hist, ["label", "bucket"], [q])[q]
+                values = quantiles.reindex(pd.MultiIndex.from_frame(rows[["label", "bucket"]])).to_numpy()
+            grid = rows.assign(value=np.asarray(values, dtype=float)).pivot(index="bucket", columns="label", values="value").reindex(buckets)
+            if metric == "samples":
+                grid = grid.fillna(0)
+
+        if starts is not None:
+            reduce = sum_buckets if metric in ("samples", "throughput") else lttb_columns
+            grid = pd.DataFrame(reduce(grid.to_numpy(dtype=float), starts), columns=grid.columns, index=buckets[starts])
+            if metric == "throughput":
+                grid = grid / np.diff(np.append(starts, len(buckets)))[:, None]  # back to a per-second rate
+        grid = grid.round(3).astype(object).where(grid.notna(), None)
+        series = grid.to_dict("list")
+    if starts is not None:
+        buckets = buckets[starts]
+
+    return {
+        "metric": metric,
+        "level_seconds": level,
+        "levels": sorted(levels),
+        "from_ms": int(first_s) * 1000,
+        "to_ms": int(last_s) * 1000,
+        "t": (buckets * 1000).tolist(),
+        "time_labels": pd.to_datetime(buckets, unit="s").strftime("%H:%M:%S").tolist(),
+        "series": series,
+    }
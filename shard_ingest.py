@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from run_cache import normalize_frame, read_header, read_options
+from stream_ingest import RunAggregates, STREAM_MEMORY_BUDGET_MB, chunk_rows_for_budget
+
+# Worker processes for shard ingestion (1 = parse shards in-process, one after another)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Files are split into byte ranges of at least this size (smaller files are one shard)
+SHARD_MIN_BYTES = int(os.environ.get("SHARD_MIN_MB", "64")) * 1024 * 1024
+
+# Smallest memory budget one shard worker gets; fewer workers run when the budget is too small
+SHARD_MIN_BUDGET_MB = 32
+
+# How far past a split point to look for the start of the next record
+_ALIGN_PROBE_BYTES = 1024 * 1024
+
+# JMeter writes timeStamp first: a record starts with epoch ms (or a formatted date) then a comma
+_RECORD_START = re.compile(rb"\n(?=\d[^,\n\"]*,)")
+_NEWLINE = re.compile(rb"\n")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, like the chart workers; kept alive so later analyses skip the pandas import
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class _RangeReader:
+    """File-like view of ``header`` followed by bytes [start, end) of a file, for pd.read_csv."""
+
+    def __init__(self, file_path, start, end, header):
+        self._f = open(file_path, "rb")
+        self._f.seek(start)
+        self._left = end - start
+        self._header = header
+
+    def read(self, size=-1):
+        if self._header:
+            out, self._header = self._header, b""
+            return out
+        if self._left <= 0:
+            return b""
+        size = self._left if size is None or size < 0 else min(size, self._left)
+        data = self._f.read(size)
+        self._left -= len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+
+def _count_quotes(f, start, end):
+    f.seek(start)
+    quotes = 0
+    while start < end:
+        block = f.read(min(_ALIGN_PROBE_BYTES * 8, end - start))
+        if not block:
+            break
+        quotes += block.count(b'"')
+        start += len(block)
+    return quotes
+
+
+def _align(f, known, offset, by_timestamp):
+    """First record boundary at or after ``offset`` (the byte after a newline), or None.
+
+    ``known`` is an earlier record start: a candidate newline only counts when the quotes
+    between it and ``known`` pair up, so newlines inside quoted fields are never taken
+    (escaped quotes are doubled and keep the parity).
+    """
+    boundary = _RECORD_START if by_timestamp else _NEWLINE
+    offset = max(offset, known + 1)
+    quotes = _count_quotes(f, known, offset - 1)
+    pos = offset - 1
+    while True:
+        f.seek(pos)
+        probe = f.read(_ALIGN_PROBE_BYTES)
+        if not probe:
+            return None
+        seen = 0
+        for match in boundary.finditer(probe):
+            quotes += probe.count(b'"', seen, match.start())
+            seen = match.start()
+            if quotes % 2 == 0:
+                return pos + match.start() + 1
+        if len(probe) < _ALIGN_PROBE_BYTES:
+            return None
+        quotes += probe.count(b'"', seen, len(probe) - 1)
+        pos += len(probe) - 1  # a match may straddle probes
+
+
+def split_ranges(file_path, shards):
+    """Split a JTL into up to ``shards`` byte ranges aligned to record starts.
+
+    Returns ``(header_bytes, [(start, end), ...])`` with ranges covering every data row once.
+    Split points move forward to the next line that starts like a record (the timeStamp
+    column) outside quoted fields, so multi-line response messages are never cut in two.
+    Checking the quotes reads the file once up to the last split point.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        first = f.tell()
+        by_timestamp = header.split(b",", 1)[0].strip().strip(b'"') == b"timeStamp"
+        shards = max(1, min(shards, (size - first) // SHARD_MIN_BYTES))
+        cuts = [first]
+        for i in range(1, shards):
+            cut = _align(f, cuts[-1], first + (size - first) * i // shards, by_timestamp)
+            if cut is None or cut >= size:
+                break
+            if cut > cuts[-1]:
+                cuts.append(cut)
+    return header, list(zip(cuts, cuts[1:] + [size]))
+
+
+def ingest_range(file_path, start, end, header, memory_budget_mb=STREAM_MEMORY_BUDGET_MB):
+    """RunAggregates of the rows in bytes [start, end) of a JTL (runs in a worker process)."""
+    agg = RunAggregates(memory_budget_mb)
+    source = _RangeReader(file_path, start, end, header)
+    try:
+        reader = pd.read_csv(
+            source,
+            chunksize=chunk_rows_for_budget(file_path, memory_budget_mb),
+            **read_options(read_header(file_path)),
+        )
+        for chunk in reader:
+            agg.add_chunk(normalize_frame(chunk))
+    finally:
+        source.close()
+    agg.compact()
+    return agg
+
+
+def _ingest_pooled(shards, workers, shard_budget):
+    """ingest_range of every shard on the pool, with at most ``workers`` in flight at once."""
+    pool = _get_pool()
+    futures = {}
+    for n, (_, path, start, end, header) in enumerate(shards):
+        if n >= workers:
+            futures[n - workers].result()  # the pool may be wider than the budget allows
+        futures[n] = pool.submit(ingest_range, path, start, end, header, shard_budget)
+    return [futures[n].result() for n in range(len(shards))]
+
+
+def ingest_parallel(file_paths, memory_budget_mb=STREAM_MEMORY_BUDGET_MB, workers=None):
+    """Parse and pre-aggregate JTL shards in a process pool and merge them into one RunAggregates.
+
+    ``file_paths`` are the result files of one run (e.g. one per load generator in JMeter
+    distributed mode); large files are also split into byte-range shards so a single big
+    JTL uses every worker. Shards of one file merge as consecutive slices; files merge as
+    concurrent generators, so their per-second thread counts add up. The memory budget is
+    shared between the workers: at most ``memory_budget_mb // SHARD_MIN_BUDGET_MB`` shards
+    are parsed at once.
+    """
+    workers = INGEST_WORKERS if workers is None else min(workers, INGEST_WORKERS)
+    workers = max(min(workers, memory_budget_mb // SHARD_MIN_BUDGET_MB), 1)
+    per_file = max(workers // len(file_paths), 1) if file_paths else 1
+    shards = []
+    for i, path in enumerate(file_paths):
+        header, ranges = split_ranges(path, per_file)
+        shards.extend((i, path, start, end, header) for start, end in ranges)
+    shard_budget = memory_budget_mb // max(min(workers, len(shards)), 1)
+
+    parts = None
+    if workers > 1 and len(shards) > 1:
+        try:
+            parts = _ingest_pooled(shards, workers, shard_budget)
+        except BrokenProcessPool as e:
+            print("⚠ Ingest worker pool failed, parsing shards in-process:", e)
+            _reset_pool()
+    if parts is None:
+        parts = [ingest_range(path, start, end, header, shard_budget) for _, path, start, end, header in shards]
+
+    files = {}
+    for (i, *_), part in zip(shards, parts):
+        files[i] = files[i].merge(part) if i in files else part
+    agg = RunAggregates(memory_budget_mb)
+    for i in sorted(files):
+        agg.merge(files[i], concurrent=bool(i))
+    agg.compact()
+    return agg
@@ -0,0 +1,218 @@
+import os
+import csv
+import math
+import numpy as np
+import pandas as pd
+
+from run_cache import active_threads
+
+# Bytes read from each end of a JTL when locating the test bounds
+BOUNDS_PROBE_BYTES = 64 * 1024
+
+# Plateaus shorter than this (seconds, or fraction of the run) are not reported
+MIN_PLATEAU_SECONDS = 10
+MIN_PLATEAU_FRACTION = 0.2
+
+# Runs shorter than this have no meaningful ramp / plateau split
+MIN_RUN_SECONDS = 30
+
+
+def _timestamp_column(header_line):
+    header = next(csv.reader([header_line]), [])
+    for i, name in enumerate(header):
+        if name.strip().lower() == "timestamp":
+            return i
+    return None
+
+
+def _timestamps(lines, col):
+    out = []
+    for row in csv.reader(lines):
+        if len(row) > col:
+            try:
+                out.append(int(float(row[col])))
+            except ValueError:
+                continue
+    return out
+
+
+def read_test_bounds(file_path, probe_bytes=BOUNDS_PROBE_BYTES):
+    """First and last sample timestamps (epoch ms) from the head and tail of a JTL only.
+
+    JMeter appends samples roughly in completion order, so the minimum over the first lines
+    and the maximum over the last lines bound the test. Returns (None, None) if unreadable.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        head = f.read(probe_bytes).decode("utf-8", errors="replace")
+        f.seek(max(0, size - probe_bytes))
+        tail = f.read().decode("utf-8", errors="replace")
+
+    head_lines = head.splitlines()
+    if not head_lines:
+        return None, None
+    col = _timestamp_column(head_lines[0])
+    if col is None:
+        return None, None
+    # Skip the header, the possibly partial last line of the head and the first line of the tail
+    head_ts = _timestamps(head_lines[1:-1] if size > probe_bytes else head_lines[1:], col)
+    tail_lines = tail.splitlines()
+    tail_ts = _timestamps(tail_lines[1:], col)
+    if not head_ts and not tail_ts:
+        return None, None
+    return min(head_ts or tail_ts), max(tail_ts or head_ts)
+
+
+# --- Change-point detection (segmented least squares over prefix sums, O(n)) ---
+def _prefix_sums(y):
+    x = np.arange(len(y), dtype=float)
+    zero = np.zeros(1)
+    return {
+        "n": np.arange(len(y) + 1, dtype=float),
+        "x": np.concatenate([zero, np.cumsum(x)]),
+        "xx": np.concatenate([zero, np.cumsum(x * x)]),
+        "y": np.concatenate([zero, np.cumsum(y)]),
+        "yy": np.concatenate([zero, np.cumsum(y * y)]),
+        "xy": np.concatenate([zero, np.cumsum(x * y)]),
+    }
+
+
+def _segment_sse(p, i, j, linear):
+    """SSE of a constant (or linear) fit on y[i:j] for arrays of (i, j), from prefix sums."""
+    n = p["n"][j] - p["n"][i]
+    sy = p["y"][j] - p["y"][i]
+    syy = p["yy"][j] - p["yy"][i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sse = syy - np.where(n > 0, sy * sy / n, 0.0)
+        if linear:
+            sx = p["x"][j] - p["x"][i]
+            sxx = p["xx"][j] - p["xx"][i]
+            sxy = p["xy"][j] - p["xy"][i]
+            var_x = sxx - np.where(n > 0, sx * sx / n, 0.0)
+            cov = sxy - np.where(n > 0, sx * sy / n, 0.0)
+            sse = sse - np.where(var_x > 0, cov * cov / var_x, 0.0)
+    return np.maximum(sse, 0.0)
+
+
+def _noise_variance(y):
+    # Robust noise estimate from first differences (insensitive to ramps and level shifts)
+    if len(y) < 3:
+        return 1.0
+    mad = np.median(np.abs(np.diff(y) - np.median(np.diff(y))))
+    sigma = 1.4826 * mad / math.sqrt(2.0)
+    floor = 0.01 * max(np.abs(y).max(), 1.0)
+    return max(sigma, floor) ** 2
+
+
+def _best_split(signals, lo, hi, ramp_first):
+    """Best boundary t in [lo, hi] for ramp(lo..t) + plateau(t..hi) (or plateau + ramp).
+
+    Costs of all signals are summed after scaling by their noise variance. A ramp is only
+    accepted if it beats "no ramp" by a BIC-style penalty, so flat runs keep their full length.
+    """
+    t = np.arange(lo, hi + 1)
+    cost = np.zeros(len(t))
+    for p, var in signals:
+        lo_arr, hi_arr = np.full(len(t), lo), np.full(len(t), hi)
+        if ramp_first:
+            cost += (_segment_sse(p, lo_arr, t, True) + _segment_sse(p, t, hi_arr, False)) / var
+        else:
+            cost += (_segment_sse(p, lo_arr, t, False) + _segment_sse(p, t, hi_arr, True)) / var
+    null = cost[0] if ramp_first else cost[-1]
+    best = int(np.argmin(cost))
+    penalty = 3.0 * len(signals) * math.log(max(hi - lo, 2))
+    if cost[best] >= null - penalty:
+        return lo if ramp_first else hi
+    return int(t[best])
+
+
+def detect_phases(throughput, threads=None):
+    """Split a run into ramp-up, plateau and ramp-down.
+
+    ``throughput`` (and optionally ``threads``) are per-slot Series on a contiguous index of
+    slot start seconds (1-second slots, or wider ones from budgeted streaming). Returns
+    ``{"ramp_up": (s0, s1), "plateau": (s1, s2), "ramp_down": (s2, s3)}`` in epoch seconds
+    (end-exclusive), or None when the run is too short to tell.
+    """
+    n = len(throughput)
+    seconds = throughput.index.to_numpy()
+    step = _slot_seconds(seconds)
+    if n * step < MIN_RUN_SECONDS:
+        return None
+    series = [throughput.to_numpy(dtype=float)]
+    if threads is not None and len(threads):
+        series.append(threads.reindex(throughput.index).ffill().fillna(0).to_numpy(dtype=float))
+    signals = [(_prefix_sums(y), _noise_variance(y)) for y in series]
+
+    # Alternate: ramp-up end before the current ramp-down start and vice versa. Each pass is
+    # linear; a handful of passes settle once neither boundary sees the other ramp.
+    t1, t2 = 0, n
+    for _ in range(5):
+        new_t1 = _best_split(signals, 0, t2, ramp_first=True)
+        new_t2 = _best_split(signals, new_t1, n, ramp_first=False)
+        if (new_t1, new_t2) == (t1, t2):
+            break
+        t1, t2 = new_t1, new_t2
+
+    edge = lambda i: int(seconds[i]) if i < n else int(seconds[-1]) + step
+    return {"ramp_up": (edge(0), edge(t1)), "plateau": (edge(t1), edge(t2)), "ramp_down": (edge(t2), edge(n))}
+
+
+def _slot_seconds(seconds):
+    return int(seconds[1] - seconds[0]) if len(seconds) > 1 else 1
+
+
+def per_second_activity(df):
+    """Per-second throughput and active threads of a normalised sample frame, on a contiguous index."""
+    second = df["timeStamp"].to_numpy() // 1000
+    if len(second) == 0:
+        return pd.Series([], dtype="int64"), None
+    index = pd.RangeIndex(second.min(), second.max() + 1)
+    throughput = pd.Series(second).value_counts().reindex(index, fill_value=0)
+    threads = active_threads(df, second)
+    if threads is not None:
+        threads = threads.reindex(index, fill_value=0)
+    return throughput, threads
+
+
+def plateau_window(throughput, threads=None):
+    """Steady-state window (start_ms, end_ms) from per-slot series, or None if there is no clear plateau."""
+    phases = detect_phases(throughput, threads if threads is not None and len(threads) else None)
+    if phases is None:
+        return None
+    start, end = phases["plateau"]
+    index = throughput.index
+    run_seconds = index[-1] - index[0] + _slot_seconds(index)
+    if end - start < max(MIN_PLATEAU_SECONDS, MIN_PLATEAU_FRACTION * run_seconds):
+        return None
+    return start * 1000, end * 1000 - 1
+
+
+def _to_ms(value, ref_ms):
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    # hh:mm:ss on the day the test started (timestamps are UTC epoch ms)
+    h, m, sec = (int(part) for part in value.split(":"))
+    day_start = ref_ms - ref_ms % 86400000
+    return day_start + ((h * 60 + m) * 60 + sec) * 1000
+
+
+def parse_window(start_time, end_time, ref_ms):
+    """Manual window from form input (epoch ms or hh:mm:ss), or None if missing / invalid."""
+    if not start_time or not end_time or ref_ms is None:
+        return None
+    try:
+        start, end = _to_ms(start_time, ref_ms), _to_ms(end_time, ref_ms)
+    except ValueError:
+        return None
+    if end < start:
+        if str(end_time).strip().isdigit():
+            return None  # epoch ms: "to" before "from"
+        end += 86400000  # hh:mm:ss window crosses midnight
+    return start, end
+
+
+def format_window(window):
+    start, end = (pd.to_datetime(t, unit="ms").strftime("%H:%M:%S") for t in window)
+    return f"{start} — {end}"
@@ -0,0 +1,342 @@
+import os
+import numpy as np
+import pandas as pd
+
+from run_cache import active_threads
+from percentile_sketch import LatencySketch, bin_index, grouped_quantiles
+from downsample import bucket_starts, sum_buckets, lttb_columns
+
+# Upper bound for one streaming ingestion (chunk in flight + accumulators), in MB
+STREAM_MEMORY_BUDGET_MB = int(os.environ.get("STREAM_MEMORY_BUDGET_MB", "256"))
+
+# Rough in-memory cost of one accumulator row / one parsed CSV byte, used for budgeting
+_ACC_ROW_BYTES = 64
+_CSV_BYTE_COST = 6
+
+# Widths (seconds) ``per_second`` rows are coarsened through when over budget; each divides
+# the next, and every width up to 60 s divides the series pyramid's 60 s and 600 s levels.
+# Slots stop at the last width (the coarsest series the charts use); histogram buckets keep
+# doubling past it until each label has a single bucket
+SECOND_STEPS = (1, 2, 10, 20, 60, 120, 600)
+
+
+def _next_width(width):
+    return next((w for w in SECOND_STEPS if w > width), width * 2)
+
+
+class RunAggregates:
+    """Mergeable per-label / per-second aggregates of a JTL, built without holding raw samples.
+
+    ``per_second`` holds count, sum_ms and errors per (label, second), where ``second`` is the
+    start of a ``step``-second slot (1 unless the budget forced wider slots); ``hist`` holds
+    latency histogram counts per (label, bucket, bin) where a bucket spans ``resolution``
+    seconds; ``label_hist`` holds the per-label histogram at full accuracy. Two instances
+    merge by adding counts, so chunks (or shards) can be folded in any order. Histograms use
+    the percentile_sketch bins, so percentiles carry its bounded relative error.
+
+    With a memory budget, slots widen up to 600 s and buckets until they span the run; a run
+    with so many labels that even that exceeds the budget is kept as is, with a warning.
+    """
+
+    def __init__(self, memory_budget_mb=STREAM_MEMORY_BUDGET_MB):
+        # None disables budgeting (in-memory runs keep full 1-second histograms)
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb is not None else None
+        self.resolution = 1
+        self.step = 1
+        self.ts_min = None
+        self.ts_max = None
+        self.per_second = pd.DataFrame(columns=["label", "second", "count", "sum_ms", "errors"])
+        self.hist = pd.DataFrame(columns=["label", "bucket", "bin", "count"])
+        self.label_hist = pd.DataFrame(columns=["label", "bin", "count"])
+        self.threads = pd.Series(dtype="int64")
+        self._pending = []
+        self._over_budget = False
+
+    @classmethod
+    def from_run(cls, run):
+        """Aggregate an in-memory normalised run frame (e.g. from run_cache.load_run) in one pass."""
+        agg = cls(memory_budget_mb=None)
+        agg.add_chunk(run)
+        return agg
+
+    # --- Folding ---
+    def add_chunk(self, chunk):
+        """Fold one normalised chunk (see run_cache.normalize_frame) into the accumulators."""
+        if chunk.empty:
+            return
+        ts = chunk["timeStamp"].to_numpy()
+        self.ts_min = int(ts.min()) if self.ts_min is None else min(self.ts_min, int(ts.min()))
+        self.ts_max = int(ts.max()) if self.ts_max is None else max(self.ts_max, int(ts.max()))
+
+        # Group on integer label codes and map back to names once per group, not per row
+        labels = chunk["label"]
+        if isinstance(labels.dtype, pd.CategoricalDtype):
+            codes, names = labels.cat.codes.to_numpy(), np.asarray(labels.cat.categories, dtype=object)
+        else:
+            codes, names = pd.factorize(labels)
+            names = np.asarray(names, dtype=object)
+
+        second = ts // 1000
+        frame = pd.DataFrame({
+            "label": codes,
+            "second": second - second % self.step,
+            "bucket": second - second % self.resolution,
+            "bin": bin_index(chunk["elapsed"].to_numpy()),
+            "elapsed": chunk["elapsed"].to_numpy(),
+            "errors": (~chunk["success"]).to_numpy(),
+        })
+
+        per_second = frame.groupby(["label", "second"], sort=False).agg(
+            count=("elapsed", "size"), sum_ms=("elapsed", "sum"), errors=("errors", "sum")
+        ).reset_index()
+        hist = frame.groupby(["label", "bucket", "bin"], sort=False).size().reset_index(name="count")
+        label_hist = frame.groupby(["label", "bin"], sort=False).size().reset_index(name="count")
+        for part in (per_second, hist, label_hist):
+            part["label"] = names[part["label"].to_numpy()]
+
+        # Active threads per second; seconds split across chunks merge by max (exact for
+        # allThreads, a lower bound for the distinct-threadName fallback)
+        threads = active_threads(chunk, second)
+
+        self._pending.append((per_second, hist, label_hist, threads))
+        if self.memory_budget is None or sum(len(p[0]) + len(p[1]) for p in self._pending) * _ACC_ROW_BYTES > self.memory_budget // 4:
+            self.compact()
+
+    def merge(self, other, concurrent=False):
+        """Fold another RunAggregates (e.g. from another shard) into this one.
+
+        ``concurrent`` marks ``other`` as a load generator that ran alongside this one, so
+        per-second thread counts add up instead of merging by max (slices of one file).
+        """
+        other.compact()
+        if other.ts_min is not None:
+            self.ts_min = other.ts_min if self.ts_min is None else min(self.ts_min, other.ts_min)
+            self.ts_max = other.ts_max if self.ts_max is None else max(self.ts_max, other.ts_max)
+        per_second, hist = other.per_second, other.hist
+        if other.step != self.step:
+            self._coarsen_seconds(max(self.step, other.step))
+            per_second = per_second.assign(second=per_second["second"] - per_second["second"] % self.step)
+        if other.resolution != self.resolution:
+            self._coarsen(max(self.resolution, other.resolution))
+            hist = hist.assign(bucket=hist["bucket"] - hist["bucket"] % self.resolution)
+        threads = other.threads
+        if concurrent and threads is not None and not threads.empty:
+            self.compact()
+            self.threads = self.threads.add(threads, fill_value=0).astype("int64")
+            threads = None
+        self._pending.append((per_second, hist, other.label_hist, threads))
+        self.compact()
+        return self
+
+    def compact(self):
+        if not self._pending:
+            return
+        per_second, hist, label_hist, threads = zip(*self._pending)
+        self._pending = []
+        self.per_second = _sum_frames([self.per_second, *per_second], ["label", "second"])
+        self.hist = _sum_frames([self.hist, *hist], ["label", "bucket", "bin"])
+        self.label_hist = _sum_frames([self.label_hist, *label_hist], ["label", "bin"])
+        threads = [t for t in threads if t is not None and not t.empty]
+        if threads:
+            self.threads = pd.concat([self.threads, *threads]).groupby(level=0).max()
+
+        if self.memory_budget is None:
+            return
+        # Keep the per-second rows (a quarter) and the per-bucket histograms (half) inside the
+        # budget by widening their time slots; long runs with many labels get coarser series
+        while len(self.per_second) * _ACC_ROW_BYTES > self.memory_budget // 4 and self.step < SECOND_STEPS[-1]:
+            self._coarsen_seconds(_next_width(self.step))
+        while len(self.hist) * _ACC_ROW_BYTES > self.memory_budget // 2 and self.hist["bucket"].nunique() > 1:
+            self._coarsen(_next_width(self.resolution))
+        # Percentile series look up the histogram bucket of each slot, so buckets are never
+        # finer than slots (both widths come from the same ladder, so the wider is a multiple)
+        if self.resolution < self.step:
+            self._coarsen(self.step)
+        over = (len(self.per_second) * _ACC_ROW_BYTES > self.memory_budget // 4
+                or len(self.hist) * _ACC_ROW_BYTES > self.memory_budget // 2)
+        if over and not self._over_budget:
+            print(f"⚠ Run aggregates exceed the {self.memory_budget // (1024 * 1024)} MB memory budget at "
+                  f"{self.step} s slots and {self.resolution} s histogram buckets; continuing over budget")
+        self._over_budget = over
+
+    def _coarsen(self, resolution):
+        self.resolution = resolution
+        hist = self.hist.assign(bucket=self.hist["bucket"] - self.hist["bucket"] % resolution)
+        self.hist = _sum_frames([hist], ["label", "bucket", "bin"])
+
+    def _coarsen_seconds(self, step):
+        self.step = step
+        per_second = self.per_second.assign(second=self.per_second["second"] - self.per_second["second"] % step)
+        self.per_second = _sum_frames([per_second], ["label", "second"])
+
+    # --- Report outputs ---
+    def transaction_stats(self, window=None):
+        """Per-label stats in the shape returned by jmeter_parser.aggregate_transactions.
+
+        ``window`` = (start_ms, end_ms) restricts them to that span (e.g. the steady state);
+        percentiles then come from the time-bucketed histograms, so the edges are rounded to
+        ``resolution`` seconds.
+        """
+        per_second, label_hist = self._windowed(window)
+        totals = per_second.groupby("label")[["count", "sum_ms", "errors"]].sum()
+        stats = pd.DataFrame({
+            "samples": totals["count"].astype("int64"),
+            "avg": totals["sum_ms"] / totals["count"] / 1000.0,
+            "errors": totals["errors"].astype("int64"),
+        })
+        quantiles = grouped_quantiles(label_hist, ["label"], [0.90, 0.95])
+        stats["p90"] = quantiles[0.90] / 1000.0
+        stats["p95"] = quantiles[0.95] / 1000.0
+        stats["error_pct"] = 100.0 * stats["errors"] / stats["samples"]
+        stats.index.name = "label"
+        return stats[stats["samples"] > 0]
+
+    def throughput(self):
+        """Requests per slot over the full, contiguous time axis (int64 Series indexed by slot start second).
+
+        Slots are ``step`` seconds wide, i.e. requests per second unless the budget coarsened them.
+        """
+        self.compact()
+        if self.per_second.empty:
+            return pd.Series([], dtype="int64")
+        seconds = np.arange(self.per_second["second"].min(), self.per_second["second"].max() + 1, self.step)
+        return self.per_second.groupby("second")["count"].sum().reindex(seconds, fill_value=0).astype("int64")
+
+    def time_series(self, metrics, max_points=None):
+        """Return (time_labels, series_by_txn, throughput, bucket_seconds) in the shape analyze emits.
+
+        Each metric is one label x second pivot reindexed onto the full time axis, so the cost
+        scales with the number of (label, second) groups rather than labels x seconds lookups.
+        Axes longer than ``max_points`` are downsampled: latency and error series with LTTB,
+        sample counts and throughput with sum-preserving buckets; ``bucket_seconds`` is the
+        mean bucket width (``step`` when nothing was reduced).
+        """
+        self.compact()
+        if self.per_second.empty:
+            return [], {}, [], 1
+        per_second = self.per_second
+        throughput = self.throughput()
+        seconds = throughput.index.to_numpy()
+        starts = bucket_starts(len(seconds), max_points)
+        label_seconds = seconds if starts is None else seconds[starts]
+        time_labels = pd.to_datetime(label_seconds, unit="s").strftime("%H:%M:%S").tolist()
+
+        def pivot(values):
+            return per_second.assign(value=values).pivot(index="second", columns="label", values="value").reindex(seconds)
+
+        grids = {}
+        if "avg" in metrics:
+            grids["avg"] = pivot((per_second["sum_ms"] / per_second["count"] / 1000.0).round(4))
+        if "p90" in metrics or "p95" in metrics:
+            quantiles = grouped_quantiles(self.hist, ["label", "bucket"], [0.90, 0.95])
+            lookup = pd.MultiIndex.from_arrays([per_second["label"], per_second["second"] - per_second["second"] % self.resolution])
+            for metric, q in (("p90", 0.90), ("p95", 0.95)):
+                if metric in metrics:
+                    grids[metric] = pivot(np.round(quantiles[q].reindex(lookup).to_numpy() / 1000.0, 4))
+        if "samples" in metrics:
+            grids["samples"] = pivot(per_second["count"]).fillna(0).astype("int64")
+        if "error" in metrics:
+            grids["error"] = pivot(100.0 * per_second["errors"] / per_second["count"])
+
+        if starts is not None:
+            for metric, grid in grids.items():
+                if metric == "samples":
+                    values = sum_buckets(grid.to_numpy(dtype=float), starts).astype("int64")
+                else:
+                    values = lttb_columns(grid.to_numpy(dtype=float), starts)
+                grids[metric] = pd.DataFrame(values, columns=grid.columns, index=label_seconds)
+            throughput = pd.Series(sum_buckets(throughput.to_numpy(), starts), index=label_seconds).astype("int64")
+        bucket_seconds = self.step * len(seconds) / len(label_seconds)
+
+        # One bulk conversion per metric to JSON-ready lists (NaN -> None)
+        series_by_txn = {txn: {} for txn in sorted(per_second["label"].unique())}
+        for metric, grid in grids.items():
+            if metric != "samples":
+                grid = grid.astype(object).where(grid.notna(), None)
+            for txn, values in grid.to_dict("list").items():
+                series_by_txn[txn][metric] = values
+
+        return time_labels, series_by_txn, throughput.tolist(), round(bucket_seconds, 2)
+
+    def _windowed(self, window):
+        """(per_second, label_hist) restricted to ``window`` = (start_ms, end_ms), or whole-run if None."""
+        self.compact()
+        if window is None:
+            return self.per_second, self.label_hist
+        first, last = window[0] // 1000, window[1] // 1000
+        per_second = self.per_second[(self.per_second["second"] >= first - first % self.step) & (self.per_second["second"] <= last)]
+        hist = self.hist[(self.hist["bucket"] >= first - first % self.resolution) & (self.hist["bucket"] <= last)]
+        return per_second, hist.groupby(["label", "bin"], sort=False)["count"].sum().reset_index()
+
+    def label_sketches(self, window=None):
+        """Per-label LatencySketch, for baselines and run comparison."""
+        _, label_hist = self._windowed(window)
+        return {label: LatencySketch.from_hist(h) for label, h in label_hist.groupby("label")}
+
+    def label_digests(self, window=None):
+        """Compact, mergeable per-label summary saved with a report: totals, span and latency sketch.
+
+        Enough to compare runs (means, percentiles, error rates, throughput, rank tests)
+        without going back to the raw samples.
+        """
+        per_second, _ = self._windowed(window)
+        if per_second.empty:
+            return {}
+        if window is not None:
+            span = (window[1] - window[0] + 1) / 1000.0
+        else:
+            span = float(per_second["second"].max() - per_second["second"].min() + self.step)
+        totals = per_second.groupby("label")[["count", "sum_ms", "errors"]].sum()
+        sketches = self.label_sketches(window)
+        return {
+            label: {
+                "count": int(row["count"]),
+                "sum_ms": float(row["sum_ms"]),
+                "errors": int(row["errors"]),
+                "seconds": span,
+                "sketch": sketches[label].to_dict(),
+            }
+            for label, row in totals.iterrows() if label in sketches
+        }
+
+    def run_sketch(self):
+        """LatencySketch over every sample of the run."""
+        self.compact()
+        return LatencySketch.from_hist(self.label_hist)
+
+    def active_users(self, max_points=None):
+        """Active threads on the time_series axis (same labels), peak per bucket when downsampled."""
+        self.compact()
+        if self.per_second.empty or self.threads.empty:
+            return []
+        seconds = self.throughput().index.to_numpy()
+        threads = self.threads
+        if self.step > 1:
+            threads = threads.groupby(threads.index - threads.index % self.step).max()
+        users = threads.reindex(seconds).ffill().fillna(0).to_numpy(dtype=np.int64)
+        starts = bucket_starts(len(seconds), max_points)
+        if starts is not None:
+            users = np.maximum.reduceat(users, starts)
+        return users.tolist()
+
+    def concurrent_users(self):
+        self.compact()
+        return int(self.threads.max()) if not self.threads.empty else None
+
+
+def _sum_frames(frames, keys):
+    non_empty = [f for f in frames if not f.empty]
+    if not non_empty:
+        return frames[0]
+    return pd.concat(non_empty, ignore_index=True).groupby(keys, sort=False).sum().reset_index()
+
+
+def chunk_rows_for_budget(file_path, memory_budget_mb=STREAM_MEMORY_BUDGET_MB):
+    """Rows per read_csv chunk so that one parsed chunk stays within half the memory budget."""
+    with open(file_path, "rb") as f:
+        head = f.read(1024 * 1024)
+    lines = max(head.count(b"\n"), 1)
+    bytes_per_row = max(len(head) / lines, 16)
+    budget = memory_budget_mb * 1024 * 1024 // 2
+    return max(int(budget / (bytes_per_row * _CSV_BYTE_COST)), 1000)
+
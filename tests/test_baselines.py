@@ -0,0 +1,85 @@
+import pytest
+
+import baselines
+import history_store
+from percentile_sketch import LatencySketch
+
+
+def _digest(latency_ms, count, errors=0):
+    return {
+        "count": count, "sum_ms": float(latency_ms * count), "errors": errors, "seconds": 60.0,
+        "sketch": LatencySketch.from_values([latency_ms] * count).to_dict(),
+    }
+
+
+# Report id -> per-label digests, one fixed latency per run so the folded state is easy to check
+RUNS = {
+    1: {"login": _digest(100, 10)},
+    2: {"login": _digest(200, 10), "search": _digest(50, 4, errors=1)},
+    3: {"login": _digest(400, 10)},
+}
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "DATABASE_FILE", str(tmp_path / "history.db"))
+    monkeypatch.setattr(baselines, "_report_digests", lambda report_id: RUNS[report_id])
+
+
+def test_all_mode_adds_runs():
+    for report_id in (1, 2, 3):
+        baseline = baselines.promote(report_id)
+    login = baseline["state"]["login"]
+    assert login["count"] == 30 and login["sum_ms"] == 7000.0
+    assert baseline["members"] == [1, 2, 3]
+
+
+def test_window_mode_subtracts_the_run_that_falls_out():
+    baselines.promote(1, name="w", mode="window", param=2)
+    baselines.promote(2, name="w")
+    baseline = baselines.promote(3, name="w")
+    assert baseline["members"] == [2, 3]
+    login = baseline["state"]["login"]
+    assert login["count"] == 20 and login["sum_ms"] == 6000.0
+    sketch = LatencySketch.from_dict(login["sketch"])
+    assert sketch.count == 20 and sketch.quantile(0.0) == pytest.approx(200, rel=0.01)
+    assert baseline["state"]["search"]["count"] == 4
+
+
+def test_window_mode_drops_labels_that_leave_the_window():
+    baselines.promote(2, name="w", mode="window", param=1)
+    baseline = baselines.promote(3, name="w")
+    assert set(baseline["state"]) == {"login"}
+
+
+def test_decay_mode_scales_older_runs():
+    baselines.promote(1, name="d", mode="decay", param=0.5)
+    baseline = baselines.promote(3, name="d")
+    login = baseline["state"]["login"]
+    assert login["count"] == 15.0 and login["sum_ms"] == 4500.0
+    sketch = LatencySketch.from_dict(login["sketch"])
+    assert sketch.count == 15.0
+    assert baselines.baseline_metrics(baseline["state"])["login"]["avg"] == 0.3
+
+
+def test_promoting_a_member_twice_fails():
+    baselines.promote(1)
+    with pytest.raises(ValueError):
+        baselines.promote(1)
+    assert history_store.load_baseline(baselines.DEFAULT_BASELINE)["members"] == [1]
+
+
+def test_gate_reports_missing_and_inconclusive():
+    baselines.promote(2)
+    result = baselines.gate(1)
+    assert result["transactions"]["search"]["status"] == "missing"
+    assert result["transactions"]["login"]["status"] == "pass"
+    assert result["passed"] and not result["inconclusive"]
+
+    baselines.promote(1, name="only-login", reset=True)
+    RUNS[4] = {"checkout": _digest(100, 5)}
+    try:
+        result = baselines.gate(4, name="only-login")
+    finally:
+        del RUNS[4]
+    assert result["inconclusive"] and not result["passed"]
@@ -0,0 +1,37 @@
+import warnings
+
+import numpy as np
+
+from downsample import bucket_starts, lttb_columns, sum_buckets
+
+
+def test_bucket_starts_layout():
+    assert bucket_starts(10, 20) is None
+    starts = bucket_starts(100, 10)
+    assert starts[0] == 0 and starts[-1] == 99
+    assert len(starts) == 10
+    assert np.all(np.diff(starts) > 0)
+
+
+def test_sum_buckets_preserves_totals_and_ignores_nan():
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0])
+    out = sum_buckets(values, np.array([0, 2, 5]))
+    np.testing.assert_array_equal(out, [3.0, 9.0, 6.0])
+
+
+def test_lttb_keeps_spike_and_endpoints():
+    values = np.zeros(50)
+    values[23] = 100.0
+    out = lttb_columns(values, bucket_starts(len(values), 8))
+    assert out[0] == 0.0 and out[-1] == 0.0
+    assert 100.0 in out
+
+
+def test_lttb_all_nan_blocks_stay_nan_without_warning():
+    values = np.column_stack([np.arange(40, dtype=float), np.full(40, np.nan)])
+    values[10:30, 0] = np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = lttb_columns(values, bucket_starts(40, 8))
+    assert np.isnan(out[:, 1]).all()
+    assert np.isnan(out[3, 0]) and not np.isnan(out[0, 0])
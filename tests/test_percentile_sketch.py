@@ -0,0 +1,39 @@
+import numpy as np
+
+from percentile_sketch import RELATIVE_ACCURACY, LatencySketch
+
+VALUES = np.array([1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377, 610, 987, 1597, 2584, 4181], dtype=float)
+
+
+def test_quantiles_within_relative_accuracy():
+    sketch = LatencySketch.from_values(VALUES)
+    for q in (0.0, 0.25, 0.5, 0.9, 0.95, 1.0):
+        exact = VALUES[max(int(np.ceil(q * len(VALUES))) - 1, 0)]
+        # Bin values are rounded to 0.1 ms on the way out
+        assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact + 0.05
+
+
+def test_zero_latency_reads_back_as_zero():
+    sketch = LatencySketch.from_values([0, 0, 0, 10])
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.count == 4
+
+
+def test_merge_is_associative_and_matches_one_sketch():
+    a, b, c = (LatencySketch.from_values(part) for part in np.array_split(VALUES, 3))
+
+    left = LatencySketch().merge(LatencySketch().merge(a).merge(b)).merge(c)
+    right = LatencySketch().merge(a).merge(LatencySketch().merge(b).merge(c))
+    whole = LatencySketch.from_values(VALUES)
+
+    for merged in (left, right):
+        np.testing.assert_array_equal(merged.bins, whole.bins)
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        assert merged.counts.dtype == np.int64
+
+
+def test_weighted_merge_keeps_fractional_counts_through_dict():
+    sketch = LatencySketch().merge(LatencySketch.from_values([10, 10, 20]), weight=0.5)
+    assert sketch.count == 1.5
+    restored = LatencySketch.from_dict(sketch.to_dict())
+    np.testing.assert_array_equal(restored.counts, [1.0, 0.5])
@@ -0,0 +1,27 @@
+from percentile_sketch import LatencySketch
+from run_compare import mann_whitney
+
+BASE = LatencySketch.from_values([100, 110, 120, 130, 140, 150, 160, 170, 180, 190] * 5)
+
+
+def test_identical_runs_show_no_difference():
+    result = mann_whitney(BASE, LatencySketch.from_values([100, 110, 120, 130, 140, 150, 160, 170, 180, 190] * 5))
+    assert result["z"] == 0.0 and result["effect"] == 0.0
+    assert result["p"] == 1.0
+
+
+def test_slower_run_is_significant_with_positive_effect():
+    slower = LatencySketch.from_values([300, 310, 320, 330, 340, 350, 360, 370, 380, 390] * 5)
+    result = mann_whitney(BASE, slower)
+    assert result["u"] == 50 * 50
+    assert result["effect"] == 1.0
+    assert result["p"] < 0.001
+
+
+def test_faster_run_has_negative_effect():
+    faster = LatencySketch.from_values([10, 20, 30, 40, 50] * 4)
+    assert mann_whitney(BASE, faster)["effect"] == -1.0
+
+
+def test_empty_sketch():
+    assert mann_whitney(BASE, LatencySketch()) is None
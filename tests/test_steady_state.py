@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from steady_state import detect_phases, plateau_window
+
+# 60 s ramp-up, 300 s plateau, 60 s ramp-down starting at epoch second 1000
+RAMP = np.concatenate([np.linspace(0, 100, 60), np.full(300, 100.0), np.linspace(100, 0, 60)])
+
+
+def test_detect_phases_finds_ramps_and_plateau():
+    throughput = pd.Series(RAMP, index=pd.RangeIndex(1000, 1000 + len(RAMP)))
+    phases = detect_phases(throughput)
+    assert phases["ramp_up"][0] == 1000 and phases["ramp_down"][1] == 1420
+    start, end = phases["plateau"]
+    assert abs(start - 1060) <= 3 and abs(end - 1360) <= 3
+
+
+def test_detect_phases_too_short():
+    assert detect_phases(pd.Series(np.ones(10), index=pd.RangeIndex(0, 10))) is None
+
+
+def test_plateau_window_on_wider_slots():
+    # Budgeted streaming: 10-second slots, so the run spans 420 s in 42 points
+    throughput = pd.Series(RAMP[::10] * 10, index=pd.RangeIndex(1000, 1420, 10))
+    phases = detect_phases(throughput)
+    assert phases["ramp_down"][1] == 1420
+    start_ms, end_ms = plateau_window(throughput)
+    assert 1050_000 <= start_ms <= 1070_000 and 1350_000 <= end_ms <= 1370_000
+
+
+def test_plateau_window_none_for_flat_ramp():
+    throughput = pd.Series(np.linspace(0, 100, 120), index=pd.RangeIndex(0, 120))
+    assert plateau_window(throughput) is None
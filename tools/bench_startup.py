@@ -0,0 +1,108 @@
+"""Cold-start benchmark: import time and time-to-first-response per route.
+
+Each sample runs in a fresh interpreter, like a serverless cold start. Routes listed in
+LIGHT_ROUTES must not pull in the scientific stack; the run fails if they do, or if a
+median exceeds the --max-import-ms / --max-first-response-ms budgets.
+
+Usage (from the repo root):
+    python tools/bench_startup.py [--runs 5] [--routes / /history] [--importtime]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "seaborn")
+LIGHT_ROUTES = ("/", "/history", "/about", "/upload")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get(sys.argv[1])
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000.0,
+    "first_response_ms": (t2 - t1) * 1000.0,
+    "status": resp.status_code,
+    "heavy": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(route, env, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD, route]
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{route}: child failed\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if importtime:
+        result["importtime"] = proc.stderr
+    return result
+
+
+def slowest_imports(importtime_log, top=10):
+    rows = []
+    for line in importtime_log.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", nargs="+", default=list(LIGHT_ROUTES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-response-ms", type=float, default=None)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports per route")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    # Keep the benchmark away from the real history database
+    scratch = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, DATABASE_FILE=os.path.join(scratch, "database.db"), PYTHONDONTWRITEBYTECODE="1")
+
+    results, failures = {}, []
+    for route in args.routes:
+        samples = [measure(route, env) for _ in range(args.runs)]
+        row = {
+            "import_ms": statistics.median(s["import_ms"] for s in samples),
+            "first_response_ms": statistics.median(s["first_response_ms"] for s in samples),
+            "status": samples[-1]["status"],
+            "heavy": samples[-1]["heavy"],
+        }
+        results[route] = row
+        if route in LIGHT_ROUTES and row["heavy"]:
+            failures.append(f"{route} imported {', '.join(row['heavy'])}")
+        if args.max_import_ms is not None and row["import_ms"] > args.max_import_ms:
+            failures.append(f"{route} import {row['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+        if args.max_first_response_ms is not None and row["first_response_ms"] > args.max_first_response_ms:
+            failures.append(f"{route} first response {row['first_response_ms']:.0f} ms > {args.max_first_response_ms:.0f} ms")
+        if args.importtime:
+            row["slowest_imports"] = slowest_imports(measure(route, env, importtime=True)["importtime"])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'route':<20}{'import ms':>12}{'first resp ms':>16}{'status':>8}  heavy modules")
+        for route, row in results.items():
+            print(f"{route:<20}{row['import_ms']:>12.1f}{row['first_response_ms']:>16.1f}{row['status']:>8}  {', '.join(row['heavy']) or '-'}")
+            for cumulative_us, name in row.get("slowest_imports", []):
+                print(f"{'':<22}{cumulative_us / 1000.0:>8.1f} ms  {name}")
+
+    for failure in failures:
+        print("✗", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Report pipeline benchmark: wall time and peak memory per stage on synthetic JTLs.
+
+For every (layout, size) a JTL is generated once with tools/gen_jtl.py (kept in --data-dir)
+and each stage runs in a fresh interpreter so its peak RSS is its own:
+
+    parse_cold        parse_jmeter_csv with an empty run cache (CSV parse + cache write)
+    parse_warm        parse_jmeter_csv from the run cache
+    evaluate_sla      generate_TestResult.evaluate_sla on the summary rows
+    analyze_series    RunAggregates + time_series as /analyze builds them (downsampled)
+    graphs            generate_graphs_base64
+    txn_progress      generate_transaction_progress_base64
+    rag_pie           generate_rag_pie_base64
+
+Results are compared with the stored baselines (tools/bench_baselines.json); a stage fails
+if it is more than --tolerance slower or larger than its baseline. Baselines are machine
+specific: refresh them with --save-baseline on the machine that runs the comparison.
+
+Usage (from the repo root):
+    python tools/bench_suite.py [--rows 10000 100000] [--layouts minimal full] [--stages parse_cold graphs]
+                                [--labels 10] [--error-rate 0.01] [--threads 100] [--repeat 3] [--save-baseline]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(REPO_ROOT, "tools", "bench_baselines.json")
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "tools"))
+from gen_jtl import LAYOUTS, generate  # noqa: E402
+
+STAGES = ("parse_cold", "parse_warm", "evaluate_sla", "analyze_series", "graphs", "txn_progress", "rag_pie")
+
+# Chart stages render every sample; past this size they are skipped (see --chart-max-rows)
+CHART_STAGE_MAX_ROWS = 1_000_000
+
+CHILD = r"""
+import json, os, resource, sys, time
+stage, path = sys.argv[1], sys.argv[2]
+from jmeter_parser import parse_jmeter_csv
+from run_cache import load_run
+
+def peak_mb():
+    # VmHWM restarts at exec; ru_maxrss can carry over the parent's peak from before the fork
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) / 1024.0
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+prepared = None
+if stage == "evaluate_sla" or stage == "rag_pie":
+    prepared, _ = parse_jmeter_csv(path, 2.0, 5.0, "avg")
+elif stage == "analyze_series":
+    from stream_ingest import RunAggregates
+    prepared = load_run(path)
+
+before = peak_mb()
+t0, c0 = time.perf_counter(), time.process_time()
+if stage in ("parse_cold", "parse_warm"):
+    parse_jmeter_csv(path, 2.0, 5.0, "avg")
+elif stage == "evaluate_sla":
+    from generate_TestResult import evaluate_sla
+    evaluate_sla(prepared, 2.0, 5.0, "avg")
+elif stage == "analyze_series":
+    agg = RunAggregates.from_run(prepared)
+    agg.transaction_stats()
+    agg.time_series(["avg", "p90", "p95", "samples", "error"], int(os.environ.get("CHART_MAX_POINTS", "1000")))
+elif stage == "graphs":
+    from generate_graphs import generate_graphs_base64
+    generate_graphs_base64(path, 2.0, 5.0)
+elif stage == "txn_progress":
+    from generate_transaction_progress import generate_transaction_progress_base64
+    generate_transaction_progress_base64(path)
+elif stage == "rag_pie":
+    from generate_rag_pie import generate_rag_pie_base64
+    generate_rag_pie_base64(prepared)
+wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+print(json.dumps({"wall_s": wall, "cpu_s": cpu, "peak_rss_mb": peak_mb(), "stage_rss_mb": peak_mb() - before}))
+"""
+
+
+def dataset_path(data_dir, layout, rows, args):
+    name = f"{layout}_{rows}_l{args.labels}_e{args.error_rate}_t{args.threads}_s{args.seed}.csv"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        print(f"… generating {rows:,} rows ({layout})")
+        generate(path + ".tmp", rows, args.labels, args.error_rate, args.threads, layout, seed=args.seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def run_stage(stage, path, env, repeat=1):
+    """Best-of-``repeat`` timings (least disturbed by other load) with the largest peak RSS seen."""
+    samples = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", CHILD, stage, path], cwd=REPO_ROOT, env=env(),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{stage} failed on {path}\n{proc.stderr}")
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    best = min(samples, key=lambda r: r["wall_s"])
+    best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in samples)
+    best["stage_rss_mb"] = max(r["stage_rss_mb"] for r in samples)
+    return best
+
+
+def load_baselines():
+    try:
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--layouts", nargs="+", choices=sorted(LAYOUTS), default=["minimal", "full"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--labels", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "vp_bench_data"))
+    parser.add_argument("--chart-max-rows", type=int, default=CHART_STAGE_MAX_ROWS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest counts")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown / growth vs baseline (shared CI boxes are noisy)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baselines")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix="vp_bench_")
+    base_env = dict(os.environ, DATABASE_FILE=os.path.join(scratch, "database.db"), CHART_RENDER_WORKERS="0",
+                    MPLCONFIGDIR=scratch, PYTHONDONTWRITEBYTECODE="1")
+    baselines = load_baselines()
+    results, failures = {}, []
+    try:
+        for layout in args.layouts:
+            for rows in args.rows:
+                path = dataset_path(args.data_dir, layout, rows, args)
+                warm = dict(base_env, RUN_CACHE_DIR=os.path.join(scratch, f"warm_{layout}_{rows}"))
+                run_stage("parse_warm", path, lambda: warm)  # prime the run cache for the warm stages
+                for stage in args.stages:
+                    if stage in ("graphs", "txn_progress") and rows > args.chart_max_rows:
+                        continue
+                    env = lambda: warm
+                    if stage == "parse_cold":
+                        # A fresh, empty run cache for every repetition
+                        env = lambda: dict(base_env, RUN_CACHE_DIR=tempfile.mkdtemp(dir=scratch, prefix="cold_"))
+                    key = f"{layout}/{rows}/{stage}"
+                    result = results[key] = run_stage(stage, path, env, args.repeat)
+                    baseline = baselines.get(key)
+                    if baseline and not args.save_baseline:
+                        result["wall_vs_baseline"] = result["wall_s"] / baseline["wall_s"] if baseline["wall_s"] else None
+                        result["rss_vs_baseline"] = result["peak_rss_mb"] / baseline["peak_rss_mb"] if baseline["peak_rss_mb"] else None
+                        # Sub-50 ms timings are mostly noise; only flag those on memory
+                        if result["wall_vs_baseline"] and result["wall_vs_baseline"] > 1 + args.tolerance and result["wall_s"] > 0.05:
+                            failures.append(f"{key} wall {result['wall_s']:.3f}s vs baseline {baseline['wall_s']:.3f}s")
+                        if result["rss_vs_baseline"] and result["rss_vs_baseline"] > 1 + args.tolerance:
+                            failures.append(f"{key} peak RSS {result['peak_rss_mb']:.0f} MB vs baseline {baseline['peak_rss_mb']:.0f} MB")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'layout/rows/stage':<36}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'stage MB':>10}{'vs base':>10}")
+        for key, row in results.items():
+            ratio = f"{row['wall_vs_baseline']:.2f}x" if row.get("wall_vs_baseline") else "-"
+            print(f"{key:<36}{row['wall_s']:>10.3f}{row['cpu_s']:>10.3f}{row['peak_rss_mb']:>10.0f}{row['stage_rss_mb']:>10.0f}{ratio:>10}")
+
+    if args.save_baseline:
+        baselines.update({k: {"wall_s": round(v["wall_s"], 4), "peak_rss_mb": round(v["peak_rss_mb"], 1)} for k, v in results.items()})
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"✓ Baselines saved to {os.path.relpath(BASELINE_FILE, REPO_ROOT)}")
+
+    for failure in failures:
+        print("✗", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
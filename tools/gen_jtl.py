@@ -0,0 +1,118 @@
+"""Synthetic JMeter results (CSV JTL) generator for benchmarks.
+
+Rows are produced in vectorised chunks and appended to the file, so 10^8-row runs need
+no more memory than one chunk. Threads ramp up linearly, hold, and each label has its
+own log-normal latency profile; a share of samples fail with a 5xx response.
+
+Layouts mirror what JMeter writes depending on its save-service settings:
+    minimal   timeStamp,elapsed,label,success,threadName          (uploads/natbanking_sample.csv)
+    standard  + responseCode,responseMessage,dataType,bytes,grpThreads,allThreads,Latency,IdleTime,Connect
+              (uploads/synthetic_jmeter_results.csv)
+    full      JMeter's default CSV, adding failureMessage, sentBytes and URL
+
+Usage (from the repo root):
+    python tools/gen_jtl.py out.csv --rows 1000000 [--labels 20] [--error-rate 0.01]
+                            [--threads 200] [--layout full] [--seed 1]
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+LAYOUTS = {
+    "minimal": ["timeStamp", "elapsed", "label", "success", "threadName"],
+    "standard": ["timeStamp", "elapsed", "label", "responseCode", "responseMessage", "success", "threadName",
+                 "dataType", "bytes", "grpThreads", "allThreads", "Latency", "IdleTime", "Connect"],
+    "full": ["timeStamp", "elapsed", "label", "responseCode", "responseMessage", "threadName", "dataType",
+             "success", "failureMessage", "bytes", "sentBytes", "grpThreads", "allThreads", "URL",
+             "Latency", "IdleTime", "Connect"],
+}
+
+CHUNK_ROWS = 1_000_000
+START_MS = 1_758_000_000_000
+
+
+def label_names(n):
+    base = ["Login", "Home", "Search", "Browse", "AddToCart", "Checkout", "Payment", "Logout"]
+    return [base[i] if i < len(base) else f"Transaction_{i:03d}" for i in range(n)]
+
+
+def generate(path, rows, labels=10, error_rate=0.01, threads=100, layout="standard",
+             throughput=200.0, ramp_fraction=0.1, seed=1, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` samples to ``path``; returns the path. ``throughput`` is the plateau rate (samples/s)."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r} (choose from {', '.join(LAYOUTS)})")
+    rng = np.random.default_rng(seed)
+    names = np.array(label_names(labels), dtype=object)
+    # Per-label latency profile: median 80 ms .. 2 s, heavier tails for slower labels
+    medians = np.exp(rng.uniform(np.log(80), np.log(2000), labels))
+    sigmas = rng.uniform(0.3, 0.8, labels)
+    weights = rng.dirichlet(np.full(labels, 2.0))
+
+    # Sample index -> time: linear thread ramp-up over ramp_fraction of the run, then a plateau
+    duration_s = rows / throughput / (1 - ramp_fraction / 2)
+    ramp_s = duration_s * ramp_fraction
+
+    def time_of(index):
+        ramp_rows = throughput * ramp_s / 2
+        return np.where(index < ramp_rows, np.sqrt(2 * index * ramp_s / throughput),
+                        ramp_s + (index - ramp_rows) / throughput)
+
+    columns = LAYOUTS[layout]
+    with open(path, "w", newline="") as f:
+        f.write(",".join(columns) + "\n")
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        index = np.arange(start, start + n, dtype=float)
+        t = time_of(index)
+        label_idx = rng.choice(labels, size=n, p=weights)
+        elapsed = np.maximum(rng.lognormal(np.log(medians[label_idx]), sigmas[label_idx]), 1).astype(np.int64)
+        active = np.maximum(np.minimum(threads, np.ceil(threads * t / max(ramp_s, 1e-9))), 1).astype(np.int64)
+        thread = (rng.random(n) * active).astype(np.int64) + 1
+        failed = rng.random(n) < error_rate
+
+        frame = pd.DataFrame({
+            "timeStamp": START_MS + (t * 1000).astype(np.int64) + rng.integers(0, 50, n),
+            "elapsed": elapsed,
+            "label": names[label_idx],
+            "success": np.where(failed, "false", "true"),
+            "threadName": "Thread Group 1-" + pd.Series(thread).astype(str),
+        })
+        if layout != "minimal":
+            frame["responseCode"] = np.where(failed, "500", "200")
+            frame["responseMessage"] = np.where(failed, "Internal Server Error", "OK")
+            frame["dataType"] = "text"
+            frame["bytes"] = rng.integers(500, 20_000, n)
+            frame["grpThreads"] = active
+            frame["allThreads"] = active
+            frame["Latency"] = (elapsed * rng.uniform(0.5, 0.95, n)).astype(np.int64)
+            frame["IdleTime"] = 0
+            frame["Connect"] = (elapsed * rng.uniform(0.0, 0.2, n)).astype(np.int64)
+        if layout == "full":
+            frame["failureMessage"] = np.where(failed, "Response code was 500", "")
+            frame["sentBytes"] = rng.integers(200, 2_000, n)
+            frame["URL"] = "https://example.test/" + frame["label"].str.lower()
+        frame[columns].to_csv(path, mode="a", header=False, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--labels", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--throughput", type=float, default=200.0, help="plateau samples per second")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="standard")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    generate(args.out, args.rows, args.labels, args.error_rate, args.threads, args.layout,
+             args.throughput, seed=args.seed)
+    print(f"✓ {args.rows:,} rows ({args.layout}) -> {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import io
+import os
+import csv
+import zlib
+import hashlib
+import tempfile
+import pandas as pd
+
+from run_cache import normalize_frame, read_options, remember_content_hash, store_run
+
+# Decompressed bytes parsed per block while the upload is still arriving
+PARSE_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Parsed blocks are kept to prime the run cache only up to this size; bigger runs are
+# ingested in streaming mode by /analyze and would not use the cache anyway
+PRIME_CACHE_MAX_BYTES = int(os.environ.get("STREAM_INGEST_THRESHOLD_MB", "512")) * 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSED_SUFFIXES = (".gz", ".gzip", ".zst", ".zstd")
+
+
+class _MultiFrame:
+    """Incremental decompressor over concatenated members/frames (``cat a.gz b.gz``, pigz, zstd -T)."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._d = factory()
+        self._fed = False
+
+    def decompress(self, data):
+        out = []
+        while data:
+            self._fed = True
+            out.append(self._d.decompress(data))
+            if not self._d.eof:
+                break
+            data = self._d.unused_data
+            self._d, self._fed = self._factory(), False
+        return b"".join(out)
+
+    def check_complete(self):
+        if self._fed and not self._d.eof:
+            raise ValueError("Compressed upload is truncated")
+
+
+def _decoder_for(head):
+    """Decompressor for the upload's first bytes, or None for a plain CSV/JTL."""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip", _MultiFrame(lambda: zlib.decompressobj(wbits=16 + zlib.MAX_WBITS))
+    if head.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard  # optional dependency, only needed for .zst uploads
+        except ImportError:
+            raise ValueError("zstd-compressed uploads need the 'zstandard' package (pip install zstandard)")
+        return "zstd", _MultiFrame(lambda: zstandard.ZstdDecompressor().decompressobj())
+    return None, None
+
+
+def _last_record_end(data):
+    """Offset of the last newline that ends a CSV record (not one inside a quoted field), or -1.
+
+    ``data`` starts on a record boundary; JMeter doubles quotes inside quoted fields, so a
+    newline ends a record when the number of quotes before it is even.
+    """
+    cut = data.rfind(b"\n")
+    quotes = data.count(b'"', 0, cut) if cut >= 0 else 0
+    while cut >= 0 and quotes % 2:
+        prev = data.rfind(b"\n", 0, cut)
+        quotes -= data.count(b'"', prev + 1, cut)
+        cut = prev
+    return cut
+
+
+def stored_filename(filename):
+    """Name the upload is saved under: compressed uploads are stored decompressed."""
+    root, ext = os.path.splitext(filename)
+    return root if ext.lower() in COMPRESSED_SUFFIXES and root else filename
+
+
+class UploadSink:
+    """Write target for an uploaded file part, fed by the multipart parser as bytes arrive.
+
+    Each write is decompressed (gzip, or zstd when ``zstandard`` is installed), hashed with
+    the run cache's content hash, written to a temp file in ``upload_dir`` and parsed in
+    ``PARSE_BLOCK_BYTES`` blocks of complete records. ``finish`` moves the file into place,
+    seeds the run cache and returns the transaction names, so the upload is read only once.
+    """
+
+    def __init__(self, upload_dir, filename):
+        fd, self.tmp_path = tempfile.mkstemp(prefix=".upload-", dir=upload_dir)
+        self._out = os.fdopen(fd, "w+b")
+        self.filename = filename
+        self.compression = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._decoder = None
+        self._head = b""  # raw bytes held until the compression magic can be checked
+        self._hash = hashlib.blake2b(digest_size=20)  # same digest as run_cache.file_content_hash
+        self._chunks = []  # decompressed bytes not parsed yet
+        self._buffered = 0
+        self._header = None
+        self._read_options = None
+        self._frames = []  # None once the run is too large to prime the cache
+        self._labels = set()
+
+    # --- Multipart parser side (werkzeug writes, then seeks back and wraps us in a FileStorage) ---
+    def write(self, data):
+        size = len(data)
+        self.bytes_in += size
+        if self._head is not None:
+            self._head += data
+            if len(self._head) < len(ZSTD_MAGIC):
+                return size
+            data, self._head = self._head, None
+            self.compression, self._decoder = _decoder_for(data)
+        self._consume(self._decoder.decompress(data) if self._decoder else data)
+        return size
+
+    def seek(self, offset, whence=0):
+        return self._out.seek(offset, whence)
+
+    def tell(self):
+        return self._out.tell()
+
+    def read(self, size=-1):
+        return self._out.read(size)
+
+    def readline(self, size=-1):
+        return self._out.readline(size)
+
+    def close(self):
+        self._out.close()
+
+    # --- Decompressed side ---
+    def _consume(self, data):
+        if not data:
+            return
+        self._hash.update(data)
+        self._out.write(data)
+        self.bytes_out += len(data)
+        self._chunks.append(data)
+        self._buffered += len(data)
+        if self._buffered >= PARSE_BLOCK_BYTES:
+            self._parse_block(final=False)
+
+    def _parse_block(self, final):
+        data = b"".join(self._chunks)
+        self._chunks, self._buffered = [], 0
+        if not data:
+            return
+        if self._header is None:
+            nl = data.find(b"\n")
+            if nl < 0 and not final:
+                self._chunks, self._buffered = [data], len(data)
+                return
+            self._header, data = (data[:nl + 1], data[nl + 1:]) if nl >= 0 else (data + b"\n", b"")
+            names = next(csv.reader([self._header.decode("utf-8", "replace")]))
+            self._read_options = read_options(names)
+        if not final:
+            cut = _last_record_end(data)
+            data, rest = data[:cut + 1], data[cut + 1:]
+            if rest:
+                self._chunks, self._buffered = [rest], len(rest)
+        if not data.strip():
+            return
+        frame = normalize_frame(pd.read_csv(
+            io.BytesIO(self._header + data), **self._read_options,
+        ))
+        self._labels.update(frame["label"].cat.categories)
+        if self._frames is not None and self.bytes_out <= PRIME_CACHE_MAX_BYTES:
+            self._frames.append(frame)
+        else:
+            self._frames = None
+
+    def finish(self, dest_path):
+        """Complete the upload: parse the tail, move the file to ``dest_path`` and prime the run cache.
+
+        Returns the sorted transaction names found in the upload.
+        """
+        if self._head:
+            # Uploads shorter than the magic never reached _consume
+            head, self._head = self._head, None
+            self.compression, self._decoder = _decoder_for(head)
+            self._consume(self._decoder.decompress(head) if self._decoder else head)
+        self._head = None
+        if self._decoder:
+            self._decoder.check_complete()
+        self._parse_block(final=True)
+        self._out.close()
+        os.replace(self.tmp_path, dest_path)
+
+        digest = self._hash.hexdigest()
+        remember_content_hash(dest_path, digest)
+        if self._frames:
+            try:
+                store_run(self._frames, digest)
+            except Exception as e:
+                print("⚠ Failed to prime run cache from upload:", e)
+        self._frames = None
+        return sorted(str(label) for label in self._labels)
+
+    def discard(self):
+        self._out.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass